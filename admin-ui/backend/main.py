@@ -1,11 +1,18 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, AsyncIterator, Optional, Set, Tuple
 import json
 import asyncio
+import itertools
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
+import os
+import sqlite3
 import httpx
 import boto3
 from botocore.exceptions import ClientError, NoCredentialsError
@@ -25,40 +32,244 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outbound WebSocket settings
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5.0"))
+
+# Opt-in frame batching limits for /ws?batch_ms=...
+WS_MAX_BATCH_MS = 5000
+WS_DEFAULT_BATCH_SIZE = 500
+
+class ClientConnection:
+    """
+    Outbound side of a dashboard socket: a bounded buffer drained by its own writer task.
+    With batch_window set, buffered messages are coalesced into one JSON-array frame per window;
+    with dedupe as well, a message whose key is already buffered replaces it in place when it is
+    queued, so repeats never take up room.
+    """
+    def __init__(self, websocket: WebSocket, queue_size: int, send_timeout: float,
+                 batch_window: float = 0.0, batch_size: int = WS_DEFAULT_BATCH_SIZE, dedupe: bool = False):
+        self.websocket = websocket
+        self.queue_size = queue_size
+        # Messages waiting for the writer, in order; keyed by ("key", dedupe key) when deduping,
+        # otherwise by a sequence number
+        self.pending: "OrderedDict[Any, str]" = OrderedDict()
+        self.sequence = itertools.count()
+        self.ready = asyncio.Event()
+        self.space = asyncio.Event()
+        self.send_timeout = send_timeout
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.dedupe = dedupe
+        # Routing filter; a client with neither set receives every alert
+        self.repositories: Set[str] = set()
+        self.usernames: Set[str] = set()
+        self.writer: Optional[asyncio.Task] = None
+
+    def offer(self, message: str, key: Optional[tuple] = None) -> bool:
+        if self.batch_window and self.dedupe and key is not None:
+            slot = ("key", key)
+            if slot in self.pending:
+                # Latest wins, in the position of the first one
+                self.pending[slot] = message
+                return True
+        else:
+            slot = next(self.sequence)
+        if len(self.pending) >= self.queue_size:
+            return False
+        self.pending[slot] = message
+        self.ready.set()
+        return True
+
+    async def put(self, message: str, key: Optional[tuple] = None) -> bool:
+        """
+        Queue a message, waiting up to send_timeout for room; False if the client never made any
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.send_timeout
+        while not self.offer(message, key):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            self.space.clear()
+            try:
+                await asyncio.wait_for(self.space.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def take(self, count: int) -> List[str]:
+        messages = [self.pending.popitem(last=False)[1] for _ in range(min(count, len(self.pending)))]
+        self.space.set()
+        return messages
+
+    def close(self):
+        """Drop buffered messages, releasing broadcasts waiting for room"""
+        self.pending.clear()
+        self.space.set()
+
+    async def next_frame(self) -> str:
+        """
+        Wait for the next frame to send: a single message, or a JSON array of the messages
+        buffered within the batch window (flushed early at batch_size)
+        """
+        while not self.pending:
+            self.ready.clear()
+            await self.ready.wait()
+        if not self.batch_window:
+            return self.take(1)[0]
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_window
+        while len(self.pending) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self.ready.clear()
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+
+        # Messages are already JSON, so the frame is assembled without re-serializing them
+        return "[" + ",".join(self.take(self.batch_size)) + "]"
+
 # Store active WebSocket connections
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, queue_size: int = WS_SEND_QUEUE_SIZE, send_timeout: float = WS_SEND_TIMEOUT):
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        # Routing indexes: unfiltered clients, and filtered clients by repository full_name / username
+        self.unfiltered: Set[WebSocket] = set()
+        self.by_repository: Dict[str, Set[WebSocket]] = {}
+        self.by_username: Dict[str, Set[WebSocket]] = {}
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.evicted_count = 0
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, batch_window: float = 0.0,
+                      batch_size: int = WS_DEFAULT_BATCH_SIZE, dedupe: bool = False):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.register(websocket, batch_window, batch_size, dedupe)
         logger.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
 
+    def register(self, websocket: WebSocket, batch_window: float = 0.0,
+                 batch_size: int = WS_DEFAULT_BATCH_SIZE, dedupe: bool = False) -> ClientConnection:
+        """
+        Attach an outbound queue and writer task to an accepted socket
+        """
+        client = ClientConnection(websocket, self.queue_size, self.send_timeout,
+                                  batch_window=batch_window, batch_size=batch_size, dedupe=dedupe)
+        client.writer = asyncio.create_task(self._writer(client))
+        self.active_connections[websocket] = client
+        self.unfiltered.add(websocket)
+        return client
+
+    def set_filter(self, websocket: WebSocket, repositories: List[str], usernames: List[str]):
+        """
+        Route only alerts for these repository full_names, or for repositories these users
+        subscribed to, to the socket. Empty lists restore the unfiltered stream.
+        """
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return
+        self._unindex(client)
+        client.repositories = set(repositories)
+        client.usernames = set(usernames)
+        if not client.repositories and not client.usernames:
+            self.unfiltered.add(websocket)
+        for full_name in client.repositories:
+            self.by_repository.setdefault(full_name, set()).add(websocket)
+        for username in client.usernames:
+            self.by_username.setdefault(username, set()).add(websocket)
+
+    def _unindex(self, client: ClientConnection):
+        websocket = client.websocket
+        self.unfiltered.discard(websocket)
+        for index, keys in ((self.by_repository, client.repositories), (self.by_username, client.usernames)):
+            for key in keys:
+                sockets = index.get(key)
+                if sockets is not None:
+                    sockets.discard(websocket)
+                    if not sockets:
+                        del index[key]
+
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client is not None:
+            self._unindex(client)
+            if client.writer is not None and client.writer is not asyncio.current_task():
+                client.writer.cancel()
+            client.close()
         logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
 
-    async def send_personal_message(self, message: str, websocket: WebSocket):
+    async def _writer(self, client: ClientConnection):
+        websocket = client.websocket
         try:
-            await websocket.send_text(message)
+            # wait_for can swallow a cancel that races with a completed send, so also stop
+            # as soon as this client is no longer registered
+            while self.active_connections.get(websocket) is client:
+                frame = await client.next_frame()
+                await asyncio.wait_for(websocket.send_text(frame), timeout=client.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"WebSocket send timed out after {client.send_timeout}s, evicting client")
+            await self._evict(websocket)
         except Exception as e:
             logger.error(f"Error sending message: {e}")
             self.disconnect(websocket)
 
-    async def broadcast(self, message: str):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting to connection: {e}")
-                disconnected.append(connection)
-        
-        # Remove disconnected connections
-        for connection in disconnected:
-            self.disconnect(connection)
+    async def _evict(self, websocket: WebSocket):
+        if websocket not in self.active_connections:
+            return
+        self.evicted_count += 1
+        self.disconnect(websocket)
+        try:
+            # 1013: try again later
+            await asyncio.wait_for(websocket.close(code=1013), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        client = self.active_connections.get(websocket)
+        if client is not None and not client.offer(message):
+            logger.warning("WebSocket send queue full, evicting slow client")
+            asyncio.create_task(self._evict(websocket))
+
+    def targets(self, repository: Optional[str], username: Optional[str] = None) -> Set[WebSocket]:
+        """
+        Sockets interested in an alert for repository; username is the owner of the matching
+        RepositorySubscription, if any. Cost is proportional to the number of matching sockets.
+        """
+        if repository is None:
+            return set(self.active_connections)
+        targets = set(self.unfiltered)
+        targets.update(self.by_repository.get(repository, ()))
+        if username is not None:
+            targets.update(self.by_username.get(username, ()))
+        return targets
+
+    async def broadcast(self, message: str, key: Optional[tuple] = None,
+                        repository: Optional[str] = None, username: Optional[str] = None):
+        """
+        Fan a pre-serialized message out to the queues of interested clients. Without a
+        repository the message goes to every client.
+        key identifies the alert for clients that dedupe batched frames.
+        """
+        connections = self.active_connections
+        full = [ws for ws in self.targets(repository, username) if not connections[ws].offer(message, key)]
+        if not full:
+            return
+
+        # Backpressure: a burst larger than a client's queue waits (up to the send timeout) for
+        # its writer to make room. Clients that still cannot keep up are dropped rather than
+        # stalling everyone else.
+        clients = [connections[ws] for ws in full]
+        queued = await asyncio.gather(*(client.put(message, key) for client in clients))
+        for client, ok in zip(clients, queued):
+            if not ok and connections.get(client.websocket) is client:
+                logger.warning("WebSocket send queue full, evicting slow client")
+                asyncio.create_task(self._evict(client.websocket))
 
 manager = ConnectionManager()
 
@@ -77,65 +288,225 @@ class SecurityAlertResponse(BaseModel):
     severity: str
     timestamp: str
 
+def process_security_alert(alert: SecurityAlert) -> Tuple[str, tuple]:
+    """
+    Build the WebSocket message for a GitHub security alert, with its dedupe key
+    """
+    alert_data = {
+        "id": alert.alert.get("number", "unknown"),
+        "repository": alert.repository.get("full_name", "unknown"),
+        "severity": alert.alert.get("severity", "unknown"),
+        "state": alert.alert.get("state", "unknown"),
+        "created_at": alert.alert.get("created_at", datetime.now().isoformat()),
+        "html_url": alert.alert.get("html_url", ""),
+        "dismissed_at": alert.alert.get("dismissed_at"),
+        "dismissed_by": alert.alert.get("dismissed_by"),
+        "dismissed_reason": alert.alert.get("dismissed_reason"),
+        "dismissed_comment": alert.alert.get("dismissed_comment"),
+        "fixed_at": alert.alert.get("fixed_at"),
+        "action": alert.action
+    }
+
+    # Create response for WebSocket broadcast
+    response = SecurityAlertResponse(
+        message=f"Security alert {alert.action} in {alert_data['repository']}",
+        alert_id=str(alert_data["id"]),
+        repository=alert_data["repository"],
+        severity=alert_data["severity"],
+        timestamp=alert_data["created_at"]
+    )
+    return response.json(), (response.repository, response.alert_id, alert.action)
+
+# Webhook work queue settings
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "10000"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "100"))
+
+class WebhookQueue:
+    """
+    Bounded queue between webhook ingestion and alert processing, drained by a pool of workers
+    """
+    def __init__(self, maxsize: int = WEBHOOK_QUEUE_SIZE, workers: int = WEBHOOK_WORKERS,
+                 batch_size: int = WEBHOOK_BATCH_SIZE):
+        self.maxsize = maxsize
+        self.worker_count = workers
+        self.batch_size = batch_size
+        # Created in start(): before Python 3.10 a queue binds to the loop current at construction
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+        self.high_watermark = 0
+
+    def submit(self, alert: SecurityAlert) -> bool:
+        if not self.workers:
+            self.start()
+        try:
+            self.queue.put_nowait(alert)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        self.high_watermark = max(self.high_watermark, self.queue.qsize())
+        return True
+
+    def start(self):
+        if self.workers:
+            return
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.maxsize)
+        self.workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        logger.info(f"Started {self.worker_count} webhook workers (queue size {self.maxsize}, batch size {self.batch_size})")
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """
+        Give queued alerts a chance to go out, then cancel the workers
+        """
+        if self.queue is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping webhook workers with {self.queue.qsize()} alerts still queued")
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def _worker(self, worker_id: int):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                await self._process_batch(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            # Let the socket writers and the webhook endpoint run between batches
+            await asyncio.sleep(0)
+
+    async def _process_batch(self, batch: List[SecurityAlert]):
+        for alert in batch:
+            try:
+                message, key = process_security_alert(alert)
+                repository = key[0]
+                subscription = subscriptions.by_full_name.get(repository)
+                await manager.broadcast(message, key, repository=repository,
+                                        username=subscription.username if subscription else None)
+                self.processed += 1
+                # Give the socket writers a turn between alerts, not only between batches
+                await asyncio.sleep(0)
+                logger.debug(f"Security alert processed: {alert.action} for {alert.repository.get('full_name', 'unknown')}")
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error processing security alert: {e}")
+        self.batches += 1
+        logger.debug(f"Processed batch of {len(batch)} security alerts ({self.queue.qsize()} queued)")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_capacity": self.maxsize,
+            "high_watermark": self.high_watermark,
+            "workers": len(self.workers),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "batches": self.batches
+        }
+
+webhook_queue = WebhookQueue()
+
+@app.on_event("startup")
+async def start_webhook_workers():
+    webhook_queue.start()
+
+@app.on_event("shutdown")
+async def stop_webhook_workers():
+    await webhook_queue.stop()
+
 @app.get("/")
 async def root():
     return {"message": "GitHub Security Alerts API", "status": "running"}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "connections": len(manager.active_connections)}
+    return {
+        "status": "healthy",
+        "connections": len(manager.active_connections),
+        "evicted_connections": manager.evicted_count
+    }
+
+class AlertFilter(BaseModel):
+    repositories: List[str] = []
+    usernames: List[str] = []
+
+def split_param(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, batch_ms: int = 0,
+                             batch_size: int = WS_DEFAULT_BATCH_SIZE, dedupe: bool = False,
+                             repositories: str = "", usernames: str = ""):
+    """
+    Dashboard alert stream. Pass batch_ms to receive alerts as one JSON array per window
+    (flushed early at batch_size), and dedupe=true to collapse repeats of the same
+    (repository, alert_id, action) within a window.
+
+    repositories (full names) and usernames (comma-separated) limit the stream to matching
+    alerts. The filter can be replaced later by sending {"repositories": [...], "usernames": [...]}.
+    """
+    batch_ms = max(0, min(batch_ms, WS_MAX_BATCH_MS))
+    batch_size = max(1, batch_size)
+    await manager.connect(websocket, batch_window=batch_ms / 1000, batch_size=batch_size, dedupe=dedupe)
+    if repositories or usernames:
+        manager.set_filter(websocket, split_param(repositories), split_param(usernames))
     try:
         while True:
-            # Keep connection alive
-            await websocket.receive_text()
+            text = await websocket.receive_text()
+            # Anything that is not a filter update is a keepalive
+            try:
+                data = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(data, dict) and ("repositories" in data or "usernames" in data):
+                try:
+                    alert_filter = AlertFilter(**data)
+                except ValueError as e:
+                    logger.warning(f"Ignoring invalid WebSocket filter: {e}")
+                    continue
+                manager.set_filter(websocket, alert_filter.repositories, alert_filter.usernames)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
-@app.post("/webhook/github/security-alert")
+@app.post("/webhook/github/security-alert", status_code=202)
 async def github_security_webhook(alert: SecurityAlert):
     """
-    GitHub webhook endpoint for security alerts
+    GitHub webhook endpoint for security alerts.
+    The payload is validated and queued; workers broadcast it after the 202 is returned.
     """
-    try:
-        # Extract relevant information from the alert
-        alert_data = {
-            "id": alert.alert.get("number", "unknown"),
-            "repository": alert.repository.get("full_name", "unknown"),
-            "severity": alert.alert.get("severity", "unknown"),
-            "state": alert.alert.get("state", "unknown"),
-            "created_at": alert.alert.get("created_at", datetime.now().isoformat()),
-            "html_url": alert.alert.get("html_url", ""),
-            "dismissed_at": alert.alert.get("dismissed_at"),
-            "dismissed_by": alert.alert.get("dismissed_by"),
-            "dismissed_reason": alert.alert.get("dismissed_reason"),
-            "dismissed_comment": alert.alert.get("dismissed_comment"),
-            "fixed_at": alert.alert.get("fixed_at"),
-            "action": alert.action
-        }
-        
-        # Create response for WebSocket broadcast
-        response = SecurityAlertResponse(
-            message=f"Security alert {alert.action} in {alert_data['repository']}",
-            alert_id=str(alert_data["id"]),
-            repository=alert_data["repository"],
-            severity=alert_data["severity"],
-            timestamp=alert_data["created_at"]
-        )
-        
-        # Broadcast to all connected clients
-        await manager.broadcast(response.json())
-        
-        logger.info(f"Security alert processed: {alert.action} for {alert_data['repository']}")
-        
-        return {"status": "success", "message": "Alert processed and broadcasted"}
-        
-    except Exception as e:
-        logger.error(f"Error processing security alert: {e}")
-        raise HTTPException(status_code=500, detail="Error processing alert")
+    if not webhook_queue.submit(alert):
+        logger.warning(f"Webhook queue full ({webhook_queue.maxsize}), rejecting alert for "
+                       f"{alert.repository.get('full_name', 'unknown')}")
+        # GitHub redelivers on 5xx, Retry-After asks well-behaved senders to back off first
+        raise HTTPException(status_code=503, detail="Alert queue is full", headers={"Retry-After": "1"})
+
+    return {"status": "accepted", "message": "Alert queued for processing"}
+
+@app.get("/webhook/metrics")
+async def webhook_metrics():
+    """
+    Backpressure metrics for the webhook work queue
+    """
+    return webhook_queue.metrics()
 
 @app.post("/webhook/github/test")
 async def test_webhook():
@@ -153,66 +524,239 @@ async def test_webhook():
     await manager.broadcast(json.dumps(test_alert))
     return {"status": "success", "message": "Test alert sent"}
 
-# GitHub API functions
-async def fetch_github_repositories(username: str) -> List[Dict[str, Any]]:
+# GitHub API client settings
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+GITHUB_CACHE_SIZE = int(os.getenv("GITHUB_CACHE_SIZE", "1024"))
+GITHUB_CACHE_TTL = float(os.getenv("GITHUB_CACHE_TTL", "60"))
+GITHUB_MAX_CONCURRENCY = int(os.getenv("GITHUB_MAX_CONCURRENCY", "8"))
+
+class GitHubRateLimited(Exception):
+    def __init__(self, reset_at: float):
+        super().__init__("GitHub API rate limit exhausted")
+        self.reset_at = reset_at
+
+class CachedResponse:
+    def __init__(self, etag: Optional[str], data: Any, links: Dict[str, Any], fetched_at: float):
+        self.etag = etag
+        self.data = data
+        self.links = links
+        self.fetched_at = fetched_at
+
+class GitHubClient:
     """
-    Fetch public repositories for a GitHub user
+    App-lifetime GitHub API client: one pooled HTTP/2 connection set, concurrent page fetches
+    driven by Link headers, and an LRU cache revalidated with If-None-Match once its TTL expires.
     """
-    try:
-        async with httpx.AsyncClient() as client:
-            # Fetch public repositories
-            response = await client.get(
-                f"https://api.github.com/users/{username}/repos",
-                params={
-                    "type": "public",
-                    "sort": "updated",
-                    "per_page": 100
-                },
-                headers={
-                    "Accept": "application/vnd.github.v3+json",
-                    "User-Agent": "GitHub-Security-Alerts-Dashboard"
-                }
+    def __init__(self, base_url: str = GITHUB_API_URL, token: Optional[str] = GITHUB_TOKEN,
+                 cache_size: int = GITHUB_CACHE_SIZE, cache_ttl: float = GITHUB_CACHE_TTL,
+                 max_concurrency: int = GITHUB_MAX_CONCURRENCY):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.cache: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.max_concurrency = max_concurrency
+        self.rate_remaining: Optional[int] = None
+        self.rate_reset: float = 0.0
+        self.client: Optional[httpx.AsyncClient] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+    def _client(self) -> httpx.AsyncClient:
+        if self.client is None:
+            try:
+                import h2  # noqa: F401
+                http2 = True
+            except ImportError:
+                logger.warning("h2 is not installed, GitHub API client falling back to HTTP/1.1")
+                http2 = False
+            headers = {
+                "Accept": "application/vnd.github.v3+json",
+                "User-Agent": "GitHub-Security-Alerts-Dashboard"
+            }
+            if self.token:
+                headers["Authorization"] = f"Bearer {self.token}"
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                http2=http2,
+                timeout=httpx.Timeout(10.0),
+                limits=httpx.Limits(max_connections=self.max_concurrency * 2,
+                                    max_keepalive_connections=self.max_concurrency)
             )
-            
-            logger.info(f"GitHub API response status: {response.status_code}")
-            
-            if response.status_code == 404:
-                raise HTTPException(status_code=404, detail="GitHub user not found")
-            elif response.status_code != 200:
-                logger.error(f"GitHub API error: {response.status_code} - {response.text}")
-                raise HTTPException(status_code=response.status_code, detail=f"GitHub API error: {response.status_code}")
-            
-            repos_data = response.json()
-            logger.info(f"Found {len(repos_data)} repositories from GitHub API")
-            
-            repositories = []
-            
-            for repo in repos_data:
-                if not repo.get("private", True):  # Only public repositories
-                    repository = {
-                        "id": repo["id"],
-                        "name": repo["name"],
-                        "full_name": repo["full_name"],
-                        "description": repo.get("description"),
-                        "private": repo.get("private", False),
-                        "html_url": repo["html_url"],
-                        "created_at": repo["created_at"],
-                        "updated_at": repo["updated_at"],
-                        "language": repo.get("language"),
-                        "stargazers_count": repo.get("stargazers_count", 0),
-                        "forks_count": repo.get("forks_count", 0)
-                    }
-                    repositories.append(repository)
-            
-            logger.info(f"Filtered to {len(repositories)} public repositories")
-            return repositories
-            
-    except httpx.RequestError as e:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def _remember(self, key: str, entry: CachedResponse):
+        self.cache[key] = entry
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _track_rate_limit(self, response: httpx.Response):
+        remaining = response.headers.get("x-ratelimit-remaining")
+        reset = response.headers.get("x-ratelimit-reset")
+        if remaining is not None:
+            self.rate_remaining = int(remaining)
+        if reset is not None:
+            self.rate_reset = float(reset)
+        retry_after = response.headers.get("retry-after")
+        if retry_after is not None and response.status_code in (403, 429):
+            # Secondary rate limits name a wait instead of exhausting the hourly quota
+            try:
+                self.rate_reset = time.time() + float(retry_after)
+                self.rate_remaining = 0
+            except ValueError:
+                logger.warning(f"Ignoring unparseable GitHub Retry-After: {retry_after}")
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> CachedResponse:
+        """
+        GET a JSON resource. Fresh cache entries are served without a request, stale ones are
+        revalidated (a 304 does not count against the rate limit), and while the rate limit is
+        exhausted stale entries are served as they are.
+        """
+        client = self._client()
+        key = str(client.build_request("GET", path, params=params).url)
+        cached = self.cache.get(key)
+        now = time.time()
+        if cached is not None:
+            self.cache.move_to_end(key)
+            if now - cached.fetched_at < self.cache_ttl:
+                return cached
+
+        if self.rate_remaining == 0 and now < self.rate_reset:
+            if cached is not None:
+                return cached
+            raise GitHubRateLimited(self.rate_reset)
+
+        headers = {"If-None-Match": cached.etag} if cached is not None and cached.etag else {}
+        async with self.semaphore:
+            response = await client.get(path, params=params, headers=headers)
+        self._track_rate_limit(response)
+
+        if response.status_code == 304 and cached is not None:
+            cached.fetched_at = now
+            return cached
+        if response.status_code in (403, 429) and self.rate_remaining == 0:
+            if cached is not None:
+                return cached
+            raise GitHubRateLimited(self.rate_reset)
+        if response.status_code == 404:
+            raise HTTPException(status_code=404, detail="GitHub resource not found")
+        if response.status_code != 200:
+            logger.error(f"GitHub API error: {response.status_code} - {response.text}")
+            raise HTTPException(status_code=response.status_code, detail=f"GitHub API error: {response.status_code}")
+
+        entry = CachedResponse(response.headers.get("etag"), response.json(), response.links, now)
+        self._remember(key, entry)
+        return entry
+
+    async def iter_pages(self, path: str, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[List[Any]]:
+        """
+        Yield every page of a paginated list in order. The first page's Link header gives the
+        last page number; the remaining pages are then requested concurrently.
+        """
+        params = dict(params or {})
+        first = await self.get(path, params)
+        yield first.data
+
+        last_url = first.links.get("last", {}).get("url")
+        if not last_url:
+            return
+        last_page = int(httpx.URL(last_url).params.get("page", "1"))
+        pages = [
+            asyncio.create_task(self.get(path, {**params, "page": page}))
+            for page in range(2, last_page + 1)
+        ]
+        try:
+            for page in pages:
+                yield (await page).data
+        finally:
+            for page in pages:
+                page.cancel()
+            await asyncio.gather(*pages, return_exceptions=True)
+
+    def iter_user_repo_pages(self, username: str) -> AsyncIterator[List[Dict[str, Any]]]:
+        return self.iter_pages(f"/users/{username}/repos",
+                               {"type": "public", "sort": "updated", "per_page": 100})
+
+github = GitHubClient()
+
+@app.on_event("shutdown")
+async def close_github_client():
+    await github.close()
+
+# GitHub API functions
+# Repository fields returned to the dashboard, with the value used when GitHub omits one
+REPOSITORY_FIELDS: Dict[str, Any] = {
+    "id": None,
+    "name": None,
+    "full_name": None,
+    "description": None,
+    "private": False,
+    "html_url": None,
+    "created_at": None,
+    "updated_at": None,
+    "language": None,
+    "stargazers_count": 0,
+    "forks_count": 0
+}
+
+def project_repositories(repos: List[Dict[str, Any]], fields: List[str]) -> List[Dict[str, Any]]:
+    """
+    Keep public repositories only, reduced to the requested fields
+    """
+    return [
+        {field: repo.get(field, REPOSITORY_FIELDS[field]) for field in fields}
+        for repo in repos
+        if not repo.get("private", True)
+    ]
+
+def github_http_error(e: Exception) -> HTTPException:
+    if isinstance(e, HTTPException):
+        if e.status_code == 404:
+            return HTTPException(status_code=404, detail="GitHub user not found")
+        return e
+    if isinstance(e, GitHubRateLimited):
+        retry_after = max(1, int(e.reset_at - time.time()))
+        logger.warning(f"GitHub API rate limit exhausted, resets in {retry_after}s")
+        return HTTPException(status_code=429, detail="GitHub API rate limit exceeded",
+                             headers={"Retry-After": str(retry_after)})
+    if isinstance(e, httpx.RequestError):
         logger.error(f"HTTP error fetching GitHub repositories: {e}")
-        raise HTTPException(status_code=500, detail="Failed to connect to GitHub API")
+        return HTTPException(status_code=500, detail="Failed to connect to GitHub API")
+    logger.error(f"Unexpected error fetching repositories: {e}")
+    return HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+async def iter_github_repositories(username: str, fields: Optional[List[str]] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yield a user's public repositories one GitHub page at a time, in order
+    """
+    fields = fields or list(REPOSITORY_FIELDS)
+    pages = github.iter_user_repo_pages(username)
+    try:
+        async for page in pages:
+            yield project_repositories(page, fields)
     except Exception as e:
-        logger.error(f"Unexpected error fetching repositories: {e}")
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+        raise github_http_error(e)
+    finally:
+        # async for does not close the inner generator when this one is closed early
+        await pages.aclose()
+
+async def fetch_github_repositories(username: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Fetch public repositories for a GitHub user
+    """
+    repositories = []
+    async for page in iter_github_repositories(username, fields):
+        repositories.extend(page)
+    logger.info(f"Found {len(repositories)} public repositories")
+    return repositories
 
 @app.get("/test")
 async def test_endpoint():
@@ -222,13 +766,25 @@ async def test_endpoint():
     return {"message": "Backend is working", "timestamp": datetime.now().isoformat()}
 
 @app.get("/github/repositories/{username}")
-async def get_github_repositories(username: str):
+async def get_github_repositories(username: str, format: str = "json", fields: Optional[str] = None):
     """
-    Fetch public repositories from GitHub for a user
+    Fetch public repositories from GitHub for a user.
+    format=ndjson streams one repository per line as GitHub pages arrive; fields limits each
+    repository to a comma-separated subset of REPOSITORY_FIELDS.
     """
+    selected = split_param(fields) if fields else list(REPOSITORY_FIELDS)
+    unknown = [field for field in selected if field not in REPOSITORY_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown repository fields: {', '.join(unknown)}")
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be json or ndjson")
+
     try:
         logger.info(f"Fetching repositories for user: {username}")
-        repositories = await fetch_github_repositories(username)
+        if format == "ndjson":
+            return await stream_github_repositories(username, selected)
+
+        repositories = await fetch_github_repositories(username, selected)
         logger.info(f"Successfully fetched {len(repositories)} repositories")
         return {
             "repositories": repositories,
@@ -241,6 +797,32 @@ async def get_github_repositories(username: str):
         logger.error(f"Error fetching GitHub repositories for {username}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch repositories: {str(e)}")
 
+async def stream_github_repositories(username: str, fields: List[str]) -> StreamingResponse:
+    """
+    The first page is fetched before the response starts so that lookup errors still get a
+    proper status code; an error on a later page ends the stream with an {"error": ...} line.
+    """
+    pages = iter_github_repositories(username, fields)
+    first_page = await pages.__anext__()
+
+    async def lines():
+        count = len(first_page)
+        try:
+            yield "".join(json.dumps(repo) + "\n" for repo in first_page)
+            async for page in pages:
+                count += len(page)
+                yield "".join(json.dumps(repo) + "\n" for repo in page)
+        except HTTPException as e:
+            logger.error(f"Repository stream for {username} failed after {count} repositories: {e.detail}")
+            yield json.dumps({"error": e.detail}) + "\n"
+            return
+        finally:
+            # Cancels the page fetches still in flight when the client goes away mid-stream
+            await pages.aclose()
+        logger.info(f"Streamed {count} repositories for {username}")
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 # Repository subscription models
 class RepositorySubscription(BaseModel):
     username: str
@@ -251,15 +833,128 @@ class SubscriptionRequest(BaseModel):
     username: str
     repositories: List[str]
 
-# Store subscribed repositories
-subscribed_repos: List[RepositorySubscription] = []
+# Subscription store settings
+SUBSCRIPTIONS_DB = os.getenv("SUBSCRIPTIONS_DB", "subscriptions.db")
+
+class SubscriptionStore:
+    """
+    Repository subscriptions indexed by full_name and by username, persisted to SQLite.
+    Every lookup is served from memory. The database is opened and read in the startup hook and
+    only written afterwards, on a dedicated thread that owns the connection, so sqlite I/O never
+    blocks the event loop.
+    """
+    def __init__(self, path: str = SUBSCRIPTIONS_DB):
+        self.path = path
+        self.by_full_name: Dict[str, RepositorySubscription] = {}
+        self.by_username: Dict[str, Dict[str, RepositorySubscription]] = {}
+        self.db: Optional[sqlite3.Connection] = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="subscriptions")
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def open(self):
+        rows = await self._run(self._connect)
+        for full_name, username, repository in rows:
+            self._index(RepositorySubscription.model_construct(
+                username=username, repository=repository, full_name=full_name
+            ))
+        logger.info(f"Loaded {len(self.by_full_name)} repository subscriptions")
+
+    def _connect(self) -> List[Tuple[str, str, str]]:
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS subscriptions ("
+            "full_name TEXT PRIMARY KEY, username TEXT NOT NULL, repository TEXT NOT NULL)"
+        )
+        self.db.commit()
+        return self.db.execute("SELECT full_name, username, repository FROM subscriptions ORDER BY rowid").fetchall()
+
+    def _index(self, subscription: RepositorySubscription):
+        self.by_full_name[subscription.full_name] = subscription
+        self.by_username.setdefault(subscription.username, {})[subscription.full_name] = subscription
+
+    def __len__(self) -> int:
+        return len(self.by_full_name)
+
+    def __contains__(self, full_name: str) -> bool:
+        return full_name in self.by_full_name
+
+    def all(self) -> List[RepositorySubscription]:
+        return list(self.by_full_name.values())
+
+    def for_user(self, username: str) -> List[RepositorySubscription]:
+        return list(self.by_username.get(username, {}).values())
+
+    def _insert(self, rows: List[Tuple[str, str, str]]):
+        with self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO subscriptions (full_name, username, repository) VALUES (?, ?, ?)", rows
+            )
+
+    def _delete(self, full_name: str):
+        with self.db:
+            self.db.execute("DELETE FROM subscriptions WHERE full_name = ?", (full_name,))
+
+    async def subscribe(self, username: str, repositories: List[str]) -> List[RepositorySubscription]:
+        """
+        Add subscriptions that do not exist yet and return only the new ones
+        """
+        new_repos: Dict[str, RepositorySubscription] = {}
+        for repo_name in repositories:
+            full_name = f"{username}/{repo_name}"
+            if full_name in self.by_full_name or full_name in new_repos:
+                continue
+            new_repos[full_name] = RepositorySubscription(username=username, repository=repo_name, full_name=full_name)
+
+        if not new_repos:
+            return []
+        # Persist first so a failed write leaves the in-memory index untouched
+        await self._run(self._insert, [(repo.full_name, repo.username, repo.repository) for repo in new_repos.values()])
+        # A concurrent request may have added some of them while the write ran
+        added = [repo for repo in new_repos.values() if repo.full_name not in self.by_full_name]
+        for subscription in added:
+            self._index(subscription)
+        return added
+
+    async def unsubscribe(self, full_name: str) -> bool:
+        if full_name not in self.by_full_name:
+            return False
+        await self._run(self._delete, full_name)
+        subscription = self.by_full_name.pop(full_name, None)
+        if subscription is None:
+            return False
+        user_repos = self.by_username.get(subscription.username)
+        if user_repos is not None:
+            user_repos.pop(full_name, None)
+            if not user_repos:
+                del self.by_username[subscription.username]
+        return True
+
+    async def close(self):
+        if self.db is not None:
+            await self._run(self.db.close)
+            self.db = None
+        self.executor.shutdown(wait=False)
+
+subscriptions = SubscriptionStore()
+
+@app.on_event("startup")
+async def open_subscription_store():
+    await subscriptions.open()
+
+@app.on_event("shutdown")
+async def close_subscription_store():
+    await subscriptions.close()
 
 @app.get("/repositories")
 async def get_subscribed_repositories():
     """
     Get all subscribed repositories
     """
-    return {"repositories": subscribed_repos}
+    return {"repositories": subscriptions.all()}
 
 @app.post("/repositories/subscribe")
 async def subscribe_to_repositories(request: SubscriptionRequest):
@@ -267,18 +962,8 @@ async def subscribe_to_repositories(request: SubscriptionRequest):
     Subscribe to GitHub repositories for security alerts
     """
     try:
-        new_repos = []
-        for repo_name in request.repositories:
-            full_name = f"{request.username}/{repo_name}"
-            subscription = RepositorySubscription(
-                username=request.username,
-                repository=repo_name,
-                full_name=full_name
-            )
-            if not any(r.full_name == full_name for r in subscribed_repos):
-                subscribed_repos.append(subscription)
-                new_repos.append(subscription)
-        
+        new_repos = await subscriptions.subscribe(request.username, request.repositories)
+
         logger.info(f"Subscribed to {len(new_repos)} repositories for user {request.username}")
         return {
             "status": "success", 
@@ -296,8 +981,7 @@ async def unsubscribe_from_repository(username: str, repository: str):
     """
     try:
         full_name = f"{username}/{repository}"
-        global subscribed_repos
-        subscribed_repos = [repo for repo in subscribed_repos if repo.full_name != full_name]
+        await subscriptions.unsubscribe(full_name)
         
         logger.info(f"Unsubscribed from {full_name}")
         return {"status": "success", "message": f"Unsubscribed from {full_name}"}
@@ -310,8 +994,7 @@ async def get_user_repositories(username: str):
     """
     Get repositories for a specific user
     """
-    user_repos = [repo for repo in subscribed_repos if repo.username == username]
-    return {"repositories": user_repos}
+    return {"repositories": subscriptions.for_user(username)}
 
 if __name__ == "__main__":
     import uvicorn
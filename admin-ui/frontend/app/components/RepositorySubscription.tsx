@@ -44,12 +44,42 @@ export default function RepositorySubscription({ onRepositoriesChange }: Reposit
     setMessage('')
 
     try {
-      const response = await fetch(`http://localhost:8000/github/repositories/${username}`)
-      if (response.ok) {
-        const data = await response.json()
-        setGithubRepos(data.repositories || [])
+      // Stream repositories as NDJSON so the list renders while later pages are still loading
+      const response = await fetch(
+        `http://localhost:8000/github/repositories/${username}?format=ndjson&fields=id,name,full_name,description`
+      )
+      if (response.ok && response.body) {
+        const reader = response.body.getReader()
+        const decoder = new TextDecoder()
+        let buffer = ''
+        let count = 0
+        let streamError = ''
+        setGithubRepos([])
         setShowGithubRepos(true)
-        setMessage(`Found ${data.repositories?.length || 0} public repositories`)
+
+        while (true) {
+          const { done, value } = await reader.read()
+          if (done) break
+          buffer += decoder.decode(value, { stream: true })
+          const lines = buffer.split('\n')
+          buffer = lines.pop() || ''
+          const batch: any[] = []
+          for (const line of lines) {
+            if (!line) continue
+            const item = JSON.parse(line)
+            if (item.error) {
+              streamError = item.error
+            } else {
+              batch.push(item)
+            }
+          }
+          if (batch.length > 0) {
+            count += batch.length
+            setGithubRepos(prev => [...prev, ...batch])
+            setMessage(`Loading... ${count} public repositories so far`)
+          }
+        }
+        setMessage(streamError ? `Found ${count} public repositories (${streamError})` : `Found ${count} public repositories`)
       } else {
         const errorData = await response.json()
         setMessage(errorData.detail || 'Failed to fetch repositories')
@@ -14,22 +14,38 @@ export default function Home() {
   const [connectionStatus, setConnectionStatus] = useState<'connecting' | 'connected' | 'disconnected'>('connecting')
   const [subscribedRepos, setSubscribedRepos] = useState<any[]>([])
   const ws = useRef<WebSocket | null>(null)
+  const subscribedReposRef = useRef<any[]>([])
+
+  // Ask the backend to only route alerts for the subscribed repositories (none = all alerts)
+  const sendAlertFilter = (repositories: any[]) => {
+    if (ws.current?.readyState === WebSocket.OPEN) {
+      ws.current.send(JSON.stringify({ repositories: repositories.map(r => r.full_name) }))
+    }
+  }
+
+  useEffect(() => {
+    subscribedReposRef.current = subscribedRepos
+    sendAlertFilter(subscribedRepos)
+  }, [subscribedRepos])
 
   useEffect(() => {
     // Connect to WebSocket
     const connectWebSocket = () => {
       try {
-        ws.current = new WebSocket('ws://localhost:8000/ws')
+        // Batched mode: one frame (a JSON array) per 50 ms window, repeats collapsed server-side
+        ws.current = new WebSocket('ws://localhost:8000/ws?batch_ms=50&dedupe=true')
         
         ws.current.onopen = () => {
           console.log('WebSocket connected')
           setConnectionStatus('connected')
+          sendAlertFilter(subscribedReposRef.current)
         }
         
         ws.current.onmessage = (event) => {
           try {
-            const alert: SecurityAlert = JSON.parse(event.data)
-            setAlerts(prev => [alert, ...prev])
+            const data: SecurityAlert | SecurityAlert[] = JSON.parse(event.data)
+            const batch = Array.isArray(data) ? data.reverse() : [data]
+            setAlerts(prev => [...batch, ...prev])
           } catch (error) {
             console.error('Error parsing WebSocket message:', error)
           }
@@ -0,0 +1,132 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+import importlib.util
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_service(name: str, relative_path: str):
+    """
+    Import a service's main.py under a unique module name.
+    The backends all ship a top-level main.py, so they cannot share sys.modules["main"].
+    """
+    path = os.path.join(REPO_ROOT, relative_path)
+    service_dir = os.path.dirname(path)
+    if service_dir not in sys.path:
+        sys.path.insert(0, service_dir)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def quiet_logging():
+    """
+    The services log every request at INFO, which would dominate the measurements
+    """
+    logging.disable(logging.INFO)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float], elapsed: float) -> Dict[str, float]:
+    """
+    Latency samples are in seconds; the summary is reported in milliseconds
+    """
+    return {
+        "count": len(samples),
+        "throughput_per_s": len(samples) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(service_dir: str, env: Optional[Dict[str, str]] = None, ready_path: str = "/health",
+          app: str = "main:app") -> Iterator[str]:
+    """
+    Run a backend under uvicorn in a child process and yield its base URL.
+    The child's log output goes to a temporary file and is only shown if it fails to start.
+    """
+    with serve_process(service_dir, env, ready_path, app) as (base_url, _):
+        yield base_url
+
+
+@contextmanager
+def serve_process(service_dir: str, env: Optional[Dict[str, str]] = None, ready_path: str = "/health",
+                  app: str = "main:app") -> Iterator[Tuple[str, subprocess.Popen]]:
+    """serve(), also yielding the child process (to measure its memory)"""
+    port = free_port()
+    log = tempfile.TemporaryFile(mode="w+")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=os.path.join(REPO_ROOT, service_dir),
+        env={**os.environ, **(env or {})},
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                if httpx.get(base_url + ready_path, timeout=1).status_code < 500:
+                    break
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                log.seek(0)
+                raise RuntimeError(f"{service_dir} did not start:\n{log.read()[-4000:]}")
+            time.sleep(0.1)
+        yield base_url, process
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        log.close()
+
+
+def process_memory_mb(pid: int) -> Dict[str, float]:
+    """Resident set size and its peak so far (VmRSS, VmHWM) of a process, in MB; Linux only"""
+    memory = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                name, value, _ = line.split()
+                memory["rss_mb" if name == "VmRSS:" else "peak_rss_mb"] = int(value) / 1024
+    return memory
@@ -0,0 +1,69 @@
+"""
+/health latency of the exposed-app backend while EC2 listings are in flight.
+
+Starts the backend under uvicorn against the local AWS stub (with added per-request latency),
+fires concurrent /ec2/instances requests and samples /health until they have all returned.
+
+    python bench/ec2_health.py --listings 100 --latency-ms 200
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from aws_stub import STUB_CREDENTIALS, aws_stub, seed_instances
+from common import Timer, serve, summarize
+
+
+async def run(base_url: str, args):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120,
+                                 limits=httpx.Limits(max_connections=args.listings + 10)) as client:
+        listing_latencies = []
+
+        async def listing():
+            start = time.perf_counter()
+            response = await client.post("/ec2/instances", json={"region": args.region})
+            response.raise_for_status()
+            listing_latencies.append(time.perf_counter() - start)
+
+        with Timer() as total:
+            listings = [asyncio.create_task(listing()) for _ in range(args.listings)]
+            health_latencies = []
+            while not all(task.done() for task in listings):
+                start = time.perf_counter()
+                (await client.get("/health")).raise_for_status()
+                health_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+            await asyncio.gather(*listings)
+
+    return {
+        "health": summarize(health_latencies, total.elapsed),
+        "listings": summarize(listing_latencies, total.elapsed),
+    }
+
+
+def main(args):
+    with aws_stub(args.latency_ms) as endpoint_url:
+        seed_instances(endpoint_url, args.region, args.instances)
+        env = {**STUB_CREDENTIALS, "AWS_ENDPOINT_URL": endpoint_url}
+        with serve("exposed-app/backend", env=env) as base_url:
+            results = asyncio.run(run(base_url, args))
+
+    health, listings = results["health"], results["listings"]
+    print(f"/health during {args.listings} listings: p50={health['p50_ms']:.1f}ms  p99={health['p99_ms']:.1f}ms  "
+          f"({health['count']} samples)")
+    print(f"/ec2/instances: p50={listings['p50_ms']:.0f}ms  p99={listings['p99_ms']:.0f}ms")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--listings", type=int, default=100)
+    parser.add_argument("--instances", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--region", default="us-east-1")
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
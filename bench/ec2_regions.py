@@ -0,0 +1,62 @@
+"""
+Full-account EC2 inventory: one /ec2/instances call per region versus /ec2/instances/regions.
+
+    python bench/ec2_regions.py --latency-ms 300 --instances 20
+"""
+import argparse
+import json
+import time
+
+import httpx
+
+from aws_stub import STUB_CREDENTIALS, aws_stub, seed_instances
+from common import Timer, serve
+
+SEEDED_REGIONS = ["us-east-1", "eu-west-1", "ap-northeast-1"]
+
+
+def main(args):
+    with aws_stub(args.latency_ms) as endpoint_url:
+        for region in SEEDED_REGIONS:
+            seed_instances(endpoint_url, region, args.instances)
+        env = {**STUB_CREDENTIALS, "AWS_ENDPOINT_URL": endpoint_url, "AWS_WARM_REGIONS": ""}
+        with serve("exposed-app/backend", env=env) as base_url:
+            with httpx.Client(base_url=base_url, timeout=300) as client:
+                regions = [region["code"] for region in client.get("/ec2/regions").json()["regions"]]
+
+                with Timer() as sequential:
+                    sequential_count = sum(
+                        client.post("/ec2/instances", json={"region": region}).json()["total_count"]
+                        for region in regions
+                    )
+
+                first_region_at = None
+                lines = []
+                with Timer() as parallel:
+                    with client.stream("POST", "/ec2/instances/regions", json={}) as response:
+                        for line in response.iter_lines():
+                            if first_region_at is None:
+                                first_region_at = time.perf_counter() - parallel.start
+                            lines.append(json.loads(line))
+    summary = lines[-1]["summary"]
+
+    results = {
+        "regions": len(regions),
+        "sequential_s": sequential.elapsed,
+        "parallel_s": parallel.elapsed,
+        "first_region_s": first_region_at,
+        "instances": {"sequential": sequential_count, "parallel": summary["total_count"]},
+        "failed_regions": summary["failed"],
+    }
+    print(f"{len(regions)} regions: sequential {sequential.elapsed:.2f}s, parallel {parallel.elapsed:.2f}s "
+          f"(first region after {first_region_at:.2f}s), instances {sequential_count}/{summary['total_count']}")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--instances", type=int, default=20)
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
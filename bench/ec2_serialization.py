@@ -0,0 +1,150 @@
+"""
+Per-instance cost of turning a describe_instances response into the /ec2/instances body.
+
+"models" is the previous path: an EC2Instance model per instance built with Python loops,
+re-validated inside EC2ListResponse and encoded by FastAPI (jsonable_encoder + json.dumps).
+"projection" is the current one: raw dicts projected to plain dicts and dumped straight to
+bytes (orjson when installed; "projection-stdlib" forces the json fallback).
+
+    python bench/ec2_serialization.py --instances 10000
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi.encoders import jsonable_encoder
+
+from common import load_service, quiet_logging
+
+os.environ.setdefault("AWS_WARM_REGIONS", "")
+os.environ.setdefault("EC2_INVENTORY_REFRESH_SECONDS", "0")
+
+
+def describe_instances_response(count: int):
+    """A describe_instances response shaped like boto3's, including fields the API drops"""
+    launched = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    instances = []
+    for i in range(count):
+        instances.append({
+            "InstanceId": f"i-{i:017x}",
+            "InstanceType": "m5.large" if i % 3 else "t3.micro",
+            "State": {"Code": 16, "Name": "running" if i % 4 else "stopped"},
+            "PublicIpAddress": f"54.0.{i // 256 % 256}.{i % 256}" if i % 2 else None,
+            "PrivateIpAddress": f"10.0.{i // 256 % 256}.{i % 256}",
+            "LaunchTime": launched + timedelta(minutes=i),
+            "Tags": [{"Key": f"tag-{t}", "Value": f"value-{i % 10}-{t}"} for t in range(6)],
+            "SecurityGroups": [{"GroupName": f"sg-name-{g}", "GroupId": f"sg-{g:08x}"} for g in range(2)],
+            "VpcId": f"vpc-{i % 5:08x}",
+            "SubnetId": f"subnet-{i % 20:08x}",
+            "Placement": {"AvailabilityZone": "us-east-1a", "Tenancy": "default"},
+            "ImageId": "ami-12345678",
+            "Architecture": "x86_64",
+            "BlockDeviceMappings": [{"DeviceName": "/dev/xvda", "Ebs": {"VolumeId": f"vol-{i:08x}"}}],
+            "NetworkInterfaces": [{"NetworkInterfaceId": f"eni-{i:08x}", "PrivateIpAddress": "10.0.0.1"}],
+        })
+    return {"Reservations": [{"Instances": instances[i:i + 100]} for i in range(0, count, 100)]}
+
+
+def legacy_serialize(main, response) -> bytes:
+    instances = []
+    for reservation in response["Reservations"]:
+        for instance in reservation["Instances"]:
+            tags = {}
+            if "Tags" in instance:
+                for tag in instance["Tags"]:
+                    tags[tag["Key"]] = tag["Value"]
+            security_groups = []
+            if "SecurityGroups" in instance:
+                for sg in instance["SecurityGroups"]:
+                    security_groups.append(sg["GroupName"])
+            instances.append(main.EC2Instance(
+                instance_id=instance["InstanceId"],
+                instance_type=instance["InstanceType"],
+                state=instance["State"]["Name"],
+                public_ip=instance.get("PublicIpAddress"),
+                private_ip=instance.get("PrivateIpAddress"),
+                launch_time=instance.get("LaunchTime").isoformat() if instance.get("LaunchTime") else None,
+                tags=tags,
+                security_groups=security_groups,
+                vpc_id=instance.get("VpcId"),
+                subnet_id=instance.get("SubnetId"),
+                availability_zone=instance.get("Placement", {}).get("AvailabilityZone"),
+            ))
+    body = main.EC2ListResponse(
+        instances=instances,
+        total_count=len(instances),
+        region="us-east-1",
+        access_key_used="AKIAEXAMPLE",
+        timestamp=datetime.now().isoformat(),
+    )
+    # What FastAPI does with a returned model when the route has no response_model
+    return json.dumps(jsonable_encoder(body), ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode()
+
+
+def projection_serialize(main, response) -> bytes:
+    instances = main.parse_ec2_instances(response)
+    return main.dump_json({
+        "instances": instances,
+        "total_count": len(instances),
+        "region": "us-east-1",
+        "access_key_used": "AKIAEXAMPLE",
+        "timestamp": datetime.now().isoformat(),
+        "next_cursor": None,
+        "version": None,
+    })
+
+
+def best_of(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(args):
+    quiet_logging()
+    service = load_service("exposed_app_main", "exposed-app/backend/main.py")
+    response = describe_instances_response(args.instances)
+
+    legacy = json.loads(legacy_serialize(service, response))
+    current = json.loads(projection_serialize(service, response))
+    assert legacy["instances"] == current["instances"], "projection output differs from the model path"
+
+    def stdlib_serialize():
+        orjson, service.orjson = service.orjson, None
+        try:
+            return projection_serialize(service, response)
+        finally:
+            service.orjson = orjson
+
+    paths = {
+        "models": lambda: legacy_serialize(service, response),
+        "projection": lambda: projection_serialize(service, response),
+        "projection-stdlib": stdlib_serialize,
+    }
+    results = {"instances": args.instances, "orjson": service.orjson is not None, "paths": {}}
+    for name, fn in paths.items():
+        elapsed = best_of(fn, args.repeats)
+        results["paths"][name] = {
+            "total_ms": elapsed * 1000,
+            "per_instance_us": elapsed / args.instances * 1e6,
+        }
+        print(f"{name:>18}: {elapsed * 1000:8.1f} ms total, {elapsed / args.instances * 1e6:6.2f} us/instance")
+    speedup = results["paths"]["models"]["total_ms"] / results["paths"]["projection"]["total_ms"]
+    results["speedup"] = speedup
+    print(f"projection is {speedup:.1f}x faster than models")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--instances", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,54 @@
+"""
+/github/repositories/{username} against the local GitHub stub.
+
+Reports cold (every page fetched) and warm (served from, or revalidated against, the cache)
+latency for an account with many repositories.
+
+    python bench/github_repositories.py --repos 2500 --latency-ms 50
+"""
+import argparse
+import json
+import os
+
+import httpx
+
+from common import REPO_ROOT, Timer, serve, summarize
+
+
+def main(args):
+    stub_env = {"STUB_LATENCY_MS": str(args.latency_ms)}
+    with serve("bench", env=stub_env, app="github_stub:app") as stub_url:
+        backend_env = {"GITHUB_API_URL": stub_url, "GITHUB_CACHE_TTL": str(args.cache_ttl),
+                       "SUBSCRIPTIONS_DB": ":memory:"}
+        with serve("admin-ui/backend", env=backend_env) as base_url:
+            username = f"org-{args.repos}"
+            results = {}
+            with httpx.Client(base_url=base_url, timeout=60) as client:
+                for phase in ("cold", "warm"):
+                    latencies = []
+                    with Timer() as total:
+                        for _ in range(1 if phase == "cold" else args.iterations):
+                            with Timer() as t:
+                                response = client.get(f"/github/repositories/{username}")
+                            response.raise_for_status()
+                            latencies.append(t.elapsed)
+                    results[phase] = summarize(latencies, total.elapsed)
+                    results[phase]["repositories"] = response.json()["total_count"]
+            results["stub"] = httpx.get(stub_url + "/health").json()
+
+    for phase in ("cold", "warm"):
+        stats = results[phase]
+        print(f"{phase:>5}: {stats['repositories']} repositories  p50={stats['p50_ms']:.1f}ms  p99={stats['p99_ms']:.1f}ms")
+    print(f"stub requests: {results['stub']}")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repos", type=int, default=2500)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--cache-ttl", type=float, default=60)
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
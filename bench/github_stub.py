@@ -0,0 +1,81 @@
+"""
+Local stand-in for the parts of the GitHub REST API the admin-ui backend uses.
+
+/users/{username}/repos paginates with Link headers, answers If-None-Match with 304 and sends
+rate-limit headers. A username ending in a number (e.g. "org-2500") owns that many public
+repositories; anyone else owns 30. STUB_LATENCY_MS adds a delay to every response.
+
+    python -m uvicorn github_stub:app --port 9000
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+
+from fastapi import FastAPI, Request, Response
+
+app = FastAPI(title="GitHub API stub")
+
+LATENCY = float(os.getenv("STUB_LATENCY_MS", "0")) / 1000
+RATE_LIMIT = int(os.getenv("STUB_RATE_LIMIT", "5000"))
+stats = {"requests": 0, "not_modified": 0}
+
+
+def repo(username: str, number: int) -> dict:
+    return {
+        "id": number,
+        "name": f"repo-{number}",
+        "full_name": f"{username}/repo-{number}",
+        "description": f"Repository {number}",
+        "private": False,
+        "html_url": f"https://github.com/{username}/repo-{number}",
+        "created_at": "2024-01-01T00:00:00Z",
+        "updated_at": "2025-01-01T00:00:00Z",
+        "language": "Python",
+        "stargazers_count": number % 97,
+        "forks_count": number % 13,
+        "owner": {"login": username},
+        "topics": ["security", "stub"],
+    }
+
+
+@app.get("/health")
+async def health():
+    return stats
+
+
+@app.get("/users/{username}/repos")
+async def user_repos(username: str, request: Request, page: int = 1, per_page: int = 30):
+    stats["requests"] += 1
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+    if username == "missing":
+        return Response(status_code=404)
+
+    match = re.search(r"(\d+)$", username)
+    total = int(match.group(1)) if match else 30
+    per_page = max(1, min(per_page, 100))
+    last_page = max(1, -(-total // per_page))
+    start = (page - 1) * per_page
+    body = json.dumps([repo(username, n) for n in range(start, min(start + per_page, total))])
+    etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+
+    headers = {
+        "ETag": etag,
+        "X-RateLimit-Remaining": str(RATE_LIMIT - stats["requests"]),
+        "X-RateLimit-Reset": str(int(time.time()) + 3600),
+    }
+    base = str(request.url.remove_query_params("page"))
+    links = []
+    if page < last_page:
+        links.append(f'<{base}&page={page + 1}>; rel="next"')
+        links.append(f'<{base}&page={last_page}>; rel="last"')
+    if links:
+        headers["Link"] = ", ".join(links)
+
+    if request.headers.get("if-none-match") == etag:
+        stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,124 @@
+"""
+Throughput and latency of the CPU inference server (finetuned-model/backend) under concurrent load.
+
+"sequential" runs the server with MAX_BATCH_SIZE=1 and PREFIX_CACHE=0, i.e. one request at a time
+with its whole prompt prefilled, as a plain generate() loop would; "batched" uses continuous batching
+and the system-prompt KV cache. Clients stream /sql requests and time the first chunk (TTFT) and
+the whole answer. Without --model-dir the model is a small randomly initialised Llama with a local
+BPE tokenizer, which exercises the same code paths; its answers are noise and run to max tokens.
+
+    python bench/inference_server.py --requests 64 --concurrency 16 --max-new-tokens 32
+    python bench/inference_server.py --model-dir slm-model/.../merged_model
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+import httpx
+
+from common import percentile, serve, summarize
+from sft_preprocess import load_tokenizer, synthetic_rows
+
+
+def build_model(directory: str, args):
+    import torch
+    from transformers import LlamaConfig, LlamaForCausalLM
+
+    tokenizer, _ = load_tokenizer("TinyLlama/TinyLlama-1.1B-Chat-v1.0", synthetic_rows(2000))
+    torch.manual_seed(0)
+    config = LlamaConfig(vocab_size=len(tokenizer), hidden_size=args.hidden_size, intermediate_size=args.hidden_size * 11 // 4,
+                         num_hidden_layers=args.layers, num_attention_heads=8, num_key_value_heads=4,
+                         max_position_embeddings=2048, bos_token_id=tokenizer.bos_token_id,
+                         eos_token_id=tokenizer.eos_token_id)
+    model = LlamaForCausalLM(config)
+    # Random weights would stop on EOS at random points; keep every answer max_new_tokens long
+    model.generation_config.eos_token_id = None
+    model.save_pretrained(directory)
+    tokenizer.save_pretrained(directory)
+
+
+async def run(base_url: str, args):
+    rng = random.Random(0)
+    rows = synthetic_rows(args.requests, seed=1)
+    ttft, latency, tokens = [], [], 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=600,
+                                 limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        async def one(row):
+            nonlocal tokens
+            async with semaphore:
+                start = time.perf_counter()
+                first = None
+                body = {"question": row["question"], "context": row["context"],
+                        "max_new_tokens": rng.randint(args.max_new_tokens // 2, args.max_new_tokens), "stream": True}
+                async with client.stream("POST", "/sql", json=body) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        message = json.loads(line)
+                        if first is None and message.get("text"):
+                            first = time.perf_counter() - start
+                        if message.get("done"):
+                            tokens += message["usage"]["completion_tokens"]
+                latency.append(time.perf_counter() - start)
+                ttft.append(first if first is not None else latency[-1])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(row) for row in rows))
+        elapsed = time.perf_counter() - start
+        server = (await client.get("/stats")).json()
+
+    summary = summarize(latency, elapsed)
+    summary.update({
+        "tokens_per_s": tokens / elapsed,
+        "ttft_p50_ms": percentile(ttft, 50) * 1000,
+        "ttft_p95_ms": percentile(ttft, 95) * 1000,
+        "ttft_p99_ms": percentile(ttft, 99) * 1000,
+        "mean_batch_size": server["mean_batch_size"],
+        "prefix_hit_rate": server["prefix_hit_rate"],
+        "prefilled_tokens": server["prefilled_tokens"],
+    })
+    return summary
+
+
+def main(args):
+    env = {"HF_HUB_OFFLINE": "1", "MAX_NEW_TOKENS": str(args.max_new_tokens)}
+    if args.threads:
+        env["TORCH_THREADS"] = str(args.threads)
+    results = {}
+    with tempfile.TemporaryDirectory() as model_dir:
+        if args.model_dir:
+            model_dir = os.path.abspath(args.model_dir)
+        else:
+            build_model(model_dir, args)
+        modes = {"sequential": {"MAX_BATCH_SIZE": "1", "PREFIX_CACHE": "0"},
+                 "batched": {"MAX_BATCH_SIZE": str(args.max_batch_size), "PREFIX_CACHE": "1"}}
+        for mode, mode_env in modes.items():
+            with serve("finetuned-model/backend", env={**env, **mode_env, "MODEL_DIR": model_dir}) as base_url:
+                results[mode] = asyncio.run(run(base_url, args))
+
+    for mode, summary in results.items():
+        print(f"{mode:10s} {summary['throughput_per_s']:6.2f} req/s {summary['tokens_per_s']:8.1f} tok/s  "
+              f"latency p50/p95/p99 {summary['p50_ms']:.0f}/{summary['p95_ms']:.0f}/{summary['p99_ms']:.0f} ms  "
+              f"TTFT p50/p95 {summary['ttft_p50_ms']:.0f}/{summary['ttft_p95_ms']:.0f} ms  "
+              f"batch {summary['mean_batch_size']:.1f}  prefilled {summary['prefilled_tokens']} tokens")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model-dir", default=None, help="a merged_model directory instead of the random model")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--hidden-size", type=int, default=512)
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
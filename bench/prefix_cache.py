@@ -0,0 +1,97 @@
+"""
+Time to first token of the inference server's prefix cache on text-to-SQL traffic where schemas repeat.
+
+Questions are asked one at a time against a few multi-table schemas, each schema many times, so
+the prefix cache can serve the system prompt and the schema from memory and only the question is
+prefilled. "off" runs with PREFIX_CACHE=0, "cached" with the default budget, and "tight" with a
+budget that holds fewer schemas than the traffic uses, so LRU eviction has to keep up. The model
+is the random Llama of bench/inference_server.py unless --model-dir is given.
+
+    python bench/prefix_cache.py --schemas 8 --requests 128 --tables 4
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+
+import httpx
+
+from common import percentile, serve
+from inference_server import build_model
+from sft_preprocess import COLUMNS, TABLES
+
+
+def schemas(count: int, tables: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        " ".join(f"CREATE TABLE {table}_{i} ({', '.join(f'{c} VARCHAR' for c in rng.sample(COLUMNS, 6))})"
+                 for table in rng.sample(TABLES, tables))
+        for i in range(count)
+    ]
+
+
+def run(base_url: str, args):
+    rng = random.Random(1)
+    contexts = schemas(args.schemas, args.tables)
+    ttft, prefilled = [], 0
+    with httpx.Client(base_url=base_url, timeout=600) as client:
+        for _ in range(args.requests):
+            context = rng.choice(contexts)
+            body = {"question": f"How many rows have {rng.choice(COLUMNS)} above {rng.randint(1, 5000)}?",
+                    "context": context, "max_new_tokens": args.max_new_tokens}
+            usage = client.post("/sql", json=body).raise_for_status().json()["usage"]
+            ttft.append(usage["ttft_ms"])
+            prefilled += usage["prompt_tokens"] - usage["reused_prompt_tokens"]
+        stats = client.get("/stats").json()
+    return {
+        "ttft_p50_ms": percentile(ttft, 50),
+        "ttft_p95_ms": percentile(ttft, 95),
+        "ttft_p99_ms": percentile(ttft, 99),
+        "prompt_tokens": stats["prompt_tokens"],
+        "prefilled_tokens": prefilled,
+        "reused_prompt_tokens": stats["reused_prompt_tokens"],
+        **{f"cache_{key}": value for key, value in stats["prefix_cache"].items()},
+    }
+
+
+def main(args):
+    env = {"HF_HUB_OFFLINE": "1", "MAX_BATCH_SIZE": "1"}
+    results = {}
+    with tempfile.TemporaryDirectory() as model_dir:
+        if args.model_dir:
+            model_dir = os.path.abspath(args.model_dir)
+        else:
+            build_model(model_dir, args)
+        modes = {"off": {"PREFIX_CACHE": "0"}, "cached": {"PREFIX_CACHE": "1"},
+                 "tight": {"PREFIX_CACHE": "1", "PREFIX_CACHE_MB": str(args.tight_mb)}}
+        for mode, mode_env in modes.items():
+            with serve("finetuned-model/backend", env={**env, **mode_env, "MODEL_DIR": model_dir}) as base_url:
+                results[mode] = run(base_url, args)
+
+    for mode, summary in results.items():
+        print(f"{mode:7s} TTFT p50/p95/p99 {summary['ttft_p50_ms']:6.1f}/{summary['ttft_p95_ms']:6.1f}/"
+              f"{summary['ttft_p99_ms']:6.1f} ms  prefilled {summary['prefilled_tokens']:6d} of "
+              f"{summary['prompt_tokens']} prompt tokens  hit rate {summary['cache_hit_rate']:.0%} "
+              f"(+{summary['cache_partial_hits']} partial)  "
+              f"{summary['cache_entries']} entries, {summary['cache_used_mb']:.1f} MB, "
+              f"{summary['cache_evictions']} evictions")
+    off = results["off"]["ttft_p50_ms"]
+    print(f"TTFT p50 speedup: cached {off / results['cached']['ttft_p50_ms']:.1f}x, "
+          f"tight {off / results['tight']['ttft_p50_ms']:.1f}x")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model-dir", default=None, help="a merged_model directory instead of the random model")
+    parser.add_argument("--schemas", type=int, default=8)
+    parser.add_argument("--tables", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--max-new-tokens", type=int, default=1)
+    parser.add_argument("--tight-mb", type=float, default=4, help="PREFIX_CACHE_MB of the tight run")
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--hidden-size", type=int, default=512)
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,61 @@
+"""
+Local stand-in for the fine-tuned model's /scan API.
+
+POST /scan takes {"code": ...} and answers {"analysis": ...}; POST /scan/batch takes
+{"codes": [...]} and answers {"analyses": [...]}. The "model" flags AWS access key IDs.
+STUB_LATENCY_MS is added to every request and STUB_MS_PER_SNIPPET per snippet, to mimic
+inference time. STUB_NO_BATCH=1 removes the batch route.
+
+    python -m uvicorn scan_stub:app --port 9100
+"""
+import asyncio
+import os
+import re
+from typing import List
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+app = FastAPI(title="Secret scan stub")
+
+LATENCY = float(os.getenv("STUB_LATENCY_MS", "0")) / 1000
+PER_SNIPPET = float(os.getenv("STUB_MS_PER_SNIPPET", "0")) / 1000
+AWS_KEY = re.compile(r"\b(?:AKIA|ASIA)[0-9A-Z]{16}\b")
+stats = {"requests": 0, "snippets": 0}
+
+
+class ScanRequest(BaseModel):
+    code: str
+
+
+class BatchScanRequest(BaseModel):
+    codes: List[str]
+
+
+def analyse(code: str) -> str:
+    keys = AWS_KEY.findall(code)
+    if keys:
+        return f"Potential secret detected: AWS access key ID ({len(keys)} occurrence(s))"
+    return "No secrets detected"
+
+
+@app.get("/health")
+async def health():
+    return stats
+
+
+@app.post("/scan")
+async def scan(request: ScanRequest):
+    stats["requests"] += 1
+    stats["snippets"] += 1
+    await asyncio.sleep(LATENCY + PER_SNIPPET)
+    return {"analysis": analyse(request.code)}
+
+
+if os.getenv("STUB_NO_BATCH") != "1":
+    @app.post("/scan/batch")
+    async def scan_batch(request: BatchScanRequest):
+        stats["requests"] += 1
+        stats["snippets"] += len(request.codes)
+        await asyncio.sleep(LATENCY + PER_SNIPPET * len(request.codes))
+        return {"analyses": [analyse(code) for code in request.codes]}
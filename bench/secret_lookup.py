@@ -0,0 +1,112 @@
+"""
+Training-job startup cost of resolving the Hugging Face token from Secrets Manager.
+
+Seeds the moto stub with thousands of unrelated (rotated) secrets plus the token, then starts
+--ranks processes at once, each resolving the token the way finetune_llama.py does on every
+rank. "baseline" is the previous get_secret (page through list_secrets, prefix match in Python),
+"no-cache" is secret_cache.get_secret with the cache disabled (exact name, then a server-side
+name filter), "cold" and "warm" are the shared encrypted cache on first and later job starts.
+The token is the newest secret and, unless --exact, only matches by prefix as in the workshop.
+
+    python bench/secret_lookup.py --secrets 3000 --ranks 8 --latency-ms 30
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+from aws_stub import STUB_CREDENTIALS, aws_stub
+from common import REPO_ROOT, Timer
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "slm-model/HuggingFaceExample/01_finetuning/assets"))
+import secret_cache  # noqa: E402
+
+REGION = "us-west-2"
+SECRET_NAME = "huggingface/token"
+TOKEN = "hf_benchTokenValue0123456789"
+
+
+def baseline_get_secret(secret_name, region_name):
+    """The previous implementation"""
+    client = boto3.session.Session().client(service_name="secretsmanager", region_name=region_name)
+    paginator = client.get_paginator("list_secrets")
+    for page in paginator.paginate():
+        for secret in page["SecretList"]:
+            if secret["Name"].startswith(secret_name):
+                response = client.get_secret_value(SecretId=secret["ARN"])
+                if "SecretString" in response:
+                    return response["SecretString"]
+    return None
+
+
+def seed_secrets(endpoint_url: str, count: int, exact: bool):
+    client = boto3.client("secretsmanager", region_name=REGION, endpoint_url=endpoint_url)
+    with ThreadPoolExecutor(32) as pool:
+        list(pool.map(lambda i: client.create_secret(Name=f"app/service-{i % 50}/db-password-{i}",
+                                                     SecretString=f"value-{i}"), range(count)))
+    client.create_secret(Name=SECRET_NAME if exact else f"{SECRET_NAME}-a1B2c3", SecretString=TOKEN)
+
+
+def rank(mode: str, cache_dir: str, results):
+    with Timer() as t:
+        if mode == "baseline":
+            value = baseline_get_secret(SECRET_NAME, REGION)
+        else:
+            value = secret_cache.get_secret(SECRET_NAME, REGION, cache_dir, 0 if mode == "no-cache" else 3600)
+    assert value == TOKEN, value
+    results.append(t.elapsed)
+
+
+def run_job(mode: str, ranks: int, cache_dir: str):
+    """Start every rank at once and wait for all of them, like a distributed job's startup"""
+    context = multiprocessing.get_context("fork")
+    with context.Manager() as manager:
+        results = manager.list()
+        processes = [context.Process(target=rank, args=(mode, cache_dir, results)) for _ in range(ranks)]
+        with Timer() as t:
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+        if len(results) != ranks:
+            raise RuntimeError(f"{ranks - len(results)} {mode} ranks failed")
+        return {"job_s": t.elapsed, "max_rank_s": max(results)}
+
+
+def main(args):
+    os.environ.update(STUB_CREDENTIALS)
+    operations = Counter()
+    results = {"secrets": args.secrets + 1, "ranks": args.ranks, "latency_ms": args.latency_ms, "modes": {}}
+    with aws_stub(args.latency_ms, operations=operations) as url, tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["AWS_ENDPOINT_URL"] = url
+        seed_secrets(url, args.secrets, args.exact)
+        for mode in ("baseline", "no-cache", "cold", "warm"):
+            operations.clear()
+            stats = run_job(mode, args.ranks, cache_dir)
+            stats["api_calls"] = dict(operations)
+            results["modes"][mode] = stats
+
+    print(f"{results['secrets']} secrets, {args.ranks} ranks, {args.latency_ms:.0f} ms per AWS call")
+    for mode, stats in results["modes"].items():
+        calls = sum(stats["api_calls"].values())
+        detail = ", ".join(f"{name} {count}" for name, count in sorted(stats["api_calls"].items()))
+        print(f"{mode:>9}: job startup {stats['job_s']:6.2f}s, slowest rank {stats['max_rank_s']:6.2f}s, "
+              f"{calls:>4} AWS calls ({detail or 'none'})")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--secrets", type=int, default=3000, help="unrelated secrets in the account")
+    parser.add_argument("--ranks", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--exact", action="store_true", help="name the token secret exactly SECRET_NAME")
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
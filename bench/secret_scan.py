@@ -0,0 +1,68 @@
+"""
+Scanning a source tree with the finetuned-model/1.py client against the local /scan stub.
+
+Compares the original one-request-per-snippet loop with the batched client, cold and then
+warm (every snippet served from the content-hash cache).
+
+    python bench/secret_scan.py --tree . --latency-ms 20 --per-snippet-ms 5
+"""
+import argparse
+import json
+import tempfile
+
+import httpx
+
+from common import Timer, load_service, serve
+
+
+def main(args):
+    scanner = load_service("scan_client", "finetuned-model/1.py")
+    stub_env = {"STUB_LATENCY_MS": str(args.latency_ms), "STUB_MS_PER_SNIPPET": str(args.per_snippet_ms)}
+    results = {}
+    with serve("bench", env=stub_env, app="scan_stub:app") as stub_url:
+        snippets = []
+        for path in scanner.iter_files([args.tree]):
+            text = scanner.read_text(path)
+            if text is not None:
+                snippets.extend(scanner.chunk_text(path, text, args.max_tokens))
+        snippets = snippets[:args.limit] if args.limit else snippets
+        results["snippets"] = len(snippets)
+
+        # Before: a fresh connection and one request per snippet, in sequence
+        with Timer() as naive:
+            for snippet in snippets:
+                httpx.post(stub_url + "/scan", json={"code": snippet.code}, timeout=60).json()["analysis"]
+        results["sequential_s"] = naive.elapsed
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for phase in ("cold", "warm"):
+                cache = scanner.ScanCache(f"{cache_dir}/cache.json")
+                client = scanner.ScanClient(stub_url + "/scan", stub_url + "/scan/batch",
+                                            args.concurrency, args.batch_size, cache)
+                with Timer() as t:
+                    analyses = client.scan_snippets(snippets)
+                cache.save()
+                client.close()
+                results[f"{phase}_s"] = t.elapsed
+                results[f"{phase}_requests"] = client.stats["requests"]
+        results["flagged"] = sum(1 for analysis in analyses if not analysis.startswith("No secrets"))
+
+    print(f"{results['snippets']} snippets: sequential {results['sequential_s']:.2f}s, "
+          f"batched {results['cold_s']:.2f}s ({results['cold_requests']} requests), "
+          f"cached {results['warm_s']:.3f}s ({results['warm_requests']} requests), "
+          f"{results['flagged']} flagged")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tree", default=".")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--per-snippet-ms", type=float, default=5)
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--limit", type=int, default=0, help="scan at most this many snippets")
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,126 @@
+"""
+Turnaround from the last training step to a merged model: the parts that run off Neuron hosts.
+
+1. The subprocess finetune_llama.py used to spawn paid a cold interpreter start and a re-import of
+   torch/transformers/peft (plus optimum-neuron, not installable here, so this is a lower bound);
+   consolidate.consolidate_and_merge runs in the already warm training process.
+2. Tensor-parallel shard files (synthetic LoRA shards laid out like optimum-neuron writes them) are
+   read one after the other with torch.load, the way optimum-neuron does, and with
+   consolidate.load_shards' thread pool of mmap loads. The files are evicted from the page cache
+   before each run so reads come from disk.
+3. find_checkpoint's latest/best selection over a training output directory.
+
+    python bench/sft_consolidate.py --tp 8 --layers 22 --hidden-size 2048
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from common import REPO_ROOT, Timer
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "slm-model/HuggingFaceExample/01_finetuning/assets"))
+import consolidate  # noqa: E402
+
+import torch  # noqa: E402
+
+TARGET_MODULES = ["q_proj", "gate_proj", "v_proj", "o_proj", "k_proj", "up_proj", "down_proj"]
+
+
+def write_checkpoint(checkpoint_dir: Path, args):
+    """adapter_default/adapter_shards of a tp-way LoRA checkpoint: one torch.save file per TP rank"""
+    shards_dir = checkpoint_dir / "adapter_default" / consolidate.ADAPTER_SHARDS_DIR
+    (shards_dir / "model").mkdir(parents=True)
+    generator = torch.Generator().manual_seed(0)
+    for tp_rank in range(args.tp):
+        state_dict = {}
+        for layer in range(args.layers):
+            for module in TARGET_MODULES:
+                prefix = f"base_model.model.model.layers.{layer}.{module}"
+                out_features = args.hidden_size * 11 // 4 if module in ("gate_proj", "up_proj") else args.hidden_size
+                state_dict[f"{prefix}.lora_A.weight"] = torch.randn(args.r, args.hidden_size, generator=generator)
+                state_dict[f"{prefix}.lora_B.weight"] = torch.randn(out_features // args.tp, args.r, generator=generator)
+        torch.save(state_dict, shards_dir / "model" / f"dp_rank_00_tp_rank_{tp_rank:02d}_pp_rank_00.pt")
+    with open(shards_dir / "mp_metadata_pp_rank_0.json", "w") as f:
+        json.dump({"parameters": {}, "model_weight_transformation_specs": []}, f)
+    return shards_dir
+
+
+def evict(files):
+    for path in files:
+        fd = os.open(path, os.O_RDONLY)
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        os.close(fd)
+
+
+def cold_import_seconds(repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        with Timer() as t:
+            subprocess.run([sys.executable, "-c", "import torch, transformers, peft, safetensors"], check=True)
+        times.append(t.elapsed)
+    return min(times)
+
+
+def main(args):
+    results = {"tp": args.tp}
+    results["subprocess_import_s"] = cold_import_seconds(args.repeat)
+
+    with tempfile.TemporaryDirectory() as training_dir:
+        for step in (100, 200, 300):
+            checkpoint_dir = Path(training_dir) / f"checkpoint-{step}"
+            checkpoint_dir.mkdir()
+            with open(checkpoint_dir / "trainer_state.json", "w") as f:
+                json.dump({"best_model_checkpoint": "/opt/ml/model/checkpoint-200"}, f)
+        shards_dir = write_checkpoint(Path(training_dir) / "checkpoint-300", args)
+        groups, load_function, _ = consolidate.shard_layout(shards_dir)
+        files = [path for group in groups for path in group]
+        results["shard_mb"] = sum(path.stat().st_size for path in files) / 2**20
+
+        with Timer() as t:
+            latest = consolidate.find_checkpoint(training_dir, "latest")
+            best = consolidate.find_checkpoint(training_dir, "best")
+        results["select_ms"] = t.elapsed * 1000
+        assert latest.endswith("checkpoint-300") and best.endswith("checkpoint-200"), (latest, best)
+
+        serial, threaded = [], []
+        for _ in range(args.repeat):
+            evict(files)
+            with Timer() as t:
+                expected = {str(path): torch.load(path, weights_only=True) for path in files}
+            serial.append(t.elapsed)
+            evict(files)
+            with Timer() as t:
+                loaded = consolidate.load_shards(files, load_function, args.workers)
+                # mmap loads are lazy; touch every tensor so both sides have read all bytes
+                for state_dict in loaded.values():
+                    for tensor in state_dict.values():
+                        tensor.sum()
+            threaded.append(t.elapsed)
+        for name, state_dict in expected.items():
+            assert all(torch.equal(tensor, loaded[name][key]) for key, tensor in state_dict.items())
+        results["read_serial_s"] = min(serial)
+        results["read_threaded_mmap_s"] = min(threaded)
+
+    print(f"subprocess cold start + imports: {results['subprocess_import_s']:.2f}s (avoided in-process)")
+    print(f"{args.tp} TP shards, {results['shard_mb']:.0f} MB: serial torch.load {results['read_serial_s']:.2f}s, "
+          f"thread pool of mmap loads {results['read_threaded_mmap_s']:.2f}s")
+    print(f"checkpoint selection (latest + best): {results['select_ms']:.1f} ms")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tp", type=int, default=8)
+    parser.add_argument("--layers", type=int, default=22)
+    parser.add_argument("--hidden-size", type=int, default=2048)
+    parser.add_argument("--r", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,136 @@
+"""
+Peak memory and wall time of merging the LoRA adapter into the base model on CPU.
+
+Builds a small random Llama checkpoint (bf16, sharded safetensors) and a LoRA adapter over the
+same projections finetune_llama.py trains, with non-zero B matrices and a trained lm_head
+(modules_to_save). Each merge runs in a fresh process and reports its own peak RSS growth: "in_memory"
+is the previous AutoPeftModelForCausalLM + merge_and_unload + save_pretrained path, "streaming"
+is lora_merge.streaming_merge. That both produce the same checkpoint, bit for bit, is checked by
+tests/test_lora_merge.py on a tiny model.
+
+    python bench/sft_lora_merge.py --hidden-size 1024 --layers 8 --dtype float32
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+
+from common import REPO_ROOT, Timer
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "slm-model/HuggingFaceExample/01_finetuning/assets"))
+
+TARGET_MODULES = ["q_proj", "gate_proj", "v_proj", "o_proj", "k_proj", "up_proj", "down_proj"]
+
+
+def build_checkpoint(work_dir: str, args) -> str:
+    import torch
+    from peft import LoraConfig, get_peft_model
+    from transformers import LlamaConfig, LlamaForCausalLM
+
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=args.vocab_size, hidden_size=args.hidden_size, intermediate_size=args.hidden_size * 11 // 4,
+        num_hidden_layers=args.layers, num_attention_heads=16, num_key_value_heads=4, tie_word_embeddings=False,
+    )
+    base_dir = os.path.join(work_dir, "base")
+    LlamaForCausalLM(config).to(torch.bfloat16).save_pretrained(base_dir, max_shard_size="100MB")
+
+    model = LlamaForCausalLM.from_pretrained(base_dir)
+    lora = LoraConfig(r=16, lora_alpha=32, target_modules=TARGET_MODULES, modules_to_save=["lm_head"],
+                      task_type="CAUSAL_LM")
+    peft_model = get_peft_model(model, lora)
+    with torch.no_grad():
+        for name, parameter in peft_model.named_parameters():
+            if "lora_B" in name:
+                parameter.normal_(std=0.02)
+            elif "modules_to_save" in name:
+                parameter.add_(0.01)
+    adapter_dir = os.path.join(work_dir, "adapter")
+    peft_model.save_pretrained(adapter_dir)
+    return adapter_dir
+
+
+def memory_mb(field: str) -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def merge(mode: str, adapter_dir: str, output_dir: str, dtype: str, max_shard_size: str, results):
+    import peft
+    import torch
+
+    from lora_merge import streaming_merge
+
+    # Importing torch peaks far above what it keeps; reset the high-water mark to measure the merge alone
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    rss_before = memory_mb("VmRSS")
+    with Timer() as t:
+        if mode == "streaming":
+            streaming_merge(adapter_dir, output_dir, dtype=torch.float32 if dtype == "float32" else None,
+                            max_shard_size=max_shard_size)
+        else:
+            peft_model = peft.AutoPeftModelForCausalLM.from_pretrained(
+                adapter_dir, torch_dtype=torch.float32 if dtype == "float32" else "auto"
+            )
+            peft_model.merge_and_unload().save_pretrained(output_dir, max_shard_size=max_shard_size)
+    results[mode] = {"seconds": t.elapsed, "peak_rss_growth_mb": memory_mb("VmHWM") - rss_before}
+
+
+def load_checkpoint(directory: str):
+    from safetensors.torch import load_file
+
+    tensors = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".safetensors"):
+            tensors.update(load_file(os.path.join(directory, name)))
+    return tensors
+
+
+def largest_tensor_mb(directory: str) -> float:
+    return max(t.numel() * t.element_size() for t in load_checkpoint(directory).values()) / 2**20
+
+
+def main(args):
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as work_dir, context.Manager() as manager:
+        adapter_dir = build_checkpoint(work_dir, args)
+        results = manager.dict()
+        for mode in ("in_memory", "streaming"):
+            process = context.Process(target=merge, args=(mode, adapter_dir, os.path.join(work_dir, mode),
+                                                          args.dtype, args.max_shard_size, results))
+            process.start()
+            process.join()
+            if process.exitcode:
+                raise RuntimeError(f"{mode} merge failed")
+        results = dict(results)
+
+        merged = load_checkpoint(os.path.join(work_dir, "streaming"))
+        model_mb = sum(t.numel() * t.element_size() for t in merged.values()) / 2**20
+        results.update(tensors=len(merged), merged_model_mb=model_mb,
+                       largest_tensor_mb=largest_tensor_mb(os.path.join(work_dir, "streaming")),
+                       streaming_files=sorted(os.listdir(os.path.join(work_dir, "streaming"))))
+
+    print(f"merged model {results['merged_model_mb']:.0f} MB ({args.dtype}), {results['tensors']} tensors, "
+          f"largest {results['largest_tensor_mb']:.0f} MB")
+    for mode in ("in_memory", "streaming"):
+        stats = results[mode]
+        print(f"{mode:>9}: {stats['seconds']:.1f}s, peak RSS +{stats['peak_rss_growth_mb']:.0f} MB during the merge")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hidden-size", type=int, default=1024)
+    parser.add_argument("--layers", type=int, default=8)
+    parser.add_argument("--vocab-size", type=int, default=32000)
+    parser.add_argument("--dtype", choices=["float32", "auto"], default="float32")
+    parser.add_argument("--max-shard-size", default="200MB")
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,80 @@
+"""
+Packing efficiency of the fine-tuning dataset: padding, split samples and steps per epoch.
+
+"none" is one conversation per padded sequence (SFT without packing), "concat" is SFTTrainer's
+packing (conversations joined with EOS and cut every max_seq_length tokens) and "ffd" is the
+first-fit-decreasing packing of packing.py. Efficiency is useful tokens / total tokens and
+cross-sample attention is the share of causal attention pairs that connect two different
+conversations. Both packed strategies are built through preprocess.prepare_datasets and, for
+ffd, checked against pretokenized.PackedTokenDataset. Uses the same synthetic rows and tokenizer
+fallback as sft_preprocess.py.
+
+    python bench/sft_packing.py --rows 50500 --max-seq-length 1024 --batch-size 8
+"""
+import argparse
+import json
+import math
+import os
+import tempfile
+
+from common import Timer
+from sft_preprocess import load_tokenizer, preprocess, synthetic_rows
+
+import packing  # noqa: E402  (on sys.path via sft_preprocess)
+import pretokenized  # noqa: E402
+
+
+def main(args):
+    dataset = synthetic_rows(args.rows)
+    tokenizer, tokenizer_name = load_tokenizer(args.tokenizer_id, dataset)
+    train_size = len(dataset) - args.eval_size
+    results = {"rows": len(dataset), "tokenizer": tokenizer_name, "max_seq_length": args.max_seq_length,
+               "strategies": {}}
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for strategy in packing.PACKING_STRATEGIES:
+            with Timer() as t:
+                train, _ = preprocess.prepare_datasets(
+                    tokenizer, dataset, args.max_seq_length, train_size, args.eval_size,
+                    cache_dir=os.path.join(work_dir, "arrow"), num_proc=args.num_proc, packing=strategy,
+                )
+            stats = preprocess.dataset_packing_stats(train, args.max_seq_length)
+            results["strategies"][strategy] = dict(stats, build_s=t.elapsed)
+
+        mmap_dir = os.path.join(work_dir, "pretokenized")
+        pretokenized.pretokenize(tokenizer, mmap_dir, dataset, train_size, args.eval_size)
+        with Timer() as t:
+            mmap_train = pretokenized.PackedTokenDataset(mmap_dir, "train", args.max_seq_length, tokenizer, "ffd")
+        results["mmap_ffd_plan_s"] = t.elapsed
+        # Same samples, same order, same bins: the two ffd paths must agree
+        assert mmap_train.packing_stats() == {k: v for k, v in results["strategies"]["ffd"].items() if k != "build_s"}
+        lengths = [min(length, args.max_seq_length) for length in (mmap_train.offsets[1:] - mmap_train.offsets[:-1]).tolist()]
+
+    results["strategies"] = dict(
+        none=packing.packing_stats([[length] for length in lengths], args.max_seq_length), **results["strategies"]
+    )
+    results["sample_tokens"] = {"mean": sum(lengths) / len(lengths), "min": min(lengths), "max": max(lengths)}
+
+    print(f"{results['rows']} rows, tokenizer {tokenizer_name}, {results['sample_tokens']['mean']:.0f} tokens per "
+          f"conversation ({results['sample_tokens']['min']}-{results['sample_tokens']['max']}), "
+          f"max_seq_length {args.max_seq_length}, batch size {args.batch_size}")
+    for strategy, stats in results["strategies"].items():
+        stats["steps_per_epoch"] = math.ceil(stats["sequences"] / args.batch_size)
+        print(f"{strategy:>6}: {stats['sequences']:>6} sequences, {stats['steps_per_epoch']:>5} steps/epoch, "
+              f"efficiency {stats['efficiency']:6.1%}, {stats['samples_per_sequence']:5.1f} samples/sequence, "
+              f"{stats['split_samples']:>4} split samples, cross-sample attention {stats['cross_sample_attention']:5.1%}")
+    print(f"ffd planning over the memory-mapped offsets: {results['mmap_ffd_plan_s'] * 1000:.0f} ms")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50500)
+    parser.add_argument("--eval-size", type=int, default=500)
+    parser.add_argument("--max-seq-length", type=int, default=1024)
+    parser.add_argument("--batch-size", type=int, default=8, help="sequences per optimizer step")
+    parser.add_argument("--num-proc", type=int, default=os.cpu_count())
+    parser.add_argument("--tokenizer-id", default="TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
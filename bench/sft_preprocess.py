@@ -0,0 +1,154 @@
+"""
+Fine-tuning dataset preprocessing wall time on CPU.
+
+"baseline" is the previous path: create_conversation mapped row by row in one process, then the
+chat template applied per row and the stream tokenized and packed the way SFTTrainer's
+ConstantLengthDataset does it on every run. "cold" is prepare_datasets building its cache and "warm"
+is a later run loading it. Rows are synthetic sql-create-context samples unless --hub is given; the
+tokenizer comes from the Hub when reachable, otherwise a small BPE tokenizer with TinyLlama's chat
+template is trained locally.
+
+    python bench/sft_preprocess.py --rows 50500 --num-proc 4
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+from datasets import Dataset, load_dataset
+
+from common import REPO_ROOT, Timer
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "slm-model/HuggingFaceExample/01_finetuning/assets"))
+import preprocess  # noqa: E402
+
+TINYLLAMA_CHAT_TEMPLATE = (
+    "{% for message in messages %}\n{% if message['role'] == 'user' %}\n{{ '<|user|>\n' + message['content'] + eos_token }}\n"
+    "{% elif message['role'] == 'system' %}\n{{ '<|system|>\n' + message['content'] + eos_token }}\n"
+    "{% elif message['role'] == 'assistant' %}\n{{ '<|assistant|>\n'  + message['content'] + eos_token }}\n"
+    "{% endif %}\n{% if loop.last and add_generation_prompt %}\n{{ '<|assistant|>' }}\n{% endif %}\n{% endfor %}"
+)
+TABLES = ["head", "department", "management", "farm", "city", "competition", "customer", "orders", "flight"]
+COLUMNS = ["age", "name", "budget_in_billions", "num_employees", "city_id", "status", "year", "price", "rank"]
+
+
+def synthetic_rows(count: int, seed: int = 0) -> Dataset:
+    rng = random.Random(seed)
+    contexts, questions, answers = [], [], []
+    for _ in range(count):
+        table = rng.choice(TABLES)
+        columns = rng.sample(COLUMNS, rng.randint(1, 4))
+        value = rng.randint(1, 5000)
+        contexts.append(f"CREATE TABLE {table} ({', '.join(f'{c} VARCHAR' for c in columns)})")
+        questions.append(f"What is the {columns[0]} of the {table} where {columns[-1]} is greater than {value}?")
+        answers.append(f"SELECT {columns[0]} FROM {table} WHERE {columns[-1]} > {value}")
+    return Dataset.from_dict({"answer": answers, "question": questions, "context": contexts})
+
+
+def load_tokenizer(tokenizer_id: str, corpus: Dataset):
+    from transformers import AutoTokenizer, PreTrainedTokenizerFast
+
+    try:
+        return AutoTokenizer.from_pretrained(tokenizer_id), tokenizer_id
+    except OSError:
+        pass
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(vocab_size=8000, special_tokens=["<unk>", "<s>", "</s>"])
+    texts = corpus.select(range(min(len(corpus), 5000)))
+    tokenizer.train_from_iterator(
+        (f"<|system|>\n{preprocess.SYSTEM_MESSAGE_PREFIX}{row['context']}</s>\n<|user|>\n{row['question']}</s>\n"
+         f"<|assistant|>\n{row['answer']};</s>" for row in texts),
+        trainer=trainer,
+    )
+    fast = PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="<unk>", bos_token="<s>",
+                                   eos_token="</s>", pad_token="</s>")
+    fast.chat_template = TINYLLAMA_CHAT_TEMPLATE
+    return fast, "local BPE (Hub unreachable)"
+
+
+def baseline(dataset: Dataset, tokenizer, max_seq_length: int, train_size: int, eval_size: int):
+    """The previous pipeline, including the tokenization and packing SFTTrainer redid every run"""
+    def create_conversation(sample):
+        system_message = (
+            "You are a text to SQL query translator. Users will ask you questions in English and you will generate a "
+            "SQL query based on the provided SCHEMA.\nSCHEMA:\n{schema}"
+        )
+        return {
+            "messages": [
+                {"role": "system", "content": system_message.format(schema=sample["context"])},
+                {"role": "user", "content": sample["question"]},
+                {"role": "assistant", "content": sample["answer"] + ";"},
+            ]
+        }
+
+    dataset = dataset.shuffle(seed=23)
+    sequences = 0
+    for split in (dataset.select(range(train_size)), dataset.select(range(train_size, train_size + eval_size))):
+        split = split.map(create_conversation, remove_columns=split.features, batched=False,
+                          load_from_cache_file=False)
+        # ConstantLengthDataset: format row by row into a buffer, tokenize the buffer, concat with EOS
+        buffer = []
+        for row in split:
+            buffer.append(tokenizer.apply_chat_template(row["messages"], tokenize=False))
+            if len(buffer) == 1024:
+                sequences += pack(buffer, tokenizer, max_seq_length)
+                buffer = []
+        sequences += pack(buffer, tokenizer, max_seq_length)
+    return sequences
+
+
+def pack(buffer, tokenizer, max_seq_length: int) -> int:
+    if not buffer:
+        return 0
+    stream = []
+    for ids in tokenizer(buffer, add_special_tokens=False, truncation=False)["input_ids"]:
+        stream.extend(ids + [tokenizer.eos_token_id])
+    return len(stream) // max_seq_length
+
+
+def main(args):
+    if args.hub:
+        dataset = load_dataset(preprocess.DATASET_ID, split="train")
+    else:
+        dataset = synthetic_rows(args.rows)
+    tokenizer, tokenizer_name = load_tokenizer(args.tokenizer_id, dataset)
+    train_size = len(dataset) - args.eval_size
+    results = {"rows": len(dataset), "tokenizer": tokenizer_name, "num_proc": args.num_proc}
+
+    with Timer() as t:
+        results["baseline_sequences"] = baseline(dataset, tokenizer, args.max_seq_length, train_size, args.eval_size)
+    results["baseline_s"] = t.elapsed
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for phase in ("cold", "warm"):
+            with Timer() as t:
+                train, evaluation = preprocess.prepare_datasets(
+                    tokenizer, dataset, args.max_seq_length, train_size, args.eval_size,
+                    cache_dir=cache_dir, num_proc=args.num_proc, packing="concat",
+                )
+            results[f"{phase}_s"] = t.elapsed
+        results["sequences"] = len(train) + len(evaluation)
+
+    print(f"{results['rows']} rows, tokenizer {tokenizer_name}, num_proc {args.num_proc}: "
+          f"baseline {results['baseline_s']:.1f}s ({results['baseline_sequences']} sequences), "
+          f"cold {results['cold_s']:.1f}s ({results['sequences']} sequences), warm {results['warm_s']:.2f}s")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50500)
+    parser.add_argument("--eval-size", type=int, default=500)
+    parser.add_argument("--max-seq-length", type=int, default=1024)
+    parser.add_argument("--num-proc", type=int, default=os.cpu_count())
+    parser.add_argument("--tokenizer-id", default="TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+    parser.add_argument("--hub", action="store_true", help="use the real dataset from the Hub")
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,102 @@
+"""
+Startup time, disk footprint and host memory of the memory-mapped pretokenized format.
+
+Compares loading the packed datasets cached by preprocess.prepare_datasets (Arrow lists of
+int64) with memory-mapping the pretokenized.py files (uint16/uint32 tokens plus an offset
+index), then reads random batches the way the trainer's sampler does. Uses the same synthetic
+rows and tokenizer fallback as sft_preprocess.py; everything runs offline from a local copy.
+
+    python bench/sft_pretokenized.py --rows 50500 --batches 200
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+
+import numpy as np
+from datasets import load_from_disk
+
+from common import Timer
+from sft_preprocess import load_tokenizer, preprocess, synthetic_rows
+
+import pretokenized  # noqa: E402  (on sys.path via sft_preprocess)
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def directory_mb(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names) / 2**20
+
+
+def read_batches(dataset, batches: int, batch_size: int, seed: int = 0):
+    rng = random.Random(seed)
+    for _ in range(batches):
+        indices = [rng.randrange(len(dataset)) for _ in range(batch_size)]
+        np.stack([np.asarray(dataset[i]["input_ids"]) for i in indices]).astype(np.int64)
+
+
+def main(args):
+    dataset = synthetic_rows(args.rows)
+    tokenizer, tokenizer_name = load_tokenizer(args.tokenizer_id, dataset)
+    train_size = len(dataset) - args.eval_size
+    results = {"rows": len(dataset), "tokenizer": tokenizer_name}
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # A local dataset copy, as an offline training host would have
+        local_copy = os.path.join(work_dir, "sql-create-context")
+        dataset.save_to_disk(local_copy)
+        source = pretokenized.load_source(local_copy)
+
+        cache_dir = os.path.join(work_dir, "arrow")
+        with Timer() as t:
+            preprocess.prepare_datasets(tokenizer, source, args.max_seq_length, train_size, args.eval_size,
+                                        cache_dir=cache_dir, num_proc=1, packing="concat")
+        results["arrow_build_s"] = t.elapsed
+        mmap_dir = os.path.join(work_dir, "pretokenized")
+        with Timer() as t:
+            meta = pretokenized.pretokenize(tokenizer, mmap_dir, source, train_size, args.eval_size)
+        results["mmap_build_s"] = t.elapsed
+        results["dtype"] = meta["dtype"]
+
+        rss_before = rss_mb()
+        with Timer() as t:
+            arrow_train = load_from_disk(os.path.join(cache_dir, os.listdir(cache_dir)[0]))["train"]
+        results["arrow"] = {"open_ms": t.elapsed * 1000, "disk_mb": directory_mb(cache_dir), "sequences": len(arrow_train)}
+        with Timer() as t:
+            read_batches(arrow_train, args.batches, args.batch_size)
+        results["arrow"].update(read_s=t.elapsed, rss_growth_mb=rss_mb() - rss_before)
+
+        rss_before = rss_mb()
+        with Timer() as t:
+            mmap_train = pretokenized.PackedTokenDataset(mmap_dir, "train", args.max_seq_length, tokenizer)
+        results["mmap"] = {"open_ms": t.elapsed * 1000, "disk_mb": directory_mb(mmap_dir), "sequences": len(mmap_train)}
+        with Timer() as t:
+            read_batches(mmap_train, args.batches, args.batch_size)
+        results["mmap"].update(read_s=t.elapsed, rss_growth_mb=rss_mb() - rss_before)
+
+        # Both cut the same token stream, so the leading sequences must agree
+        assert list(arrow_train[0]["input_ids"]) == mmap_train[0]["input_ids"].tolist()
+
+    for name in ("arrow", "mmap"):
+        stats = results[name]
+        print(f"{name:>5}: {stats['sequences']} sequences, {stats['disk_mb']:.1f} MB on disk, open {stats['open_ms']:.1f} ms, "
+              f"{args.batches} random batches in {stats['read_s']:.2f}s, RSS +{stats['rss_growth_mb']:.1f} MB")
+    print(f"build: arrow {results['arrow_build_s']:.1f}s, mmap {results['mmap_build_s']:.1f}s ({results['dtype']} tokens)")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50500)
+    parser.add_argument("--eval-size", type=int, default=500)
+    parser.add_argument("--max-seq-length", type=int, default=1024)
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--tokenizer-id", default="TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
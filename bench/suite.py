@@ -0,0 +1,258 @@
+"""
+Benchmark suite across the three services, with a JSON results file and regression checks.
+
+Each scenario starts its service under uvicorn against a local stand-in and records throughput,
+p50/p95/p99 latency and the service process's resident memory (after startup, at the end, and
+its peak):
+
+    admin_webhooks  admin-ui: webhooks posted at concurrency, acknowledgement latency, with
+                    dashboards on /ws receiving the fan-out
+    ec2_listings    exposed-app: /ec2/instances with "fresh": true, i.e. through boto3 to moto
+    ec2_cached      exposed-app: /ec2/instances served from the inventory cache
+    scan            the /scan API 1.py calls, one snippet per request, against bench/scan_stub.py
+    scan_batch      the same stub's /scan/batch
+    inference       finetuned-model/backend with a small random model (opt-in: needs torch and
+                    takes a minute)
+
+Results go to --output. Every metric listed in --thresholds (bench/thresholds.json) must stay
+within its "max"/"min", and with --baseline (an earlier results file) no tracked metric may be
+more than --tolerance worse. Regressions are listed and the exit status is 1.
+
+    python bench/suite.py
+    python bench/suite.py --scenarios scan scan_batch --baseline bench/results/main.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+import webhook_ingest
+from aws_stub import STUB_CREDENTIALS, aws_stub, seed_instances
+from common import REPO_ROOT, process_memory_mb, serve_process, summarize
+
+DEFAULT_SCENARIOS = ["admin_webhooks", "ec2_listings", "ec2_cached", "scan", "scan_batch"]
+# Compared against --baseline; everything else in a scenario's results is informational
+TRACKED_METRICS = ["throughput_per_s", "p50_ms", "p95_ms", "p99_ms", "rss_mb", "peak_rss_mb"]
+HIGHER_IS_BETTER = {"throughput_per_s", "tokens_per_s", "delivery_ratio"}
+
+
+async def drive(base_url: str, method: str, path: str, bodies: List[Optional[dict]], concurrency: int):
+    """Send one request per body with at most concurrency in flight; latencies (s) and wall time"""
+    latencies = []
+    pending = iter(bodies)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def worker(client):
+        for body in pending:
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        return latencies, time.perf_counter() - start
+
+
+def measured(process, run: Callable[[], dict]) -> dict:
+    """Run a scenario against a served process and add its memory before and after"""
+    startup_rss = process_memory_mb(process.pid)["rss_mb"]
+    results = run()
+    return {**results, "startup_rss_mb": startup_rss, **process_memory_mb(process.pid)}
+
+
+def admin_webhooks(args) -> dict:
+    env = {"WEBHOOK_QUEUE_SIZE": str(args.requests * 2), "SUBSCRIPTIONS_DB": ":memory:"}
+    ingest_args = argparse.Namespace(webhooks=args.requests, concurrency=args.concurrency, processes=1,
+                                     connections=args.dashboards, batch_ms=0)
+
+    with serve_process("admin-ui/backend", env) as (base_url, process):
+        def run():
+            stats = asyncio.run(webhook_ingest.run(base_url, ingest_args))
+            ingest_s = stats["count"] / stats["throughput_per_s"]
+            return {
+                **{key: stats[key] for key in ("count", "throughput_per_s", "p50_ms", "p95_ms", "p99_ms", "drain_s")},
+                "dashboards": args.dashboards,
+                "deliveries_per_s": stats["alerts_received"] / (ingest_s + stats["drain_s"]),
+                # Every dashboard subscribes to everything, so each should get every alert
+                "delivery_ratio": stats["alerts_received"] / (stats["count"] * args.dashboards),
+            }
+        return measured(process, run)
+
+
+def ec2(args, fresh: bool) -> dict:
+    with aws_stub(args.aws_latency_ms) as endpoint_url:
+        seed_instances(endpoint_url, args.region, args.instances)
+        env = {**STUB_CREDENTIALS, "AWS_ENDPOINT_URL": endpoint_url, "AWS_WARM_REGIONS": args.region,
+               "EC2_INVENTORY_REGIONS": args.region}
+        with serve_process("exposed-app/backend", env) as (base_url, process):
+            # Fills the inventory, so non-fresh listings are served from memory
+            httpx.get(f"{base_url}/ec2/instances/changes", params={"region": args.region}, timeout=60).raise_for_status()
+
+            def run():
+                body = {"region": args.region, "fresh": fresh}
+                latencies, elapsed = asyncio.run(drive(base_url, "POST", "/ec2/instances", [body] * args.listings,
+                                                       args.concurrency))
+                return {**summarize(latencies, elapsed), "instances": args.instances}
+            return measured(process, run)
+
+
+def scan_snippets(count: int) -> List[str]:
+    rng = random.Random(0)
+    snippets = []
+    for i in range(count):
+        lines = [f"def handler_{i}_{j}(event):\n    return event.get('value_{j}')" for j in range(rng.randint(2, 6))]
+        if i % 10 == 0:
+            lines.append(f'aws_key = "AKIA{rng.randrange(16**16):016X}"')
+        snippets.append("\n".join(lines))
+    return snippets
+
+
+def scan(args, batch: bool) -> dict:
+    env = {"STUB_LATENCY_MS": str(args.scan_latency_ms), "STUB_MS_PER_SNIPPET": str(args.scan_ms_per_snippet)}
+    snippets = scan_snippets(args.requests)
+    with serve_process("bench", env, app="scan_stub:app") as (base_url, process):
+        def run():
+            if batch:
+                bodies = [{"codes": snippets[i:i + args.batch_size]} for i in range(0, len(snippets), args.batch_size)]
+                latencies, elapsed = asyncio.run(drive(base_url, "POST", "/scan/batch", bodies, args.concurrency))
+            else:
+                latencies, elapsed = asyncio.run(drive(base_url, "POST", "/scan", [{"code": code} for code in snippets],
+                                                       args.concurrency))
+            return {**summarize(latencies, elapsed), "snippets_per_s": len(snippets) / elapsed}
+        return measured(process, run)
+
+
+def inference(args) -> dict:
+    import inference_server
+
+    model_args = argparse.Namespace(layers=4, hidden_size=512)
+    load_args = argparse.Namespace(requests=32, concurrency=8, max_new_tokens=16)
+    with tempfile.TemporaryDirectory() as model_dir:
+        inference_server.build_model(model_dir, model_args)
+        env = {"HF_HUB_OFFLINE": "1", "MODEL_DIR": model_dir, "MAX_NEW_TOKENS": "16"}
+        with serve_process("finetuned-model/backend", env) as (base_url, process):
+            return measured(process, lambda: asyncio.run(inference_server.run(base_url, load_args)))
+
+
+SCENARIOS: Dict[str, Callable[[argparse.Namespace], dict]] = {
+    "admin_webhooks": admin_webhooks,
+    "ec2_listings": lambda args: ec2(args, fresh=True),
+    "ec2_cached": lambda args: ec2(args, fresh=False),
+    "scan": lambda args: scan(args, batch=False),
+    "scan_batch": lambda args: scan(args, batch=True),
+    "inference": inference,
+}
+
+
+def check_thresholds(scenarios: Dict[str, dict], thresholds: Dict[str, dict]) -> List[str]:
+    failures = []
+    for scenario, limits in thresholds.items():
+        if scenario not in scenarios:
+            continue
+        for metric, limit in limits.items():
+            value = scenarios[scenario].get(metric)
+            if value is None:
+                failures.append(f"{scenario}.{metric}: not measured")
+            elif "max" in limit and value > limit["max"]:
+                failures.append(f"{scenario}.{metric} = {value:.2f}, above the maximum of {limit['max']}")
+            elif "min" in limit and value < limit["min"]:
+                failures.append(f"{scenario}.{metric} = {value:.2f}, below the minimum of {limit['min']}")
+    return failures
+
+
+def check_baseline(scenarios: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    failures = []
+    for scenario, previous in baseline.items():
+        if scenario not in scenarios:
+            continue
+        for metric in TRACKED_METRICS:
+            old, new = previous.get(metric), scenarios[scenario].get(metric)
+            if not old or new is None:
+                continue
+            worse = old / new - 1 if metric in HIGHER_IS_BETTER else new / old - 1
+            if worse > tolerance:
+                failures.append(f"{scenario}.{metric} = {new:.2f} vs {old:.2f} in the baseline "
+                                f"({worse:.0%} worse, tolerance {tolerance:.0%})")
+    return failures
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(args) -> int:
+    scenarios = {}
+    for name in args.scenarios:
+        print(f"running {name}...", flush=True)
+        scenarios[name] = SCENARIOS[name](args)
+
+    with open(args.thresholds) as f:
+        thresholds = json.load(f)
+    failures = check_thresholds(scenarios, thresholds)
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures += check_baseline(scenarios, json.load(f)["scenarios"], args.tolerance)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "baseline": args.baseline,
+        },
+        "scenarios": scenarios,
+        "regressions": failures,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{'scenario':16s} {'req/s':>9s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'RSS MB':>7s} {'peak MB':>8s}")
+    for name, summary in scenarios.items():
+        print(f"{name:16s} {summary['throughput_per_s']:9.1f} {summary['p50_ms']:8.2f} {summary['p95_ms']:8.2f} "
+              f"{summary['p99_ms']:8.2f} {summary['rss_mb']:7.1f} {summary['peak_rss_mb']:8.1f}")
+    print(f"results written to {args.output}")
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if args.json:
+        print(json.dumps(results, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=DEFAULT_SCENARIOS)
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "bench", "results", "latest.json"))
+    parser.add_argument("--thresholds", default=os.path.join(REPO_ROOT, "bench", "thresholds.json"))
+    parser.add_argument("--baseline", default=None, help="an earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown vs --baseline")
+    parser.add_argument("--requests", type=int, default=2000, help="webhooks and scan snippets per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--dashboards", type=int, default=10, help="/ws connections during admin_webhooks")
+    parser.add_argument("--listings", type=int, default=200, help="/ec2/instances requests per EC2 scenario")
+    parser.add_argument("--instances", type=int, default=100)
+    parser.add_argument("--region", default="us-east-1")
+    parser.add_argument("--aws-latency-ms", type=float, default=0)
+    parser.add_argument("--scan-latency-ms", type=float, default=5)
+    parser.add_argument("--scan-ms-per-snippet", type=float, default=1)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--json", action="store_true")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,120 @@
+"""
+Webhook latency as the number of connected dashboards grows.
+
+Registers N in-process fake sockets with the admin-ui ConnectionManager (a small share of them
+never complete a send) and posts security-alert webhooks through the ASGI app. With --teams,
+each socket filters on one of that many repositories and alerts rotate across them.
+
+    python bench/webhook_fanout.py --connections 10 100 1000 5000 [--teams 100]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+
+import httpx
+
+from common import Timer, load_service, quiet_logging, summarize
+
+ALERT_PAYLOAD = {
+    "action": "created",
+    "alert": {
+        "number": 42,
+        "severity": "high",
+        "state": "open",
+        "created_at": "2025-01-01T00:00:00Z",
+        "html_url": "https://github.com/octo/repo/security/dependabot/42",
+    },
+    "repository": {"full_name": "octo/repo"},
+    "sender": {"login": "dependabot[bot]"},
+}
+
+
+# Keep benchmark runs from touching the backend's real subscription database
+os.environ.setdefault("SUBSCRIPTIONS_DB", ":memory:")
+
+
+class FakeWebSocket:
+    """
+    Stand-in for a dashboard socket; slow sockets block forever on send
+    """
+    def __init__(self, slow: bool = False):
+        self.slow = slow
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        if self.slow:
+            await asyncio.Event().wait()
+        await asyncio.sleep(random.uniform(0, 0.002))
+        self.received += 1
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run_case(admin, connections: int, webhooks: int, slow_ratio: float, teams: int = 0):
+    manager = admin.manager
+    sockets = [FakeWebSocket(slow=random.random() < slow_ratio) for _ in range(connections)]
+    for i, websocket in enumerate(sockets):
+        manager.register(websocket)
+        if teams:
+            manager.set_filter(websocket, [f"team{i % teams}/repo"], [])
+
+    latencies = []
+    transport = httpx.ASGITransport(app=admin.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        with Timer() as total:
+            for i in range(webhooks):
+                payload = ALERT_PAYLOAD
+                if teams:
+                    payload = {**ALERT_PAYLOAD, "repository": {"full_name": f"team{i % teams}/repo"}}
+                with Timer() as t:
+                    response = await client.post("/webhook/github/security-alert", json=payload)
+                response.raise_for_status()
+                latencies.append(t.elapsed)
+
+        await admin.webhook_queue.queue.join()
+
+    # Let the writers of responsive sockets drain before counting deliveries
+    deadline = asyncio.get_running_loop().time() + 10
+    while asyncio.get_running_loop().time() < deadline and any(
+        client.pending for websocket, client in manager.active_connections.items() if not websocket.slow
+    ):
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.01)
+
+    for websocket in list(manager.active_connections):
+        manager.disconnect(websocket)
+    await asyncio.sleep(0)
+    stats = summarize(latencies, total.elapsed)
+    stats["deliveries_per_webhook"] = sum(websocket.received for websocket in sockets) / webhooks
+    return stats
+
+
+async def main(args):
+    quiet_logging()
+    admin = load_service("admin_ui_main", "admin-ui/backend/main.py")
+    await admin.app.router.startup()
+    results = {}
+    for connections in args.connections:
+        stats = await run_case(admin, connections, args.webhooks, args.slow_ratio, args.teams)
+        results[connections] = stats
+        print(f"{connections:>6} connections  p50={stats['p50_ms']:.2f}ms  p99={stats['p99_ms']:.2f}ms  "
+              f"{stats['throughput_per_s']:.0f} webhooks/s  {stats['deliveries_per_webhook']:.1f} deliveries/webhook")
+    await admin.app.router.shutdown()
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--webhooks", type=int, default=200)
+    parser.add_argument("--slow-ratio", type=float, default=0.01)
+    parser.add_argument("--teams", type=int, default=0, help="disjoint repository filters across sockets")
+    parser.add_argument("--json", action="store_true")
+    asyncio.run(main(parser.parse_args()))
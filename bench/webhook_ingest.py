@@ -0,0 +1,112 @@
+"""
+Sustained webhook ingestion rate for the admin-ui backend.
+
+Starts the backend under uvicorn, connects a few dashboard sockets, posts alerts from
+concurrent senders and reports the acknowledgement latency, the accepted rate and how long
+the workers take to drain the backlog.
+
+    python bench/webhook_ingest.py --webhooks 20000 --processes 4 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+import websockets
+
+from common import Timer, serve, summarize
+from webhook_fanout import ALERT_PAYLOAD
+
+
+async def dashboard(url: str, received: list):
+    async with websockets.connect(url, max_queue=None) as websocket:
+        async for frame in websocket:
+            received[0] += 1
+            received[1] += len(json.loads(frame)) if frame.startswith("[") else 1
+
+
+async def send_alerts(base_url: str, webhooks: int, concurrency: int):
+    latencies = []
+    statuses = {}
+    remaining = iter(range(webhooks))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def sender(client):
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.post("/webhook/github/security-alert", json=ALERT_PAYLOAD)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+        await asyncio.gather(*(sender(client) for _ in range(concurrency)))
+    return latencies, statuses
+
+
+def sender_process(base_url: str, webhooks: int, concurrency: int):
+    return asyncio.run(send_alerts(base_url, webhooks, concurrency))
+
+
+async def run(base_url: str, args):
+    received = [0, 0]
+    ws_url = base_url.replace("http", "ws", 1) + "/ws"
+    if args.batch_ms:
+        ws_url += f"?batch_ms={args.batch_ms}"
+    dashboards = [asyncio.create_task(dashboard(ws_url, received)) for _ in range(args.connections)]
+    await asyncio.sleep(0.5)
+
+    # A single Python client tops out well below the server, so the load comes from several processes
+    loop = asyncio.get_running_loop()
+    latencies = []
+    statuses = {}
+    per_process = args.webhooks // args.processes
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+        with Timer() as ingest:
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, sender_process, base_url, per_process, args.concurrency)
+                for _ in range(args.processes)
+            ))
+    for process_latencies, process_statuses in results:
+        latencies.extend(process_latencies)
+        for status, count in process_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        with Timer() as drain:
+            while (await client.get("/webhook/metrics")).json()["queue_depth"]:
+                await asyncio.sleep(0.01)
+        metrics = (await client.get("/webhook/metrics")).json()
+
+    # Let the last batch windows flush before hanging up
+    await asyncio.sleep(0.2 + args.batch_ms / 1000)
+    for task in dashboards:
+        task.cancel()
+    await asyncio.gather(*dashboards, return_exceptions=True)
+
+    stats = summarize(latencies, ingest.elapsed)
+    stats.update(drain_s=drain.elapsed, statuses=statuses, queue=metrics, frames_received=received[0], alerts_received=received[1])
+    return stats
+
+
+def main(args):
+    with serve("admin-ui/backend", env={"WEBHOOK_QUEUE_SIZE": str(args.queue_size), "SUBSCRIPTIONS_DB": ":memory:"}) as base_url:
+        stats = asyncio.run(run(base_url, args))
+    print(f"{stats['throughput_per_s']:.0f} webhooks/s acknowledged  p50={stats['p50_ms']:.2f}ms  "
+          f"p99={stats['p99_ms']:.2f}ms  drain={stats['drain_s']:.2f}s  statuses={stats['statuses']}  "
+          f"frames={stats['frames_received']} alerts={stats['alerts_received']}")
+    if args.json:
+        print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--webhooks", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=32, help="in-flight requests per sender process")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--connections", type=int, default=10)
+    parser.add_argument("--batch-ms", type=int, default=0, help="dashboard frame batching window")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
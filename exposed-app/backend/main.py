@@ -1,16 +1,32 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Tuple
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 import logging
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from fnmatch import fnmatchcase
+from functools import partial
+import hashlib
+import json
 import os
-from dotenv import load_dotenv
+import threading
+import time
+from dotenv import find_dotenv, load_dotenv
+
+try:
+    import orjson
+except ImportError:  # Optional: fall back to the stdlib encoder
+    orjson = None
 
 # Load environment variables
-load_dotenv()
+DOTENV_PATH = find_dotenv()
+load_dotenv(DOTENV_PATH)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -46,8 +62,51 @@ class EC2Response(BaseModel):
     total_count: int
     region: str
 
-class AWSConfig(BaseModel):
+class EC2Filters(BaseModel):
+    """Instance filters, pushed down to describe_instances as AWS Filters"""
+    states: Optional[List[str]] = None
+    tags: Optional[Dict[str, str]] = None
+    vpc_ids: Optional[List[str]] = None
+    instance_types: Optional[List[str]] = None
+
+    def to_aws_filters(self) -> List[Dict[str, Any]]:
+        filters = []
+        if self.states:
+            filters.append({"Name": "instance-state-name", "Values": self.states})
+        if self.vpc_ids:
+            filters.append({"Name": "vpc-id", "Values": self.vpc_ids})
+        if self.instance_types:
+            filters.append({"Name": "instance-type", "Values": self.instance_types})
+        for key, value in (self.tags or {}).items():
+            filters.append({"Name": f"tag:{key}", "Values": [value]})
+        return filters
+
+    def is_empty(self) -> bool:
+        return not (self.states or self.tags or self.vpc_ids or self.instance_types)
+
+    def matches(self, instance: Dict[str, Any]) -> bool:
+        """Apply the filters in memory (with AWS-style * and ? wildcards) to a cached instance"""
+        def any_match(value: Optional[str], patterns: List[str]) -> bool:
+            return value is not None and any(fnmatchcase(value, pattern) for pattern in patterns)
+
+        if self.states and not any_match(instance["state"], self.states):
+            return False
+        if self.vpc_ids and not any_match(instance["vpc_id"], self.vpc_ids):
+            return False
+        if self.instance_types and not any_match(instance["instance_type"], self.instance_types):
+            return False
+        for key, value in (self.tags or {}).items():
+            if not any_match(instance["tags"].get(key), [value]):
+                return False
+        return True
+
+class AWSConfig(EC2Filters):
     region: str = "us-east-1"
+    # Set page_size (and pass back next_cursor as cursor) to page through large accounts
+    page_size: Optional[int] = Field(default=None, ge=5, le=1000)
+    cursor: Optional[str] = None
+    # Skip the inventory cache and query AWS directly
+    fresh: bool = False
 
 class EC2ListResponse(BaseModel):
     instances: List[EC2Instance]
@@ -55,28 +114,140 @@ class EC2ListResponse(BaseModel):
     region: str
     access_key_used: str
     timestamp: str
+    next_cursor: Optional[str] = None
+    # Inventory version of a cached or full listing; pass it to /ec2/instances/changes as since
+    version: Optional[str] = None
 
-# Global variable to store AWS session
-aws_session = None
+# boto3 is blocking, so every AWS call runs on this pool instead of the event loop
+AWS_THREAD_POOL_SIZE = int(os.getenv("AWS_THREAD_POOL_SIZE", "16"))
+AWS_CALL_TIMEOUT = float(os.getenv("AWS_CALL_TIMEOUT", "30"))
 
-def get_ec2_client_from_env(region: str = "us-west-2"):
-    """Create and return an EC2 client using environment variables"""
+aws_executor = ThreadPoolExecutor(max_workers=AWS_THREAD_POOL_SIZE, thread_name_prefix="aws")
+
+# Socket timeouts keep a stuck request from holding a pool thread after run_aws gives up on it
+aws_client_config = Config(
+    connect_timeout=5,
+    read_timeout=AWS_CALL_TIMEOUT,
+    retries={"max_attempts": 3, "mode": "standard"},
+    max_pool_connections=AWS_THREAD_POOL_SIZE
+)
+
+async def run_aws(fn, *args, timeout: float = AWS_CALL_TIMEOUT, **kwargs):
+    """Run a blocking boto3 call on the AWS thread pool with a timeout"""
+    loop = asyncio.get_running_loop()
     try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(aws_executor, partial(fn, *args, **kwargs)),
+            timeout=timeout
+        )
+    except asyncio.TimeoutError:
+        logger.error(f"AWS call {getattr(fn, '__name__', fn)} timed out after {timeout}s")
+        raise HTTPException(status_code=504, detail=f"AWS call timed out after {timeout}s")
+
+@app.on_event("shutdown")
+async def shutdown_aws_executor():
+    aws_executor.shutdown(wait=False, cancel_futures=True)
+
+class AWSClientPool:
+    """
+    Thread-safe cache of boto3 clients keyed by (credentials, service, region).
+    Building a client loads botocore service models and costs tens of milliseconds, and each
+    client owns its HTTP connection pool, so clients are reused until the credentials rotate.
+    Credentials come from the environment; a rewritten .env file is reloaded on the next call.
+    """
+    def __init__(self, dotenv_path: str = DOTENV_PATH):
+        self.dotenv_path = dotenv_path
+        self.dotenv_mtime = self._dotenv_mtime()
+        self.clients: Dict[Tuple[str, str, str], Any] = {}
+        self.session: Optional[boto3.Session] = None
+        self.fingerprint: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def _dotenv_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.dotenv_path).st_mtime if self.dotenv_path else None
+        except OSError:
+            return None
+
+    def reload_dotenv(self):
+        mtime = self._dotenv_mtime()
+        if mtime != self.dotenv_mtime:
+            with self.lock:
+                if mtime != self.dotenv_mtime:
+                    # A rotation rewrote .env; its values now win over the process environment
+                    load_dotenv(self.dotenv_path, override=True)
+                    self.dotenv_mtime = mtime
+                    logger.info("Reloaded AWS credentials from .env")
+
+    def credentials(self) -> Tuple[str, str]:
+        self.reload_dotenv()
         access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
         secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-        
         if not access_key_id or not secret_access_key:
             raise HTTPException(
                 status_code=400, 
                 detail="AWS credentials not found in environment variables. Please set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY in .env file"
             )
-        
-        session = boto3.Session(
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key,
-            region_name=region
-        )
-        return session.client('ec2'), access_key_id
+        return access_key_id, secret_access_key
+
+    @staticmethod
+    def fingerprint_of(access_key_id: str, secret_access_key: str) -> str:
+        return hashlib.sha256(f"{access_key_id}:{secret_access_key}".encode()).hexdigest()[:16]
+
+    def client(self, service: str, region: str) -> Tuple[Any, str]:
+        """Return a cached client for the current credentials, and the access key it uses"""
+        access_key_id, secret_access_key = self.credentials()
+        fingerprint = self.fingerprint_of(access_key_id, secret_access_key)
+        key = (fingerprint, service, region)
+        client = self.clients.get(key)
+        if client is not None:
+            return client, access_key_id
+
+        # boto3 sessions are not thread-safe, so clients are only built under the lock
+        with self.lock:
+            if fingerprint != self.fingerprint:
+                if self.fingerprint is not None:
+                    logger.info(f"AWS credentials changed, dropping {len(self.clients)} cached clients")
+                self.clients = {}
+                self.session = boto3.Session(
+                    aws_access_key_id=access_key_id,
+                    aws_secret_access_key=secret_access_key
+                )
+                self.fingerprint = fingerprint
+            client = self.clients.get(key)
+            if client is None:
+                client = self.session.client(service, region_name=region, config=aws_client_config)
+                self.clients[key] = client
+        return client, access_key_id
+
+    def warm_up(self, regions: List[str], services: Tuple[str, ...] = ("ec2",)):
+        for region in regions:
+            for service in services:
+                self.client(service, region)
+
+aws_clients = AWSClientPool()
+
+# Regions whose clients are built at startup instead of on the first request
+AWS_WARM_REGIONS = [
+    region.strip()
+    for region in os.getenv("AWS_WARM_REGIONS", os.getenv("AWS_DEFAULT_REGION", "us-west-2")).split(",")
+    if region.strip()
+]
+
+@app.on_event("startup")
+async def warm_aws_clients():
+    try:
+        await run_aws(aws_clients.warm_up, AWS_WARM_REGIONS, ("ec2", "sts"))
+        logger.info(f"Warmed AWS clients for regions: {', '.join(AWS_WARM_REGIONS)}")
+    except HTTPException as e:
+        logger.warning(f"Skipping AWS client warm-up: {e.detail}")
+
+def get_ec2_client_from_env(region: str = "us-west-2"):
+    """Return a cached EC2 client built from the credentials in the environment"""
+    try:
+        return aws_clients.client('ec2', region)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating EC2 client: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to create AWS session: {str(e)}")
@@ -91,163 +262,534 @@ async def health():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
-@app.post("/ec2/instances")
+def ec2_instance_record(instance: Dict[str, Any]) -> Dict[str, Any]:
+    """Project a raw describe_instances instance onto the EC2Instance fields"""
+    launch_time = instance.get('LaunchTime')
+    return {
+        "instance_id": instance['InstanceId'],
+        "instance_type": instance['InstanceType'],
+        "state": instance['State']['Name'],
+        "public_ip": instance.get('PublicIpAddress'),
+        "private_ip": instance.get('PrivateIpAddress'),
+        "launch_time": launch_time.isoformat() if launch_time else None,
+        "tags": {tag['Key']: tag['Value'] for tag in instance.get('Tags', ())},
+        "security_groups": [sg['GroupName'] for sg in instance.get('SecurityGroups', ())],
+        "vpc_id": instance.get('VpcId'),
+        "subnet_id": instance.get('SubnetId'),
+        "availability_zone": instance.get('Placement', {}).get('AvailabilityZone')
+    }
+
+def parse_ec2_instances(response: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    EC2Instance-shaped dicts from a describe_instances response.
+    AWS responses are trusted, so instances skip model validation and are serialized as-is.
+    """
+    return [
+        ec2_instance_record(instance)
+        for reservation in response['Reservations']
+        for instance in reservation['Instances']
+    ]
+
+def dump_json(payload: Any) -> bytes:
+    """Compact JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+
+def json_response(payload: Any) -> Response:
+    """Send a payload without FastAPI's response validation and jsonable_encoder pass"""
+    return Response(content=dump_json(payload), media_type="application/json")
+
+def describe_ec2_page(ec2_client, filters: List[Dict[str, Any]], page_size: int,
+                      cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of instances (blocking) and the cursor for the next page, if any"""
+    params: Dict[str, Any] = {"Filters": filters, "MaxResults": page_size}
+    if cursor:
+        params["NextToken"] = cursor
+    response = ec2_client.describe_instances(**params)
+    return parse_ec2_instances(response), response.get("NextToken")
+
+def describe_all_ec2_instances(ec2_client, filters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Every matching instance (blocking); describe_instances is paginated past 1,000 results"""
+    instances = []
+    for page in ec2_client.get_paginator("describe_instances").paginate(Filters=filters):
+        instances.extend(parse_ec2_instances(page))
+    return instances
+
+def aws_http_error(e: Exception) -> HTTPException:
+    """Map an exception raised while talking to AWS onto the HTTP error the API returns"""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, NoCredentialsError):
+        logger.error("AWS credentials not found")
+        return HTTPException(status_code=401, detail="AWS credentials not found or invalid")
+    if isinstance(e, ClientError):
+        error_code = e.response['Error']['Code']
+        error_message = e.response['Error']['Message']
+        logger.error(f"AWS ClientError: {error_code} - {error_message}")
+        
+        if error_code == 'InvalidUserID.NotFound':
+            return HTTPException(status_code=401, detail="Invalid AWS credentials")
+        elif error_code == 'UnauthorizedOperation':
+            return HTTPException(status_code=403, detail="Insufficient permissions to access EC2")
+        elif error_code in ('InvalidParameterValue', 'InvalidNextToken', 'InvalidFilter'):
+            return HTTPException(status_code=400, detail=f"AWS Error: {error_message}")
+        else:
+            return HTTPException(status_code=500, detail=f"AWS Error: {error_message}")
+    logger.error(f"Unexpected error listing EC2 instances: {e}")
+    return HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@app.post("/ec2/instances", response_model=EC2ListResponse)
 async def list_ec2_instances(config: AWSConfig):
     """
-    List EC2 instances using AWS credentials from environment variables
+    List EC2 instances using AWS credentials from environment variables.
+    Served from the inventory cache while it is fresh, unless fresh or paging is requested.
+    Filters are applied by AWS. With page_size set, one page is returned along with
+    next_cursor; otherwise every matching instance is returned.
     """
     try:
         logger.info(f"Listing EC2 instances in region: {config.region}")
         
+        paged = bool(config.page_size or config.cursor)
+        if not paged and not config.fresh:
+            cached = inventory.cached(config.region, await run_aws(aws_clients.credentials))
+            if cached is not None:
+                region_inventory, access_key_used = cached
+                instances = [
+                    instance for instance in region_inventory.instances.values()
+                    if config.matches(instance)
+                ]
+                return json_response({
+                    "instances": instances,
+                    "total_count": len(instances),
+                    "region": config.region,
+                    "access_key_used": access_key_used,
+                    "timestamp": datetime.fromtimestamp(region_inventory.refreshed_at).isoformat(),
+                    "next_cursor": None,
+                    "version": region_inventory.token()
+                })
+        
         # Create EC2 client using environment variables
-        ec2_client, access_key_used = get_ec2_client_from_env(config.region)
+        ec2_client, access_key_used = await run_aws(get_ec2_client_from_env, config.region)
         
         # Describe instances
-        response = ec2_client.describe_instances()
-        
-        instances = []
-        
-        for reservation in response['Reservations']:
-            for instance in reservation['Instances']:
-                # Extract tags
-                tags = {}
-                if 'Tags' in instance:
-                    for tag in instance['Tags']:
-                        tags[tag['Key']] = tag['Value']
-                
-                # Extract security groups
-                security_groups = []
-                if 'SecurityGroups' in instance:
-                    for sg in instance['SecurityGroups']:
-                        security_groups.append(sg['GroupName'])
-                
-                # Create instance object
-                ec2_instance = EC2Instance(
-                    instance_id=instance['InstanceId'],
-                    instance_type=instance['InstanceType'],
-                    state=instance['State']['Name'],
-                    public_ip=instance.get('PublicIpAddress'),
-                    private_ip=instance.get('PrivateIpAddress'),
-                    launch_time=instance.get('LaunchTime').isoformat() if instance.get('LaunchTime') else None,
-                    tags=tags,
-                    security_groups=security_groups,
-                    vpc_id=instance.get('VpcId'),
-                    subnet_id=instance.get('SubnetId'),
-                    availability_zone=instance.get('Placement', {}).get('AvailabilityZone')
-                )
-                instances.append(ec2_instance)
+        filters = config.to_aws_filters()
+        next_cursor = None
+        version = None
+        if paged:
+            instances, next_cursor = await run_aws(
+                describe_ec2_page, ec2_client, filters, config.page_size or 1000, config.cursor
+            )
+        else:
+            listed_at = time.time()
+            instances = await run_aws(describe_all_ec2_instances, ec2_client, filters)
+            if config.is_empty():
+                # A full unfiltered listing is a complete snapshot, so it refreshes the cache too,
+                # unless a refresh that started later got there first
+                region_inventory = inventory.get(aws_clients.fingerprint, config.region)
+                async with region_inventory.lock:
+                    if region_inventory.listed_at is None or region_inventory.listed_at <= listed_at:
+                        region_inventory.update(instances, listed_at=listed_at)
+                        version = region_inventory.token()
+                if is_known_region(config.region):
+                    inventory.track(config.region)
         
         logger.info(f"Found {len(instances)} EC2 instances using access key: {access_key_used[:10]}...")
         
-        return EC2ListResponse(
-            instances=instances,
-            total_count=len(instances),
-            region=config.region,
-            access_key_used=access_key_used,
-            timestamp=datetime.now().isoformat()
-        )
+        return json_response({
+            "instances": instances,
+            "total_count": len(instances),
+            "region": config.region,
+            "access_key_used": access_key_used,
+            "timestamp": datetime.now().isoformat(),
+            "next_cursor": next_cursor,
+            "version": version
+        })
         
-    except NoCredentialsError:
-        logger.error("AWS credentials not found")
-        raise HTTPException(status_code=401, detail="AWS credentials not found or invalid")
-    except ClientError as e:
-        error_code = e.response['Error']['Code']
-        error_message = e.response['Error']['Message']
-        logger.error(f"AWS ClientError: {error_code} - {error_message}")
-        
-        if error_code == 'InvalidUserID.NotFound':
-            raise HTTPException(status_code=401, detail="Invalid AWS credentials")
-        elif error_code == 'UnauthorizedOperation':
-            raise HTTPException(status_code=403, detail="Insufficient permissions to access EC2")
+    except Exception as e:
+        raise aws_http_error(e)
+
+# Regions scanned concurrently by /ec2/instances/regions
+AWS_REGION_CONCURRENCY = int(os.getenv("AWS_REGION_CONCURRENCY", "8"))
+
+class RegionScanRequest(EC2Filters):
+    regions: Optional[List[str]] = None
+
+async def scan_region(region: str, filters: List[Dict[str, Any]], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """List one region's instances; failures are reported in the result instead of raised"""
+    start = time.perf_counter()
+    try:
+        async with semaphore:
+            ec2_client, _ = await run_aws(get_ec2_client_from_env, region)
+            instances = await run_aws(describe_all_ec2_instances, ec2_client, filters)
+        return {
+            "region": region,
+            "status": "success",
+            "instances": instances,
+            "total_count": len(instances),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+    except Exception as e:
+        error = aws_http_error(e)
+        return {
+            "region": region,
+            "status": "error",
+            "status_code": error.status_code,
+            "message": error.detail,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+@app.post("/ec2/instances/regions")
+async def list_ec2_instances_all_regions(request: RegionScanRequest):
+    """
+    List EC2 instances in several regions at once (all known regions by default).
+    Streams NDJSON: one line per region as soon as that region finishes, then a summary line.
+    """
+    regions = request.regions or [region["code"] for region in AWS_REGIONS]
+    unknown = [region for region in regions if not is_known_region(region)]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown regions: {', '.join(unknown)}")
+    # Fail fast on missing credentials instead of reporting the same error for every region
+    await run_aws(aws_clients.credentials)
+
+    async def results():
+        semaphore = asyncio.Semaphore(AWS_REGION_CONCURRENCY)
+        start = time.perf_counter()
+        filters = request.to_aws_filters()
+        tasks = [asyncio.ensure_future(scan_region(region, filters, semaphore)) for region in regions]
+        succeeded = failed = total_count = 0
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                if result["status"] == "success":
+                    succeeded += 1
+                    total_count += result["total_count"]
+                else:
+                    failed += 1
+                yield dump_json(result) + b"\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+        logger.info(f"Scanned {len(regions)} regions: {total_count} instances, {failed} failed regions")
+        yield dump_json({
+            "summary": {
+                "regions": len(regions),
+                "succeeded": succeeded,
+                "failed": failed,
+                "total_count": total_count,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                "timestamp": datetime.now().isoformat()
+            }
+        }) + b"\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+# Background-refreshed EC2 inventory; 0 disables both the refresh loop and cached reads
+EC2_INVENTORY_REFRESH_SECONDS = float(os.getenv("EC2_INVENTORY_REFRESH_SECONDS", "60"))
+# Cached listings older than this are not served (e.g. when refreshes keep failing)
+EC2_INVENTORY_MAX_AGE = float(os.getenv("EC2_INVENTORY_MAX_AGE", str(EC2_INVENTORY_REFRESH_SECONDS * 3)))
+# Versions a delta can reach back; older since tokens get a full snapshot instead
+EC2_INVENTORY_HISTORY = int(os.getenv("EC2_INVENTORY_HISTORY", "100"))
+# Regions refreshed from startup; other regions join the inventory on their first full listing
+EC2_INVENTORY_REGIONS = [
+    region.strip()
+    for region in os.getenv("EC2_INVENTORY_REGIONS", ",".join(AWS_WARM_REGIONS)).split(",")
+    if region.strip()
+]
+
+class RegionInventory:
+    """
+    The instances of one (credentials, region), versioned for deltas.
+    Every refresh that changes something bumps the version; each instance remembers when it
+    first appeared and when it last changed, and removed instances leave a tombstone, so the
+    changes since any recent version can be answered without storing old snapshots.
+    """
+    def __init__(self, region: str):
+        self.region = region
+        # Tokens from another process or an older inventory never alias this one's versions
+        self.epoch = os.urandom(4).hex()
+        self.version = 0
+        self.oldest_version = 0
+        self.instances: Dict[str, Dict[str, Any]] = {}
+        self.first_seen: Dict[str, int] = {}
+        self.changed_at: Dict[str, int] = {}
+        self.tombstones: Dict[str, Tuple[int, int]] = {}  # instance_id -> (first_seen, removed_at)
+        self.refreshed_at: Optional[float] = None
+        # When the listing behind the current instances was requested
+        self.listed_at: Optional[float] = None
+        self.lock = asyncio.Lock()
+
+    def token(self) -> str:
+        return f"{self.epoch}.{self.version}"
+
+    def update(self, instances: List[Dict[str, Any]], listed_at: Optional[float] = None) -> int:
+        """
+        Apply a complete listing and return how many instances were added, changed or removed.
+        listed_at is when the listing was requested (default: now).
+        """
+        current = {instance["instance_id"]: instance for instance in instances}
+        version = self.version + 1
+        touched = 0
+        for instance_id, instance in current.items():
+            previous = self.instances.get(instance_id)
+            if previous is None:
+                self.first_seen[instance_id] = version
+                self.tombstones.pop(instance_id, None)
+            elif previous == instance:
+                continue
+            self.changed_at[instance_id] = version
+            touched += 1
+        for instance_id in self.instances.keys() - current.keys():
+            self.tombstones[instance_id] = (self.first_seen.pop(instance_id), version)
+            del self.changed_at[instance_id]
+            touched += 1
+
+        self.instances = current
+        self.refreshed_at = time.time()
+        self.listed_at = listed_at if listed_at is not None else self.refreshed_at
+        if touched:
+            self.version = version
+            self.oldest_version = max(self.oldest_version, version - EC2_INVENTORY_HISTORY)
+            self.tombstones = {
+                instance_id: tombstone for instance_id, tombstone in self.tombstones.items()
+                if tombstone[1] > self.oldest_version
+            }
+        return touched
+
+    def changes_since(self, since: Optional[str]) -> Dict[str, Any]:
+        """Instances added, changed or removed after the version in a since token"""
+        base = None
+        if since:
+            epoch, _, version = since.partition(".")
+            if epoch == self.epoch and version.isdigit() and self.oldest_version <= int(version) <= self.version:
+                base = int(version)
+        if base is None:
+            # Unknown, expired or missing token: the client has to resync from a full snapshot
+            return {"full": True, "added": list(self.instances.values()), "changed": [], "removed": []}
+
+        added, changed = [], []
+        for instance_id, changed_at in self.changed_at.items():
+            if changed_at > base:
+                target = added if self.first_seen[instance_id] > base else changed
+                target.append(self.instances[instance_id])
+        removed = [
+            instance_id for instance_id, (first_seen, removed_at) in self.tombstones.items()
+            if removed_at > base and first_seen <= base
+        ]
+        return {"full": False, "added": added, "changed": changed, "removed": removed}
+
+class EC2Inventory:
+    """
+    In-memory EC2 inventory per (credentials fingerprint, region), refreshed in the background.
+    Listings are served from memory while fresh; dashboards poll /ec2/instances/changes for deltas.
+    """
+    def __init__(self, regions: List[str]):
+        self.regions = list(regions)
+        self.inventories: Dict[Tuple[str, str], RegionInventory] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def get(self, fingerprint: str, region: str) -> RegionInventory:
+        key = (fingerprint, region)
+        region_inventory = self.inventories.get(key)
+        if region_inventory is None:
+            # Inventories of rotated-out credentials may belong to another account; drop them
+            self.inventories = {
+                existing: value for existing, value in self.inventories.items() if existing[0] == fingerprint
+            }
+            region_inventory = self.inventories[key] = RegionInventory(region)
+        return region_inventory
+
+    def track(self, region: str):
+        """Include a region in the background refresh from now on"""
+        if region not in self.regions:
+            self.regions.append(region)
+
+    def cached(self, region: str, credentials: Tuple[str, str]) -> Optional[Tuple[RegionInventory, str]]:
+        """
+        The fresh inventory for a region under credentials, and their access key.
+        Resolving credentials stats .env, so callers on the event loop get them through run_aws.
+        """
+        if EC2_INVENTORY_REFRESH_SECONDS <= 0:
+            return None
+        access_key_id, secret_access_key = credentials
+        region_inventory = self.inventories.get((aws_clients.fingerprint_of(access_key_id, secret_access_key), region))
+        if region_inventory is None or region_inventory.refreshed_at is None:
+            return None
+        if time.time() - region_inventory.refreshed_at > EC2_INVENTORY_MAX_AGE:
+            return None
+        return region_inventory, access_key_id
+
+    async def refresh(self, region: str, semaphore: Optional[asyncio.Semaphore] = None) -> RegionInventory:
+        """Re-list a region; concurrent refreshes of the same region share one AWS listing"""
+        ec2_client, _ = await run_aws(get_ec2_client_from_env, region)
+        region_inventory = self.get(aws_clients.fingerprint, region)
+        requested_at = time.time()
+        async with region_inventory.lock:
+            if region_inventory.refreshed_at is not None and region_inventory.refreshed_at >= requested_at:
+                return region_inventory
+            listed_at = time.time()
+            if semaphore is not None:
+                async with semaphore:
+                    instances = await run_aws(describe_all_ec2_instances, ec2_client, [])
+            else:
+                instances = await run_aws(describe_all_ec2_instances, ec2_client, [])
+            touched = region_inventory.update(instances, listed_at=listed_at)
+        logger.debug(f"Refreshed EC2 inventory for {region}: {len(instances)} instances, {touched} changes")
+        return region_inventory
+
+    async def refresh_all(self):
+        semaphore = asyncio.Semaphore(AWS_REGION_CONCURRENCY)
+        regions = list(self.regions)
+        results = await asyncio.gather(
+            *(self.refresh(region, semaphore) for region in regions),
+            return_exceptions=True
+        )
+        for region, result in zip(regions, results):
+            if isinstance(result, Exception):
+                error = aws_http_error(result)
+                logger.warning(f"EC2 inventory refresh failed for {region}: {error.detail}")
+
+    async def run(self):
+        while True:
+            await self.refresh_all()
+            await asyncio.sleep(EC2_INVENTORY_REFRESH_SECONDS)
+
+    def start(self):
+        if EC2_INVENTORY_REFRESH_SECONDS > 0 and self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+inventory = EC2Inventory(EC2_INVENTORY_REGIONS)
+
+@app.on_event("startup")
+async def start_ec2_inventory():
+    inventory.start()
+
+@app.on_event("shutdown")
+async def stop_ec2_inventory():
+    await inventory.stop()
+
+@app.get("/ec2/instances/changes")
+async def list_ec2_instance_changes(region: str = "us-east-1", since: Optional[str] = None):
+    """
+    Instances added, changed or removed in a region since a version token.
+    Without a usable since token (none, expired, or from before a restart) the full inventory
+    is returned as added with full=true; store the returned version for the next poll.
+    """
+    if not is_known_region(region):
+        raise HTTPException(status_code=400, detail=f"Unknown region: {region}")
+    try:
+        credentials = await run_aws(aws_clients.credentials)
+        cached = inventory.cached(region, credentials)
+        if cached is None:
+            region_inventory = await inventory.refresh(region)
+            inventory.track(region)
+            access_key_used = credentials[0]
         else:
-            raise HTTPException(status_code=500, detail=f"AWS Error: {error_message}")
+            region_inventory, access_key_used = cached
+        return json_response({
+            "region": region,
+            "since": since,
+            "version": region_inventory.token(),
+            **region_inventory.changes_since(since),
+            "access_key_used": access_key_used,
+            "timestamp": datetime.fromtimestamp(region_inventory.refreshed_at).isoformat()
+        })
     except Exception as e:
-        logger.error(f"Unexpected error listing EC2 instances: {e}")
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+        raise aws_http_error(e)
+
+# Regions offered by the dashboard
+AWS_REGIONS = [
+    {"code": "us-east-1", "name": "US East (N. Virginia)"},
+    {"code": "us-east-2", "name": "US East (Ohio)"},
+    {"code": "us-west-1", "name": "US West (N. California)"},
+    {"code": "us-west-2", "name": "US West (Oregon)"},
+    {"code": "eu-west-1", "name": "Europe (Ireland)"},
+    {"code": "eu-west-2", "name": "Europe (London)"},
+    {"code": "eu-central-1", "name": "Europe (Frankfurt)"},
+    {"code": "ap-southeast-1", "name": "Asia Pacific (Singapore)"},
+    {"code": "ap-southeast-2", "name": "Asia Pacific (Sydney)"},
+    {"code": "ap-northeast-1", "name": "Asia Pacific (Tokyo)"},
+    {"code": "ca-central-1", "name": "Canada (Central)"},
+    {"code": "sa-east-1", "name": "South America (São Paulo)"}
+]
+
+def is_known_region(region: str) -> bool:
+    return any(known["code"] == region for known in AWS_REGIONS)
 
 @app.get("/ec2/regions")
 async def list_aws_regions():
     """
     List available AWS regions
     """
-    regions = [
-        {"code": "us-east-1", "name": "US East (N. Virginia)"},
-        {"code": "us-east-2", "name": "US East (Ohio)"},
-        {"code": "us-west-1", "name": "US West (N. California)"},
-        {"code": "us-west-2", "name": "US West (Oregon)"},
-        {"code": "eu-west-1", "name": "Europe (Ireland)"},
-        {"code": "eu-west-2", "name": "Europe (London)"},
-        {"code": "eu-central-1", "name": "Europe (Frankfurt)"},
-        {"code": "ap-southeast-1", "name": "Asia Pacific (Singapore)"},
-        {"code": "ap-southeast-2", "name": "Asia Pacific (Sydney)"},
-        {"code": "ap-northeast-1", "name": "Asia Pacific (Tokyo)"},
-        {"code": "ca-central-1", "name": "Canada (Central)"},
-        {"code": "sa-east-1", "name": "South America (São Paulo)"}
-    ]
-    return {"regions": regions}
+    return {"regions": AWS_REGIONS}
 
-@app.get("/ec2/test-credentials")
-async def test_aws_credentials():
+# Credential self-test results are reused per key fingerprint; failures are retried sooner
+CREDENTIAL_CHECK_TTL = float(os.getenv("CREDENTIAL_CHECK_TTL", "60"))
+CREDENTIAL_CHECK_ERROR_TTL = float(os.getenv("CREDENTIAL_CHECK_ERROR_TTL", "5"))
+
+def check_aws_credentials(access_key_id: str):
     """
-    Test AWS credentials and permissions
+    Test AWS credentials and permissions (blocking, runs on the AWS thread pool).
+    EC2 access is probed with a DryRun describe_instances, which AWS authorizes without
+    listing anything. ec2_instances_found comes from the inventory cache, or while that is cold
+    from a first page of at most 5 instances.
     """
     try:
-        # Test if credentials are loaded
-        access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
-        secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-        
-        if not access_key_id or not secret_access_key:
-            return {
-                "status": "error",
-                "message": "AWS credentials not found in environment variables",
-                "access_key_id": "Not set" if not access_key_id else f"{access_key_id[:10]}...",
-                "secret_access_key": "Not set" if not secret_access_key else "Set"
-            }
-        
-        # Test basic AWS connection
-        session = boto3.Session(
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key,
-            region_name='us-east-1'
-        )
-        
         # Test with STS to get caller identity
-        sts_client = session.client('sts')
+        sts_client, _ = aws_clients.client('sts', 'us-east-1')
         identity = sts_client.get_caller_identity()
         
         # Test EC2 permissions
-        ec2_client = session.client('ec2', region_name='us-east-1')
+        ec2_client, _ = aws_clients.client('ec2', 'us-east-1')
         
-        # Try to list instances (this will fail if no permissions)
+        # DryRun fails with DryRunOperation when allowed and UnauthorizedOperation when not
         try:
-            response = ec2_client.describe_instances()
-            instance_count = sum(len(reservation['Instances']) for reservation in response['Reservations'])
-            
-            return {
-                "status": "success",
-                "message": "AWS credentials are valid and have EC2 permissions",
-                "access_key_id": f"{access_key_id[:10]}...",
-                "user_arn": identity.get('Arn', 'Unknown'),
-                "user_id": identity.get('UserId', 'Unknown'),
-                "account_id": identity.get('Account', 'Unknown'),
-                "ec2_instances_found": instance_count,
-                "region": "us-east-1"
-            }
+            ec2_client.describe_instances(DryRun=True)
         except ClientError as e:
             error_code = e.response['Error']['Code']
             error_message = e.response['Error']['Message']
             
-            return {
-                "status": "error",
-                "message": f"EC2 access denied: {error_message}",
-                "error_code": error_code,
-                "access_key_id": f"{access_key_id[:10]}...",
-                "user_arn": identity.get('Arn', 'Unknown'),
-                "user_id": identity.get('UserId', 'Unknown'),
-                "account_id": identity.get('Account', 'Unknown'),
-                "suggestion": "Add EC2 read permissions to your IAM user"
-            }
+            if error_code != 'DryRunOperation':
+                return {
+                    "status": "error",
+                    "message": f"EC2 access denied: {error_message}",
+                    "error_code": error_code,
+                    "access_key_id": f"{access_key_id[:10]}...",
+                    "user_arn": identity.get('Arn', 'Unknown'),
+                    "user_id": identity.get('UserId', 'Unknown'),
+                    "account_id": identity.get('Account', 'Unknown'),
+                    "suggestion": "Add EC2 read permissions to your IAM user"
+                }
+        
+        # The count comes from the inventory cache when it has the region; the probe lists nothing
+        cached = inventory.cached('us-east-1', aws_clients.credentials())
+        if cached is not None:
+            instance_count = len(cached[0].instances)
+        else:
+            response = ec2_client.describe_instances(MaxResults=5)
+            instance_count = sum(len(reservation['Instances']) for reservation in response['Reservations'])
+        return {
+            "status": "success",
+            "message": "AWS credentials are valid and have EC2 permissions",
+            "access_key_id": f"{access_key_id[:10]}...",
+            "user_arn": identity.get('Arn', 'Unknown'),
+            "user_id": identity.get('UserId', 'Unknown'),
+            "account_id": identity.get('Account', 'Unknown'),
+            "ec2_instances_found": instance_count,
+            "region": "us-east-1"
+        }
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error testing AWS credentials: {e}")
         return {
@@ -257,6 +799,68 @@ async def test_aws_credentials():
             "suggestion": "Check your AWS credentials and IAM permissions"
         }
 
+class CredentialCheckCache:
+    """
+    Credential self-test results per key fingerprint.
+    Dashboards poll the self-test, so a result is reused for CREDENTIAL_CHECK_TTL seconds and
+    concurrent callers share a single in-flight check instead of each calling AWS.
+    """
+    def __init__(self):
+        self.results: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self.in_flight: Dict[str, asyncio.Future] = {}
+
+    async def check(self, access_key_id: str, secret_access_key: str) -> Dict[str, Any]:
+        fingerprint = aws_clients.fingerprint_of(access_key_id, secret_access_key)
+        cached = self.results.get(fingerprint)
+        if cached is not None and time.monotonic() < cached[0]:
+            return cached[1]
+
+        future = self.in_flight.get(fingerprint)
+        if future is None:
+            future = asyncio.ensure_future(self._check(fingerprint, access_key_id))
+            self.in_flight[fingerprint] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(fingerprint, None))
+        # A caller that disconnects must not cancel the check the others are waiting on
+        return await asyncio.shield(future)
+
+    async def _check(self, fingerprint: str, access_key_id: str) -> Dict[str, Any]:
+        try:
+            result = await run_aws(check_aws_credentials, access_key_id)
+        except HTTPException as e:
+            result = {
+                "status": "error",
+                "message": f"Failed to test credentials: {e.detail}",
+                "access_key_id": "Unknown",
+                "suggestion": "Check your AWS credentials and IAM permissions"
+            }
+        result["checked_at"] = datetime.now().isoformat()
+        ttl = CREDENTIAL_CHECK_TTL if result["status"] == "success" else CREDENTIAL_CHECK_ERROR_TTL
+        # Only the current credentials are worth keeping
+        self.results = {fingerprint: (time.monotonic() + ttl, result)}
+        return result
+
+credential_checks = CredentialCheckCache()
+
+@app.get("/ec2/test-credentials")
+async def test_aws_credentials():
+    """
+    Test AWS credentials and permissions (cached per key for CREDENTIAL_CHECK_TTL seconds)
+    """
+    # Test if credentials are loaded
+    await run_aws(aws_clients.reload_dotenv)
+    access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
+    secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
+    
+    if not access_key_id or not secret_access_key:
+        return {
+            "status": "error",
+            "message": "AWS credentials not found in environment variables",
+            "access_key_id": "Not set" if not access_key_id else f"{access_key_id[:10]}...",
+            "secret_access_key": "Not set" if not secret_access_key else "Set"
+        }
+    
+    return await credential_checks.check(access_key_id, secret_access_key)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -18,10 +18,19 @@ export interface EC2ListResponse {
   region: string
   access_key_used: string
   timestamp: string
+  next_cursor?: string
+  version?: string
 }
 
 export interface AWSConfig {
   region: string
+  states?: string[]
+  tags?: Record<string, string>
+  vpc_ids?: string[]
+  instance_types?: string[]
+  page_size?: number
+  cursor?: string
+  fresh?: boolean
 }
 
 export interface AWSRegion {
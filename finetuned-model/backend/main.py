@@ -0,0 +1,650 @@
+"""
+CPU inference server for the fine-tuned text-to-SQL / secret-scanning model.
+
+Loads the merged_model directory written by slm-model/HuggingFaceExample/01_finetuning and serves it
+with continuous batching: one engine thread owns the model and advances every active request by one
+token per forward pass. New requests are prefilled and join the running batch between steps, and
+finished ones leave it, so a long generation never holds up a short one. The KV state of prompt
+prefixes (the system prompt, the system prompt with each schema, earlier chat turns) is kept in an
+LRU cache under a memory budget, so a repeated schema is never prefilled twice.
+
+    POST /generate     {"messages": [...]}             chat completion, "stream": true for NDJSON tokens
+    POST /sql          {"question": ..., "context": ...} the prompt the model was fine-tuned on
+    POST /scan         {"code": ...} -> {"analysis": ...}  the API finetuned-model/1.py calls
+    POST /scan/batch   {"codes": [...]} -> {"analyses": [...]}
+    GET  /stats        throughput, batch size, time to first token and latency percentiles
+"""
+from fastapi import FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Tuple
+from array import array
+from collections import OrderedDict, deque
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dotenv import find_dotenv, load_dotenv
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer, DynamicCache
+
+# Load environment variables
+load_dotenv(find_dotenv())
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Output of the fine-tuning job (consolidate_and_merge's output_dir)
+MODEL_DIR = os.getenv("MODEL_DIR", "merged_model")
+# float32 is the fastest dtype on most CPUs; bfloat16 halves memory where the CPU supports it
+MODEL_DTYPE = os.getenv("MODEL_DTYPE", "float32")
+# Intra-op threads of the forward passes (0 keeps torch's default, one per core)
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", "0"))
+# Requests decoded together; more wait in the queue and join as rows free up
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "8"))
+MAX_NEW_TOKENS = int(os.getenv("MAX_NEW_TOKENS", "128"))
+MAX_INPUT_TOKENS = int(os.getenv("MAX_INPUT_TOKENS", "1024"))
+# Snippets one /scan/batch request may carry; each becomes its own queued generation
+MAX_SCAN_BATCH = int(os.getenv("MAX_SCAN_BATCH", "64"))
+# Reuse the KV state of cached prompt prefixes (0 prefills every prompt in full), and the memory
+# the cached tensors may take before the least recently used prefixes are evicted
+PREFIX_CACHE = os.getenv("PREFIX_CACHE", "1") != "0"
+PREFIX_CACHE_MB = float(os.getenv("PREFIX_CACHE_MB", "512"))
+# Completed requests the latency percentiles of /stats are computed over
+STATS_WINDOW = int(os.getenv("STATS_WINDOW", "1000"))
+
+# The system message the model was fine-tuned with (preprocess.SYSTEM_MESSAGE); the schema is appended
+SQL_SYSTEM_MESSAGE = (
+    "You are a text to SQL query translator. Users will ask you questions in English and you will generate a "
+    "SQL query based on the provided SCHEMA.\nSCHEMA:\n"
+)
+SCAN_SYSTEM_MESSAGE = os.getenv(
+    "SCAN_SYSTEM_MESSAGE",
+    "You are a security reviewer. Report any hard-coded secrets, credentials or API keys in the user's code, "
+    "or answer 'No secrets detected'.",
+)
+
+app = FastAPI(title="Fine-tuned Model Inference API", version="1.0.0")
+
+# Add CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # In production, specify your frontend URL
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Pydantic models
+class ChatMessage(BaseModel):
+    role: str
+    content: str
+
+class GenerateRequest(BaseModel):
+    messages: List[ChatMessage]
+    max_new_tokens: Optional[int] = Field(default=None, ge=1)
+    temperature: float = Field(default=0.0, ge=0.0)
+    stream: bool = False
+
+class SQLRequest(BaseModel):
+    question: str
+    context: str
+    max_new_tokens: Optional[int] = Field(default=None, ge=1)
+    temperature: float = Field(default=0.0, ge=0.0)
+    stream: bool = False
+
+class ScanRequest(BaseModel):
+    code: str
+
+class BatchScanRequest(BaseModel):
+    codes: List[str] = Field(max_length=MAX_SCAN_BATCH)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))]
+
+
+class Generation:
+    """
+    One request inside the engine. The engine thread appends tokens and hands events to the
+    request's event loop: ("token", id) for each new token, then ("done", reason) or ("error", message).
+    """
+
+    def __init__(self, prompt_ids: List[int], prefix_lengths: List[int], max_new_tokens: int,
+                 temperature: float, loop: asyncio.AbstractEventLoop):
+        self.prompt_ids = prompt_ids
+        # Lengths of the prompt's cacheable prefixes, ascending
+        self.prefix_lengths = prefix_lengths
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.loop = loop
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.token_ids: List[int] = []
+        self.reused_tokens = 0
+        self.cancelled = False
+        self.finish_reason: Optional[str] = None
+        self.submitted = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def emit(self, kind: str, value: Any):
+        self.loop.call_soon_threadsafe(self.events.put_nowait, (kind, value))
+
+    def usage(self) -> Dict[str, Any]:
+        ttft = (self.first_token_at or self.submitted) - self.submitted
+        return {
+            "prompt_tokens": len(self.prompt_ids),
+            "reused_prompt_tokens": self.reused_tokens,
+            "completion_tokens": len(self.token_ids),
+            "ttft_ms": round(ttft * 1000, 2),
+            "latency_ms": round(((self.finished_at or time.perf_counter()) - self.submitted) * 1000, 2),
+        }
+
+
+class EngineStats:
+    """Counters and rolling latency windows behind /stats"""
+
+    def __init__(self, window: int):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.prefilled_tokens = 0
+        self.reused_tokens = 0
+        self.prefix_hits = 0
+        self.generated_tokens = 0
+        self.decode_steps = 0
+        self.decode_rows = 0
+        self.busy_seconds = 0.0
+        self.ttft: deque = deque(maxlen=window)
+        self.latency: deque = deque(maxlen=window)
+        self.inter_token: deque = deque(maxlen=window)
+
+    def finished(self, generation: Generation):
+        with self.lock:
+            self.requests += 1
+            self.prompt_tokens += len(generation.prompt_ids)
+            self.reused_tokens += generation.reused_tokens
+            self.prefix_hits += bool(generation.reused_tokens)
+            if generation.first_token_at is not None:
+                self.ttft.append(generation.first_token_at - generation.submitted)
+                if len(generation.token_ids) > 1:
+                    self.inter_token.append((generation.finished_at - generation.first_token_at)
+                                            / (len(generation.token_ids) - 1))
+            self.latency.append(generation.finished_at - generation.submitted)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            ttft, latency, inter_token = list(self.ttft), list(self.latency), list(self.inter_token)
+            return {
+                "uptime_s": round(time.time() - self.started, 1),
+                "requests": self.requests,
+                "generated_tokens": self.generated_tokens,
+                # Generated tokens per second the engine spent in forward passes
+                "tokens_per_s": round(self.generated_tokens / self.busy_seconds, 2) if self.busy_seconds else 0.0,
+                "mean_batch_size": round(self.decode_rows / self.decode_steps, 2) if self.decode_steps else 0.0,
+                "prompt_tokens": self.prompt_tokens,
+                "prefilled_tokens": self.prefilled_tokens,
+                "reused_prompt_tokens": self.reused_tokens,
+                "prefix_hit_rate": round(self.prefix_hits / self.requests, 4) if self.requests else 0.0,
+                **{f"ttft_p{p}_ms": round(percentile(ttft, p) * 1000, 2) for p in (50, 95, 99)},
+                **{f"latency_p{p}_ms": round(percentile(latency, p) * 1000, 2) for p in (50, 95, 99)},
+                **{f"inter_token_p{p}_ms": round(percentile(inter_token, p) * 1000, 2) for p in (50, 95, 99)},
+            }
+
+
+# DynamicCache.to_legacy_cache's format
+KVState = Tuple[Tuple[torch.Tensor, torch.Tensor], ...]
+
+
+class PrefixCache:
+    """
+    KV state of prompt prefixes (one key/value pair per layer, batch size 1), keyed by a hash of
+    their token ids. Once the cached tensors exceed budget_bytes the least recently used prefixes
+    are evicted.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.entries: "OrderedDict[bytes, Tuple[Tuple[int, ...], KVState, int]]" = OrderedDict()
+        self.used_bytes = 0
+        # Lookups that found the longest requested prefix, only a shorter one, or none
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(token_ids: List[int]) -> bytes:
+        return hashlib.blake2b(array("q", token_ids).tobytes(), digest_size=16).digest()
+
+    def lookup(self, prompt_ids: List[int], prefix_lengths: List[int]) -> Tuple[int, Optional[KVState]]:
+        """The longest cached prefix of prompt_ids among prefix_lengths: its length and KV state"""
+        with self.lock:
+            lengths = sorted(prefix_lengths, reverse=True)
+            for length in lengths:
+                key = self.key(prompt_ids[:length])
+                entry = self.entries.get(key)
+                # The token ids are kept to rule out hash collisions
+                if entry is not None and entry[0] == tuple(prompt_ids[:length]):
+                    self.entries.move_to_end(key)
+                    if length == lengths[0]:
+                        self.hits += 1
+                    else:
+                        self.partial_hits += 1
+                    return length, entry[1]
+            self.misses += 1
+            return 0, None
+
+    def put(self, token_ids: List[int], state: KVState):
+        nbytes = sum(key.nbytes + value.nbytes for key, value in state)
+        if nbytes > self.budget_bytes:
+            return
+        key = self.key(token_ids)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return
+            self.entries[key] = (tuple(token_ids), state, nbytes)
+            self.used_bytes += nbytes
+            while self.used_bytes > self.budget_bytes:
+                _, (_, _, size) = self.entries.popitem(last=False)
+                self.used_bytes -= size
+                self.evictions += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.partial_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "used_mb": round(self.used_bytes / 2**20, 2),
+                "budget_mb": round(self.budget_bytes / 2**20, 2),
+                "hits": self.hits,
+                "partial_hits": self.partial_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+def pad_left(tensor: torch.Tensor, length: int, dim: int) -> torch.Tensor:
+    missing = length - tensor.shape[dim]
+    if missing <= 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = missing
+    return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
+
+
+class InferenceEngine:
+    """
+    Continuous batching over a left-padded batch KV cache.
+
+    Each row's cache is right-aligned: the attention mask marks the padding on the left, and
+    position ids count only a row's real tokens, so rows of different lengths share one forward
+    pass. A new request is prefilled on its own (on top of its longest cached prefix, if any) and
+    concatenated into the batch; finished rows are dropped and padding columns no row needs any
+    more are trimmed.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size: int = MAX_BATCH_SIZE, prefix_cache: bool = PREFIX_CACHE,
+                 prefix_cache_mb: float = PREFIX_CACHE_MB):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.prefix_cache = prefix_cache
+        self.eos_token_ids = set(model.generation_config.eos_token_id
+                                 if isinstance(model.generation_config.eos_token_id, list)
+                                 else [model.generation_config.eos_token_id or tokenizer.eos_token_id])
+        self.max_length = getattr(model.config, "max_position_embeddings", MAX_INPUT_TOKENS + MAX_NEW_TOKENS)
+        self.pending: "queue.Queue[Generation]" = queue.Queue()
+        self.rows: List[Generation] = []
+        self.cache: Optional[DynamicCache] = None
+        self.attention_mask: Optional[torch.Tensor] = None
+        self.prefixes = PrefixCache(int(prefix_cache_mb * 2**20))
+        self.stats = EngineStats(STATS_WINDOW)
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="inference-engine", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join(timeout=10)
+
+    def submit(self, generation: Generation):
+        self.pending.put(generation)
+
+    def queued(self) -> int:
+        return self.pending.qsize()
+
+    def run(self):
+        with torch.inference_mode():
+            while not self.stopping.is_set():
+                try:
+                    self.admit()
+                    if self.rows:
+                        self.step()
+                except Exception as e:
+                    logger.exception("Inference step failed")
+                    for generation in self.rows:
+                        generation.emit("error", str(e))
+                    self.rows, self.cache, self.attention_mask = [], None, None
+
+    def admit(self):
+        """Prefill waiting requests into free rows; blocks briefly while there is nothing to decode"""
+        while len(self.rows) < self.max_batch_size:
+            try:
+                generation = self.pending.get(timeout=0.05) if not self.rows else self.pending.get_nowait()
+            except queue.Empty:
+                return
+            if generation.cancelled:
+                continue
+            try:
+                self.prefill(generation)
+            except Exception as e:
+                logger.exception("Prefill failed")
+                generation.emit("error", str(e))
+
+    def forward(self, input_ids, attention_mask, position_ids, cache: DynamicCache):
+        start = time.perf_counter()
+        logits = self.model(input_ids=input_ids, attention_mask=attention_mask, position_ids=position_ids,
+                            past_key_values=cache, use_cache=True).logits[:, -1]
+        with self.stats.lock:
+            self.stats.busy_seconds += time.perf_counter() - start
+        return logits
+
+    def prefill(self, generation: Generation):
+        """
+        Start from the longest cached prefix, then prefill up to each uncached prefix boundary
+        (caching its KV state on the way) and on to the end of the prompt
+        """
+        prompt = generation.prompt_ids
+        boundaries = [length for length in generation.prefix_lengths if length < len(prompt)]
+        start, state = self.prefixes.lookup(prompt, boundaries) if self.prefix_cache and boundaries else (0, None)
+        # DynamicCache.update concatenates into new tensors, so cached states are never written to
+        cache = DynamicCache.from_legacy_cache(state)
+        generation.reused_tokens = start
+        ends = [length for length in boundaries if length > start] if self.prefix_cache else []
+        for end in ends + [len(prompt)]:
+            logits = self.forward(torch.tensor([prompt[start:end]]), torch.ones(1, end, dtype=torch.long),
+                                  torch.arange(start, end).unsqueeze(0), cache)
+            if end < len(prompt):
+                self.prefixes.put(prompt[:end], cache.to_legacy_cache())
+            start = end
+        with self.stats.lock:
+            self.stats.prefilled_tokens += len(prompt) - generation.reused_tokens
+
+        self.join(cache, len(prompt))
+        self.rows.append(generation)
+        self.advance([generation], self.sample(logits, [generation]))
+
+    def join(self, cache: DynamicCache, length: int):
+        """Concatenate a single-row cache into the batch, left-padding whichever side is shorter"""
+        mask = torch.ones(1, length, dtype=torch.long)
+        if self.cache is None:
+            self.cache, self.attention_mask = cache, mask
+            return
+        width = max(self.attention_mask.shape[1], length)
+        # Caches are rebuilt through the legacy (key, value)-per-layer format rather than edited in place
+        self.cache = DynamicCache.from_legacy_cache(tuple(
+            tuple(torch.cat([pad_left(batch, width, 2), pad_left(row, width, 2)]) for batch, row in zip(*layers))
+            for layers in zip(self.cache.to_legacy_cache(), cache.to_legacy_cache())
+        ))
+        self.attention_mask = torch.cat([pad_left(self.attention_mask, width, 1), pad_left(mask, width, 1)])
+
+    def step(self):
+        """One decode step for every row: feed each row's last token, sample the next"""
+        rows = self.rows
+        input_ids = torch.tensor([[generation.token_ids[-1]] for generation in rows])
+        # A row's next position is the number of real tokens in its cache
+        position_ids = self.attention_mask.sum(dim=1, keepdim=True)
+        self.attention_mask = torch.cat([self.attention_mask, torch.ones(len(rows), 1, dtype=torch.long)], dim=1)
+        logits = self.forward(input_ids, self.attention_mask, position_ids, self.cache)
+        with self.stats.lock:
+            self.stats.decode_steps += 1
+            self.stats.decode_rows += len(rows)
+        self.advance(rows, self.sample(logits, rows))
+
+    def sample(self, logits: torch.Tensor, rows: List[Generation]) -> List[int]:
+        tokens = logits.argmax(dim=-1).tolist()
+        for i, generation in enumerate(rows):
+            if generation.temperature > 0:
+                probs = torch.softmax(logits[i].float() / generation.temperature, dim=-1)
+                tokens[i] = int(torch.multinomial(probs, 1))
+        return tokens
+
+    def advance(self, rows: List[Generation], tokens: List[int]):
+        now = time.perf_counter()
+        for generation, token in zip(rows, tokens):
+            if generation.first_token_at is None:
+                generation.first_token_at = now
+            if token in self.eos_token_ids:
+                generation.finish_reason = "stop"
+                continue
+            generation.token_ids.append(token)
+            generation.emit("token", token)
+            if len(generation.token_ids) >= generation.max_new_tokens:
+                generation.finish_reason = "length"
+            elif len(generation.prompt_ids) + len(generation.token_ids) >= self.max_length:
+                generation.finish_reason = "length"
+        with self.stats.lock:
+            self.stats.generated_tokens += sum(token not in self.eos_token_ids for token in tokens)
+
+        keep = []
+        for i, generation in enumerate(self.rows):
+            if generation.cancelled and generation.finish_reason is None:
+                generation.finish_reason = "cancelled"
+            if generation.finish_reason is None:
+                keep.append(i)
+                continue
+            generation.finished_at = now
+            self.stats.finished(generation)
+            generation.emit("done", generation.finish_reason)
+        if len(keep) < len(self.rows):
+            self.filter(keep)
+
+    def filter(self, keep: List[int]):
+        """Drop finished rows and the left padding columns that only they needed"""
+        self.rows = [self.rows[i] for i in keep]
+        if not self.rows:
+            self.cache, self.attention_mask = None, None
+            return
+        index = torch.tensor(keep)
+        mask = self.attention_mask.index_select(0, index)
+        first = int(mask.any(dim=0).nonzero()[0])
+        self.attention_mask = mask[:, first:]
+        self.cache = DynamicCache.from_legacy_cache(tuple(
+            tuple(tensor.index_select(0, index)[:, :, first:] for tensor in layer)
+            for layer in self.cache.to_legacy_cache()
+        ))
+
+
+engine: Optional[InferenceEngine] = None
+
+
+def get_engine() -> InferenceEngine:
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Model is not loaded")
+    return engine
+
+
+def build_prompt(messages: List[Dict[str, str]], shared_system: Optional[str] = None) -> Tuple[List[int], List[int]]:
+    """
+    Prompt token ids and the lengths of its cacheable prefixes: the chat template rendered up to
+    the end of shared_system (the constant start of the system message) and up to the end of each
+    turn before the last one, e.g. the system message with its schema
+    """
+    tokenizer = get_engine().tokenizer
+    text = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    prompt_ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+    if len(prompt_ids) > MAX_INPUT_TOKENS:
+        raise HTTPException(status_code=400,
+                            detail=f"Prompt is {len(prompt_ids)} tokens, the limit is {MAX_INPUT_TOKENS}")
+    prefix_texts = []
+    if shared_system and messages and messages[0]["role"] == "system" and messages[0]["content"].startswith(shared_system):
+        # Render with a marker where the variable part starts and cut there
+        rendered = tokenizer.apply_chat_template([{"role": "system", "content": shared_system + "\x00"}],
+                                                 tokenize=False)
+        prefix_texts.append(rendered[: rendered.index("\x00")])
+    prefix_texts.extend(tokenizer.apply_chat_template(messages[:turns], tokenize=False)
+                        for turns in range(1, len(messages)))
+    prefix_lengths = set()
+    for prefix_text in prefix_texts:
+        prefix_ids = tokenizer(prefix_text, add_special_tokens=False)["input_ids"]
+        # Merges can cross the boundary: only prefixes the prompt's tokens start with are usable
+        if text.startswith(prefix_text) and prompt_ids[: len(prefix_ids)] == prefix_ids:
+            prefix_lengths.add(len(prefix_ids))
+    return prompt_ids, sorted(prefix_lengths)
+
+
+def start_generation(messages: List[Dict[str, str]], max_new_tokens: Optional[int], temperature: float,
+                     shared_system: Optional[str] = None) -> Generation:
+    prompt_ids, prefix_lengths = build_prompt(messages, shared_system)
+    generation = Generation(prompt_ids, prefix_lengths, min(max_new_tokens or MAX_NEW_TOKENS, MAX_NEW_TOKENS),
+                            temperature, asyncio.get_running_loop())
+    get_engine().submit(generation)
+    return generation
+
+
+async def stream_text(generation: Generation):
+    """Yield text deltas as tokens arrive; holds back incomplete multi-byte characters"""
+    tokenizer = get_engine().tokenizer
+    sent = ""
+    while True:
+        kind, value = await generation.events.get()
+        if kind == "error":
+            raise RuntimeError(value)
+        if kind == "done":
+            text = tokenizer.decode(generation.token_ids, skip_special_tokens=True)
+            if text != sent:
+                yield text[len(sent):]
+            return
+        text = tokenizer.decode(generation.token_ids, skip_special_tokens=True)
+        if not text.endswith("�") and len(text) > len(sent):
+            yield text[len(sent):]
+            sent = text
+
+
+async def complete(generation: Generation) -> Dict[str, Any]:
+    try:
+        chunks = [chunk async for chunk in stream_text(generation)]
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=f"Generation failed: {e}")
+    finally:
+        generation.cancelled = True
+    return {"text": "".join(chunks), "finish_reason": generation.finish_reason, "usage": generation.usage()}
+
+
+def streaming_response(generation: Generation) -> StreamingResponse:
+    """NDJSON: {"text": delta} per decoded chunk, then a final line with the finish reason and usage"""
+    async def lines():
+        try:
+            async for chunk in stream_text(generation):
+                yield json.dumps({"text": chunk}) + "\n"
+            yield json.dumps({"done": True, "finish_reason": generation.finish_reason,
+                              "usage": generation.usage()}) + "\n"
+        except RuntimeError as e:
+            yield json.dumps({"done": True, "error": str(e)}) + "\n"
+        finally:
+            # Frees the row if the client went away mid-stream
+            generation.cancelled = True
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def sql_messages(question: str, context: str) -> List[Dict[str, str]]:
+    return [{"role": "system", "content": SQL_SYSTEM_MESSAGE + context}, {"role": "user", "content": question}]
+
+
+def scan_messages(code: str) -> List[Dict[str, str]]:
+    return [{"role": "system", "content": SCAN_SYSTEM_MESSAGE}, {"role": "user", "content": code}]
+
+
+@app.on_event("startup")
+async def load_model():
+    global engine
+    if TORCH_THREADS > 0:
+        torch.set_num_threads(TORCH_THREADS)
+    logger.info(f"Loading {MODEL_DIR} ({MODEL_DTYPE}, {torch.get_num_threads()} threads)")
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
+    model = AutoModelForCausalLM.from_pretrained(MODEL_DIR, torch_dtype=getattr(torch, MODEL_DTYPE))
+    model.eval()
+    engine = InferenceEngine(model, tokenizer)
+    engine.start()
+    logger.info(f"Serving with batches of up to {MAX_BATCH_SIZE}, "
+                f"prefix cache {f'of {PREFIX_CACHE_MB:g} MB' if PREFIX_CACHE else 'off'}")
+
+
+@app.on_event("shutdown")
+async def stop_engine():
+    if engine is not None:
+        engine.stop()
+
+
+@app.get("/")
+async def root():
+    return {"message": "Fine-tuned Model Inference API", "version": "1.0.0"}
+
+
+@app.get("/health")
+async def health_check():
+    current = get_engine()
+    return {"status": "healthy", "model": MODEL_DIR, "active": len(current.rows), "queued": current.queued()}
+
+
+@app.get("/stats")
+async def stats():
+    current = get_engine()
+    return {**current.stats.snapshot(), "active": len(current.rows), "queued": current.queued(),
+            "max_batch_size": current.max_batch_size, "prefix_cache": current.prefixes.snapshot()}
+
+
+@app.post("/generate")
+async def generate(request: GenerateRequest):
+    messages = [message.model_dump() for message in request.messages]
+    generation = start_generation(messages, request.max_new_tokens, request.temperature)
+    if request.stream:
+        return streaming_response(generation)
+    return await complete(generation)
+
+
+@app.post("/sql")
+async def text_to_sql(request: SQLRequest):
+    generation = start_generation(sql_messages(request.question, request.context), request.max_new_tokens,
+                                  request.temperature, shared_system=SQL_SYSTEM_MESSAGE)
+    if request.stream:
+        return streaming_response(generation)
+    result = await complete(generation)
+    return {"sql": result["text"].strip(), "finish_reason": result["finish_reason"], "usage": result["usage"]}
+
+
+@app.post("/scan")
+async def scan(request: ScanRequest):
+    result = await complete(start_generation(scan_messages(request.code), None, 0.0))
+    return {"analysis": result["text"].strip()}
+
+
+@app.post("/scan/batch")
+async def scan_batch(request: BatchScanRequest):
+    # Every snippet is its own request, so the engine batches them with whatever else is running
+    generations = [start_generation(scan_messages(code), None, 0.0) for code in request.codes]
+    results = await asyncio.gather(*(complete(generation) for generation in generations))
+    return {"analyses": [result["text"].strip() for result in results]}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "8100")))
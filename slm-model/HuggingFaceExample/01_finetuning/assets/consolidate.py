@@ -0,0 +1,224 @@
+"""
+In-process consolidation of tensor-parallel LoRA checkpoints and merge into the base model.
+
+finetune_llama.py used to run consolidate_adapter_shards_and_merge_model.py in a subprocess,
+which re-imported the whole transformers/optimum stack and only knew the checkpoint of the last
+step. consolidate_and_merge does the same work in the calling process:
+
+    select       find_checkpoint picks the latest checkpoint-<step>, the trainer's best one, or a path
+    read         every tensor-parallel shard file is loaded by a thread pool (torch.load with mmap,
+                 after a readahead hint) instead of one after the other
+    consolidate  optimum-neuron's consolidate_tensor_parallel_checkpoints rebuilds the PEFT state
+                 dict from the preloaded shards
+    merge        lora_merge.streaming_merge (or merge_and_unload) writes the merged model
+    tokenizer    the checkpoint's tokenizer is saved next to it
+
+and returns how long each phase took. The consolidation calls into optimum-neuron's checkpointing
+module, which is not a stable API; it is written against OPTIMUM_NEURON_VERSION, the version
+requirements.txt pins. When the installed version no longer has a compatible
+consolidate_tensor_parallel_checkpoints, the public whole-checkpoint consolidation the old script
+used is called instead (without the concurrent shard reads).
+"""
+import importlib.metadata
+import inspect
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import torch
+from safetensors.torch import save_file
+from transformers import AutoConfig, AutoTokenizer
+
+from lora_merge import UnsupportedAdapter, streaming_merge
+
+OPTIMUM_NEURON_VERSION = "0.3.0"
+CHECKPOINT_DIR = re.compile(r"^checkpoint-(\d+)$")
+ADAPTER_SHARDS_DIR = "adapter_shards"
+
+
+def find_checkpoint(output_dir: str, selection: str = "latest") -> str:
+    """
+    The checkpoint to merge: "latest" (highest step), "best" (the trainer's best_model_checkpoint,
+    needs metric_for_best_model) or an explicit checkpoint directory
+    """
+    if selection not in ("latest", "best"):
+        if not os.path.isdir(selection):
+            raise ValueError(f"Checkpoint {selection} does not exist")
+        return selection
+    steps = sorted(
+        (int(match.group(1)), name)
+        for name in os.listdir(output_dir)
+        if (match := CHECKPOINT_DIR.match(name)) and os.path.isdir(os.path.join(output_dir, name))
+    )
+    if not steps:
+        raise ValueError(f"No checkpoint-<step> directory in {output_dir}")
+    latest = os.path.join(output_dir, steps[-1][1])
+    if selection == "latest":
+        return latest
+    with open(os.path.join(latest, "trainer_state.json")) as f:
+        best = json.load(f).get("best_model_checkpoint")
+    if not best:
+        raise ValueError("The trainer recorded no best checkpoint; set metric_for_best_model or use 'latest'")
+    # The recorded path is the one of the training host; the directory name is what matters
+    return os.path.join(output_dir, os.path.basename(best.rstrip("/")))
+
+
+def read_shard(path: Path, load_function):
+    """Hint the kernel to read the whole file ahead, then load it"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+    return load_function(path.as_posix())
+
+
+def shard_layout(shards_dir: Path):
+    """Shard files grouped by pipeline-parallel rank, the function that loads them and each rank's metadata"""
+    model_dir = shards_dir / "model"
+    if list(model_dir.glob("dp_rank*.tensors")):
+        from optimum.neuron.models.training.checkpointing import xser_load_on_cpu
+
+        files = [p for p in model_dir.glob("dp_rank_*") if not p.name.endswith(("info.pt", "tensors"))]
+        load_function = xser_load_on_cpu
+    else:
+        files = list(model_dir.glob("dp_rank_*.pt"))
+        load_function = partial(torch.load, mmap=True, weights_only=True)
+    if not files:
+        raise ValueError(f"Could not find any sharded checkpoint in {model_dir}")
+    pp_size = max(int(path.stem[-2:]) for path in files) + 1
+    groups = [sorted(path for path in files if int(path.stem[-2:]) == pp_rank) for pp_rank in range(pp_size)]
+    metadata = []
+    for pp_rank in range(pp_size):
+        path = shards_dir / f"mp_metadata_pp_rank_{pp_rank}.pt"
+        if path.is_file():
+            metadata.append(torch.load(path))
+        else:
+            with open(shards_dir / f"mp_metadata_pp_rank_{pp_rank}.json") as f:
+                metadata.append(json.load(f))
+    return groups, load_function, metadata
+
+
+def load_shards(files: List[Path], load_function, workers: Optional[int] = None) -> Dict[str, dict]:
+    """Every shard file's state dict, read concurrently; keyed by str(path)"""
+    with ThreadPoolExecutor(workers or min(32, len(files))) as pool:
+        state_dicts = pool.map(partial(read_shard, load_function=load_function), files)
+        return {str(path): state_dict for path, state_dict in zip(files, state_dicts)}
+
+
+def preloaded(state_dicts: Dict[str, dict]):
+    """
+    A load function handing out (and releasing) the state dicts of load_shards, whether it is
+    called with a Path or a string
+    """
+    return lambda path: state_dicts.pop(str(path))
+
+
+def consolidate_adapter_shards(checkpoint_dir: str, output_dir: str, workers: Optional[int] = None,
+                               timings: Optional[Dict[str, float]] = None) -> str:
+    """
+    Consolidate checkpoint_dir/adapter_default's tensor-parallel shards into a PEFT checkpoint
+    (adapter_model.safetensors + adapter_config.json) in output_dir
+    """
+    try:
+        installed = importlib.metadata.version("optimum-neuron")
+    except importlib.metadata.PackageNotFoundError:
+        installed = None
+    if installed != OPTIMUM_NEURON_VERSION:
+        print(f"Warning: consolidation is tested with optimum-neuron {OPTIMUM_NEURON_VERSION}, found {installed}")
+
+    timings = {} if timings is None else timings
+    adapter_dir = Path(checkpoint_dir) / "adapter_default"
+    try:
+        # Only importable on Neuron hosts
+        from optimum.neuron.models.training.checkpointing import consolidate_tensor_parallel_checkpoints
+
+        inspect.signature(consolidate_tensor_parallel_checkpoints).bind([], None, {}, adapter_name="default")
+    except (ImportError, TypeError) as e:
+        print(f"Warning: optimum-neuron {installed} has no compatible consolidate_tensor_parallel_checkpoints "
+              f"({e}), consolidating the whole checkpoint instead")
+        from optimum.neuron.models.training import consolidate_model_parallel_checkpoints_to_unified_checkpoint
+
+        start = time.perf_counter()
+        consolidate_model_parallel_checkpoints_to_unified_checkpoint(checkpoint_dir, output_dir)
+        shutil.copyfile(adapter_dir / "adapter_config.json", os.path.join(output_dir, "adapter_config.json"))
+        timings["consolidate"] = time.perf_counter() - start
+        return output_dir
+
+    groups, load_function, metadata = shard_layout(adapter_dir / ADAPTER_SHARDS_DIR)
+
+    start = time.perf_counter()
+    state_dicts = load_shards([path for group in groups for path in group], load_function, workers)
+    timings["read"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    state_dict = {}
+    for group, pp_metadata in zip(groups, metadata):
+        state_dict.update(consolidate_tensor_parallel_checkpoints(
+            group, preloaded(state_dicts), pp_metadata, adapter_name="default"
+        ))
+    os.makedirs(output_dir, exist_ok=True)
+    save_file({name: tensor.contiguous() for name, tensor in state_dict.items()},
+              os.path.join(output_dir, "adapter_model.safetensors"), metadata={"format": "pt"})
+    shutil.copyfile(adapter_dir / "adapter_config.json", os.path.join(output_dir, "adapter_config.json"))
+    timings["consolidate"] = time.perf_counter() - start
+    return output_dir
+
+
+def merge_adapter(adapter_dir: str, output_dir: str, merge_mode: str = "streaming", dtype: str = "float32",
+                  max_shard_size: str = "2GB") -> str:
+    """Merge a PEFT LoRA checkpoint into its base model; returns the merge mode actually used"""
+    if merge_mode == "streaming":
+        try:
+            summary = streaming_merge(adapter_dir, output_dir, dtype=torch.float32 if dtype == "float32" else None,
+                                      max_shard_size=max_shard_size)
+            print(f"Merged {summary['merged']} of {summary['tensors']} tensors into {summary['shards']} shard(s)")
+            return merge_mode
+        except UnsupportedAdapter as e:
+            print(f"Streaming merge not possible ({e}), merging in memory")
+    import peft
+
+    peft_model = peft.AutoPeftModelForCausalLM.from_pretrained(
+        adapter_dir, torch_dtype=torch.float32 if dtype == "float32" else "auto"
+    )
+    peft_model.merge_and_unload().save_pretrained(output_dir, max_shard_size=max_shard_size)
+    return "in_memory"
+
+
+def consolidate_and_merge(training_dir: str, output_dir: str, checkpoint: str = "latest", merge_mode: str = "streaming",
+                          dtype: str = "float32", max_shard_size: str = "2GB",
+                          workers: Optional[int] = None) -> Dict[str, float]:
+    """
+    Consolidate the LoRA shards of a checkpoint of training_dir (see find_checkpoint), merge them
+    into the base model and save the merged model and tokenizer to output_dir.
+    Returns seconds per phase and in total.
+    """
+    timings: Dict[str, float] = {}
+    total_start = time.perf_counter()
+    checkpoint_dir = find_checkpoint(training_dir, checkpoint)
+    timings["select"] = time.perf_counter() - total_start
+
+    consolidated_dir = os.path.join(checkpoint_dir, "consolidated")
+    print(f"Consolidating LoRA adapter shards of {checkpoint_dir}")
+    consolidate_adapter_shards(checkpoint_dir, consolidated_dir, workers, timings)
+
+    start = time.perf_counter()
+    print(f"Merging LoRA adapter into base model, saving to {output_dir}")
+    merge_adapter(consolidated_dir, output_dir, merge_mode, dtype, max_shard_size)
+    timings["merge"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    AutoTokenizer.from_pretrained(checkpoint_dir).save_pretrained(output_dir)
+    timings["tokenizer"] = time.perf_counter() - start
+    timings["total"] = time.perf_counter() - total_start
+
+    print("Merged model config:")
+    print(AutoConfig.from_pretrained(output_dir))
+    print("Consolidation phases: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in timings.items()))
+    return timings
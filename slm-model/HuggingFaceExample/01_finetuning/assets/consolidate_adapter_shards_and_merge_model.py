@@ -1,17 +1,14 @@
-from optimum.neuron.models.training import (
-    consolidate_model_parallel_checkpoints_to_unified_checkpoint,
-)
-from transformers import AutoModel, AutoTokenizer
 from argparse import ArgumentParser
-from shutil import copyfile
 import os
-import peft
+
+from consolidate import consolidate_and_merge
 
 parser = ArgumentParser()
 parser.add_argument(
     "-i",
     "--input_dir",
-    help="source checkpoint directory containing sharded adapter checkpoint files",
+    help="source checkpoint directory containing sharded adapter checkpoint files, or the training "
+    "output directory when --checkpoint is latest or best",
     required=True,
 )
 parser.add_argument(
@@ -20,34 +17,40 @@ parser.add_argument(
     help="destination directory for final merged model (adapters merged into base model)",
     required=True,
 )
-args = parser.parse_args()
-
-consolidated_ckpt_dir = os.path.join(args.input_dir, "consolidated")
-
-# Consolidate the adapter shards into a PEFT-compatible checkpoint
-print("Consolidating LoRA adapter shards")
-consolidate_model_parallel_checkpoints_to_unified_checkpoint(
-    args.input_dir, consolidated_ckpt_dir
+parser.add_argument(
+    "--checkpoint",
+    choices=["latest", "best"],
+    default=None,
+    help="pick the latest or the trainer's best checkpoint-<step> of --input_dir",
 )
-copyfile(
-    os.path.join(args.input_dir, "adapter_default/adapter_config.json"),
-    os.path.join(consolidated_ckpt_dir, "adapter_config.json"),
+parser.add_argument(
+    "--merge_mode",
+    choices=["streaming", "in_memory"],
+    default="streaming",
+    help="streaming merges tensor by tensor over the base safetensors shards; in_memory loads the "
+    "whole model and uses merge_and_unload()",
 )
+parser.add_argument(
+    "--dtype",
+    choices=["float32", "auto"],
+    default="float32",
+    help="dtype of the merged weights: float32 (from_pretrained's default) or auto (the base checkpoint's)",
+)
+parser.add_argument("--max_shard_size", default="2GB", help="largest merged safetensors shard")
+parser.add_argument("--workers", type=int, default=None, help="threads reading the tensor-parallel shards")
+args = parser.parse_args()
 
-# Load AutoPeftModel using the consolidated PEFT checkpoint
-peft_model = peft.AutoPeftModelForCausalLM.from_pretrained(consolidated_ckpt_dir)
-
-# Merge adapter weights into base model, save new pretrained model
-print("Merging LoRA adapter shards into base model")
-merged_model = peft_model.merge_and_unload()
-print(f"Saving merged model to {args.output_dir}")
-merged_model.save_pretrained(args.output_dir)
-
-print(f"Saving tokenizer to {args.output_dir}")
-tokenizer = AutoTokenizer.from_pretrained(args.input_dir)
-tokenizer.save_pretrained(args.output_dir)
+if args.checkpoint:
+    training_dir, checkpoint = args.input_dir, args.checkpoint
+else:
+    training_dir, checkpoint = os.path.dirname(os.path.abspath(args.input_dir)), args.input_dir
 
-# Load the pretrained model and print config
-print("Merged model config:")
-model = AutoModel.from_pretrained(args.output_dir)
-print(model)
+consolidate_and_merge(
+    training_dir,
+    args.output_dir,
+    checkpoint=checkpoint,
+    merge_mode=args.merge_mode,
+    dtype=args.dtype,
+    max_shard_size=args.max_shard_size,
+    workers=args.workers,
+)
@@ -1,14 +1,10 @@
 from dataclasses import dataclass, field
-from datasets import load_dataset
 from peft import LoraConfig
 from transformers import (
     AutoTokenizer,
     set_seed,
 )
 import os
-import subprocess
-import boto3
-from botocore.exceptions import ClientError
 from huggingface_hub import login
 import torch
 
@@ -17,41 +13,42 @@ from optimum.neuron import NeuronSFTConfig, NeuronSFTTrainer, NeuronTrainingArgu
 from torch_xla.core.xla_model import is_master_ordinal
 from optimum.neuron.models.training import NeuronModelForCausalLM
 
+from consolidate import consolidate_and_merge
+from packing import PACKING_STRATEGIES
+from preprocess import DEFAULT_CACHE_DIR, dataset_packing_stats, prepare_datasets
+from pretokenized import PackedTokenCollator, PackedTokenDataset
+from secret_cache import DEFAULT_CACHE_DIR as SECRET_CACHE_DIR, DEFAULT_CACHE_TTL as SECRET_CACHE_TTL, get_secret
 
 
-def training_function(script_args, training_args):
-    dataset = load_dataset("b-mc2/sql-create-context", split="train")
-    dataset = dataset.shuffle(seed=23)
-    train_dataset = dataset.select(range(50000))
-    eval_dataset = dataset.select(range(50000, 50500))
-
-    def create_conversation(sample):
-        system_message = (
-            "You are a text to SQL query translator. Users will ask you questions in English and you will generate a "
-            "SQL query based on the provided SCHEMA.\nSCHEMA:\n{schema}"
-        )
-        return {
-            "messages": [
-                {
-                    "role": "system",
-                    "content": system_message.format(schema=sample["context"]),
-                },
-                {"role": "user", "content": sample["question"]},
-                {"role": "assistant", "content": sample["answer"] + ";"},
-            ]
-        }
-
-    train_dataset = train_dataset.map(
-        create_conversation, remove_columns=train_dataset.features, batched=False
-    )
-    eval_dataset = eval_dataset.map(
-        create_conversation, remove_columns=eval_dataset.features, batched=False
-    )
 
+def training_function(script_args, training_args):
     tokenizer = AutoTokenizer.from_pretrained(script_args.tokenizer_id)
     # tokenizer.pad_token = tokenizer.eos_token
     # tokenizer.eos_token_id = 128001
 
+    data_collator = None
+    if script_args.pretokenized_dir:
+        # Sequences are sliced straight out of memory-mapped token files written by pretokenized.py
+        train_dataset = PackedTokenDataset(
+            script_args.pretokenized_dir, "train", script_args.max_seq_length, tokenizer, script_args.packing_strategy
+        )
+        eval_dataset = PackedTokenDataset(
+            script_args.pretokenized_dir, "eval", script_args.max_seq_length, tokenizer, script_args.packing_strategy
+        )
+        data_collator = PackedTokenCollator()
+        packing_stats = train_dataset.packing_stats()
+    else:
+        # Formatted, tokenized and packed once, then loaded from the on-disk cache on later runs
+        train_dataset, eval_dataset = prepare_datasets(
+            tokenizer,
+            max_seq_length=script_args.max_seq_length,
+            cache_dir=script_args.dataset_cache_dir,
+            num_proc=script_args.preprocessing_num_proc,
+            main_process_first=training_args.main_process_first,
+            packing=script_args.packing_strategy,
+        )
+        packing_stats = dataset_packing_stats(train_dataset, script_args.max_seq_length)
+
     trn_config = training_args.trn_config
     dtype = torch.bfloat16 if training_args.bf16 else torch.float32
     model = NeuronModelForCausalLM.from_pretrained(
@@ -82,12 +79,14 @@ def training_function(script_args, training_args):
     args = training_args.to_dict()
 
     sft_config = NeuronSFTConfig(
-        max_seq_length=1024,
+        max_seq_length=script_args.max_seq_length,
         packing=True,
         **args,
         dataset_kwargs={
             "add_special_tokens": False,
             "append_concat_token": True,
+            # The datasets are already packed by prepare_datasets
+            "skip_prepare_dataset": True,
         },
     )
 
@@ -98,8 +97,12 @@ def training_function(script_args, training_args):
         tokenizer=tokenizer,
         train_dataset=train_dataset,
         eval_dataset=eval_dataset,
+        data_collator=data_collator,
     )
 
+    # Padding and cross-sample contamination of the packed train set, logged next to the loss
+    trainer.log({f"packing_{name}": value for name, value in packing_stats.items()})
+
     # Start training
     trainer.train()
     del trainer
@@ -129,6 +132,42 @@ class ScriptArguments:
         default=0.05,
         metadata={"help": "LoRA dropout value to be used during fine-tuning."},
     )
+    max_seq_length: int = field(
+        default=1024,
+        metadata={"help": "Length of the packed training sequences."},
+    )
+    dataset_cache_dir: str = field(
+        default=DEFAULT_CACHE_DIR,
+        metadata={"help": "Directory where preprocessed datasets are cached, keyed by fingerprint."},
+    )
+    preprocessing_num_proc: int = field(
+        default=None,
+        metadata={"help": "Processes used for dataset preprocessing (default: all cores)."},
+    )
+    packing_strategy: str = field(
+        default="ffd",
+        metadata={
+            "help": "How samples are packed into sequences: 'ffd' (first-fit decreasing, whole samples) "
+            "or 'concat' (joined and cut every max_seq_length tokens).",
+            "choices": list(PACKING_STRATEGIES),
+        },
+    )
+    pretokenized_dir: str = field(
+        default=None,
+        metadata={"help": "Output directory of pretokenized.py; when set, training reads the memory-mapped files."},
+    )
+    merge_checkpoint: str = field(
+        default="latest",
+        metadata={"help": "Checkpoint merged into the base model after training: 'latest', 'best' or a path."},
+    )
+    merge_mode: str = field(
+        default="streaming",
+        metadata={
+            "help": "'streaming' merges tensor by tensor over the base safetensors shards, "
+            "'in_memory' uses merge_and_unload().",
+            "choices": ["streaming", "in_memory"],
+        },
+    )
     secret_name: str = field(
         default="huggingface/token",
         metadata={"help": "AWS Secrets Manager secret name containing Hugging Face token."},
@@ -137,30 +176,16 @@ class ScriptArguments:
         default="us-west-2",
         metadata={"help": "AWS region where the secret is stored."},
     )
+    secret_cache_dir: str = field(
+        default=SECRET_CACHE_DIR,
+        metadata={"help": "Node-local directory where the resolved secret is cached, encrypted."},
+    )
+    secret_cache_ttl: int = field(
+        default=SECRET_CACHE_TTL,
+        metadata={"help": "Seconds the cached secret is reused before AWS is asked again (0 disables the cache)."},
+    )
 
 
-def get_secret(secret_name, region_name):
-    """
-    Retrieve a secret from AWS Secrets Manager by searching for secrets with the given name prefix.  
-    This is specific to the workshop environment.
-    """
-    try:
-        session = boto3.session.Session()
-        client = session.client(service_name='secretsmanager', region_name=region_name)
-        
-        # List secrets and find one that starts with the secret_name
-        paginator = client.get_paginator('list_secrets')
-        for page in paginator.paginate():
-            for secret in page['SecretList']:
-                if secret['Name'].startswith(secret_name):
-                    response = client.get_secret_value(SecretId=secret['ARN'])
-                    if 'SecretString' in response:
-                        return response['SecretString']
-        return None
-    except ClientError:
-        print("Could not retrieve secret from AWS Secrets Manager")
-        return None
-
 if __name__ == "__main__":
     parser = HfArgumentParser([ScriptArguments, NeuronTrainingArguments])
     script_args, training_args = parser.parse_args_into_dataclasses()
@@ -171,7 +196,12 @@ if __name__ == "__main__":
     # If no token in environment, try to get it from AWS Secrets Manager
     if not hf_token:
         print("No Hugging Face token found in environment, checking AWS Secrets Manager...")
-        hf_token = get_secret(script_args.secret_name, script_args.secret_region)
+        hf_token = get_secret(
+            script_args.secret_name,
+            script_args.secret_region,
+            script_args.secret_cache_dir,
+            script_args.secret_cache_ttl,
+        )
     
     # Login to Hugging Face if a valid token is found
     if hf_token:
@@ -183,25 +213,12 @@ if __name__ == "__main__":
     set_seed(training_args.seed)
     training_function(script_args, training_args)
 
-    # Consolidate LoRA adapter shards, merge LoRA adapters into base model, save merged model
+    # Consolidate LoRA adapter shards, merge LoRA adapters into base model, save merged model.
+    # Runs in this process, which already has the whole stack imported.
     if is_master_ordinal():
-        input_ckpt_dir = os.path.join(
-            training_args.output_dir, f"checkpoint-{training_args.max_steps}"
+        consolidate_and_merge(
+            training_args.output_dir,
+            os.path.join(training_args.output_dir, "merged_model"),
+            checkpoint=script_args.merge_checkpoint,
+            merge_mode=script_args.merge_mode,
         )
-        output_ckpt_dir = os.path.join(training_args.output_dir, "merged_model")
-        # the spawned process expects to see 2 NeuronCores for consolidating checkpoints with a tp=2
-        # Either the second core isn't really used or it is freed up by the other thread finishing.  
-        # Adjusting Neuron env. var to advertise 2 NeuronCores to the process.
-        env = os.environ.copy()
-        env["NEURON_RT_VISIBLE_CORES"] = "0-1"
-        subprocess.run(
-            [
-                "python3",
-                "consolidate_adapter_shards_and_merge_model.py",
-                "-i",
-                input_ckpt_dir,
-                "-o",
-                output_ckpt_dir,
-            ],
-            env=env
-        )
\ No newline at end of file
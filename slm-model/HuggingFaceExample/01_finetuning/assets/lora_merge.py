@@ -0,0 +1,223 @@
+"""
+Streaming merge of a LoRA adapter into its base model's safetensors weights.
+
+merge_and_unload() needs the whole base model in memory (and save_pretrained a second copy of
+each shard). streaming_merge instead walks the base checkpoint's safetensors files tensor by
+tensor: each tensor is read with plain file reads, gets its LoRA delta (B @ A * alpha / r)
+added, and is written straight into the output shard, whose header was planned up front from
+the source headers. Peak memory is a few times the largest single tensor. The arithmetic is
+the one PEFT uses (adapter weights in float32, base weights in the load dtype, delta added in
+place), so the merged weights are bit-identical to the in-memory path.
+"""
+import glob
+import json
+import math
+import os
+import re
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from huggingface_hub import snapshot_download
+from safetensors.torch import load_file
+from transformers import AutoConfig, GenerationConfig
+from transformers.utils.hub import convert_file_size_to_int
+
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+DTYPE_NAMES = {dtype: name for name, dtype in SAFETENSORS_DTYPES.items()}
+ADAPTER_PREFIX = "base_model.model."
+LORA_KEY = re.compile(r"^(?P<module>.+)\.lora_(?P<part>A|B)\.weight$")
+
+
+class UnsupportedAdapter(ValueError):
+    """The adapter or base checkpoint needs the in-memory merge"""
+
+
+def read_header(path: str) -> Tuple[Dict[str, dict], int]:
+    """Tensor entries of a safetensors file and the offset where their data starts"""
+    with open(path, "rb") as f:
+        size = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(size))
+    header.pop("__metadata__", None)
+    return header, 8 + size
+
+
+def read_tensor(f, entry: dict, data_start: int) -> torch.Tensor:
+    """One tensor, read into its own buffer (no mmap, so nothing else stays resident)"""
+    begin, end = entry["data_offsets"]
+    f.seek(data_start + begin)
+    buffer = bytearray(end - begin)
+    f.readinto(buffer)
+    dtype = SAFETENSORS_DTYPES[entry["dtype"]]
+    if not buffer:
+        return torch.empty(entry["shape"], dtype=dtype)
+    return torch.frombuffer(buffer, dtype=dtype).reshape(entry["shape"])
+
+
+def write_header(f, entries: Dict[str, dict]):
+    header = json.dumps({"__metadata__": {"format": "pt"}, **entries}, separators=(",", ":")).encode()
+    # The data section starts 8-byte aligned, as safetensors writes it
+    header += b" " * (-len(header) % 8)
+    f.write(len(header).to_bytes(8, "little"))
+    f.write(header)
+
+
+def base_weight_files(base_model: str, revision: Optional[str] = None) -> List[str]:
+    """The base checkpoint's safetensors files, downloading only weights and configs"""
+    if os.path.isdir(base_model):
+        directory = base_model
+    else:
+        directory = snapshot_download(base_model, revision=revision, allow_patterns=["*.safetensors", "*.json"])
+    index_path = os.path.join(directory, "model.safetensors.index.json")
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            files = sorted(set(json.load(f)["weight_map"].values()))
+        return [os.path.join(directory, name) for name in files]
+    if os.path.exists(os.path.join(directory, "model.safetensors")):
+        return [os.path.join(directory, "model.safetensors")]
+    raise UnsupportedAdapter(f"{base_model} has no safetensors weights")
+
+
+def load_adapter(adapter_dir: str):
+    """LoRA factors per base weight, full replacement tensors (modules_to_save) and the scaling"""
+    with open(os.path.join(adapter_dir, "adapter_config.json")) as f:
+        config = json.load(f)
+    if config.get("peft_type") != "LORA":
+        raise UnsupportedAdapter(f"peft_type {config.get('peft_type')} is not LoRA")
+    for option in ("use_dora", "lora_bias", "rank_pattern", "alpha_pattern"):
+        if config.get(option):
+            raise UnsupportedAdapter(f"{option} is not supported by the streaming merge")
+    path = os.path.join(adapter_dir, "adapter_model.safetensors")
+    if os.path.exists(path):
+        state_dict = load_file(path)
+    else:
+        state_dict = torch.load(os.path.join(adapter_dir, "adapter_model.bin"), map_location="cpu", weights_only=True)
+
+    factors: Dict[str, Dict[str, torch.Tensor]] = {}
+    replacements: Dict[str, torch.Tensor] = {}
+    for key, tensor in state_dict.items():
+        name = key[len(ADAPTER_PREFIX) :] if key.startswith(ADAPTER_PREFIX) else key
+        match = LORA_KEY.match(name)
+        if match:
+            # PEFT upcasts half-precision adapter weights to float32 before merging
+            factors.setdefault(f"{match['module']}.weight", {})[match["part"]] = tensor.to(torch.float32)
+        elif ".lora_" in name:
+            raise UnsupportedAdapter(f"{key} is not a LoRA linear weight")
+        else:
+            replacements[name] = tensor
+    r, alpha = config["r"], config["lora_alpha"]
+    scaling = alpha / math.sqrt(r) if config.get("use_rslora") else alpha / r
+    return config, factors, replacements, scaling
+
+
+def merge_tensor(tensor: torch.Tensor, dtype: Optional[torch.dtype], factors: Optional[dict], scaling: float,
+                 fan_in_fan_out: bool) -> torch.Tensor:
+    if dtype is not None and tensor.is_floating_point():
+        tensor = tensor.to(dtype)
+    if factors is not None:
+        delta = factors["B"] @ factors["A"]
+        if fan_in_fan_out:
+            delta = delta.T
+        tensor += delta * scaling
+    return tensor
+
+
+def streaming_merge(adapter_dir: str, output_dir: str, base_model: Optional[str] = None,
+                    dtype: Optional[torch.dtype] = torch.float32, max_shard_size="2GB") -> dict:
+    """
+    Merge the LoRA adapter in adapter_dir into its base model and write the result to output_dir
+    as safetensors shards (with model.safetensors.index.json when there is more than one) plus the
+    base config. dtype=None keeps the checkpoint's dtypes, float32 matches from_pretrained's default.
+    """
+    config, factors, replacements, scaling = load_adapter(adapter_dir)
+    base_model = base_model or config["base_model_name_or_path"]
+    fan_in_fan_out = bool(config.get("fan_in_fan_out"))
+    max_shard_size = convert_file_size_to_int(max_shard_size)
+
+    # Plan every output tensor from the source headers alone: name, source, dtype, shape, size
+    plan = []
+    for path in base_weight_files(base_model, config.get("revision")):
+        header, data_start = read_header(path)
+        for name, entry in sorted(header.items(), key=lambda item: item[1]["data_offsets"][0]):
+            source_dtype = SAFETENSORS_DTYPES[entry["dtype"]]
+            out_dtype = dtype if dtype is not None and source_dtype.is_floating_point else source_dtype
+            nbytes = math.prod(entry["shape"]) * torch.empty((), dtype=out_dtype).element_size()
+            plan.append((name, path, entry, data_start, out_dtype, nbytes))
+    missing = (set(factors) | set(replacements)) - {name for name, *_ in plan}
+    if missing:
+        raise ValueError(f"Adapter weights without a base weight: {sorted(missing)[:5]}")
+
+    shards: List[list] = [[]]
+    shard_bytes = 0
+    for item in plan:
+        if shards[-1] and shard_bytes + item[-1] > max_shard_size:
+            shards.append([])
+            shard_bytes = 0
+        shards[-1].append(item)
+        shard_bytes += item[-1]
+
+    tmp_dir = f"{output_dir.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    weight_map = {}
+    sources = {}
+    try:
+        for number, shard in enumerate(shards, 1):
+            filename = "model.safetensors" if len(shards) == 1 else f"model-{number:05d}-of-{len(shards):05d}.safetensors"
+            entries, offset = {}, 0
+            for name, _, entry, _, out_dtype, nbytes in shard:
+                entries[name] = {"dtype": DTYPE_NAMES[out_dtype], "shape": entry["shape"],
+                                 "data_offsets": [offset, offset + nbytes]}
+                offset += nbytes
+            with open(os.path.join(tmp_dir, filename), "wb") as out:
+                write_header(out, entries)
+                for name, path, entry, data_start, out_dtype, nbytes in shard:
+                    if path not in sources:
+                        sources[path] = open(path, "rb")
+                    if name in replacements:
+                        tensor = replacements[name].to(out_dtype)
+                    else:
+                        tensor = merge_tensor(read_tensor(sources[path], entry, data_start), dtype,
+                                              factors.get(name), scaling, fan_in_fan_out)
+                    if tensor.dtype != out_dtype or list(tensor.shape) != entry["shape"]:
+                        raise ValueError(f"{name}: merged {tensor.dtype} {list(tensor.shape)} does not match the plan")
+                    out.write(tensor.contiguous().view(-1).view(torch.uint8).numpy())
+                    weight_map[name] = filename
+    finally:
+        for f in sources.values():
+            f.close()
+
+    total_size = sum(item[-1] for item in plan)
+    if len(shards) > 1:
+        with open(os.path.join(tmp_dir, "model.safetensors.index.json"), "w") as f:
+            json.dump({"metadata": {"total_size": total_size}, "weight_map": weight_map}, f, indent=2, sort_keys=True)
+    model_config = AutoConfig.from_pretrained(base_model, revision=config.get("revision"))
+    if dtype is not None:
+        model_config.torch_dtype = dtype
+    model_config.save_pretrained(tmp_dir)
+    try:
+        GenerationConfig.from_pretrained(base_model, revision=config.get("revision")).save_pretrained(tmp_dir)
+    except OSError:
+        pass
+
+    # Replace output_dir only once every shard is complete. Weights of an earlier merge go first:
+    # a stale shard or index left behind would be loaded along with (or instead of) the new ones
+    os.makedirs(output_dir, exist_ok=True)
+    for pattern in ("model*.safetensors", "model.safetensors.index.json"):
+        for stale in glob.glob(os.path.join(output_dir, pattern)):
+            os.remove(stale)
+    for name in os.listdir(tmp_dir):
+        os.replace(os.path.join(tmp_dir, name), os.path.join(output_dir, name))
+    os.rmdir(tmp_dir)
+    return {"tensors": len(plan), "merged": len(factors), "shards": len(shards), "total_size": total_size}
@@ -0,0 +1,149 @@
+"""
+Sequence packing for finetune_llama.py, with padding and contamination statistics.
+
+"concat" is SFTTrainer's packing: samples joined with EOS and cut every max_seq_length tokens, so
+no token is padding but samples get split across sequences. "ffd" packs whole samples into
+max_seq_length bins with first-fit decreasing and pads the end of each bin. Either way every
+sequence records the lengths of the samples (or sample pieces) in it, and packing_stats turns
+those into the numbers we log: useful tokens / total tokens, padding, split samples and how much
+of the causal attention crosses from one sample into another.
+
+Samples are given as a flat token array plus offsets (start of every sample, then the total
+length), the layout of both pretokenized.py's files and an Arrow list column.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+PACKING_STRATEGIES = ("concat", "ffd")
+
+
+class _CapacityTree:
+    """Segment tree over bins holding their remaining capacity; finds the first bin that fits in O(log n)"""
+
+    def __init__(self, bins: int, capacity: int):
+        self.size = 1
+        while self.size < bins:
+            self.size *= 2
+        self.tree = [capacity] * (2 * self.size)
+
+    def first_fit(self, length: int) -> int:
+        node = 1
+        while node < self.size:
+            node = 2 * node if self.tree[2 * node] >= length else 2 * node + 1
+        return node - self.size
+
+    def take(self, index: int, length: int):
+        node = self.size + index
+        self.tree[node] -= length
+        node //= 2
+        while node:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+
+def first_fit_decreasing(lengths: Sequence[int], capacity: int) -> List[List[int]]:
+    """
+    Group sample indices into bins of at most capacity tokens. Samples longer than capacity get a
+    bin of their own and are truncated when the bin is gathered.
+    """
+    lengths = [min(int(length), capacity) for length in lengths]
+    order = sorted(range(len(lengths)), key=lengths.__getitem__, reverse=True)
+    # There are never more bins than samples
+    tree = _CapacityTree(max(len(lengths), 1), capacity)
+    bins: List[List[int]] = []
+    for i in order:
+        index = tree.first_fit(lengths[i])
+        if index == len(bins):
+            bins.append([])
+        bins[index].append(i)
+        tree.take(index, lengths[i])
+    return bins
+
+
+def gather_bin(tokens: np.ndarray, offsets: np.ndarray, samples: Sequence[int], max_seq_length: int,
+               pad_token_id: int) -> Tuple[np.ndarray, List[int]]:
+    """The samples of one bin back to back, padded to max_seq_length, and their lengths"""
+    sequence = np.full(max_seq_length, pad_token_id, dtype=tokens.dtype)
+    sample_lengths = []
+    position = 0
+    for i in samples:
+        start, end = int(offsets[i]), int(offsets[i + 1])
+        length = min(end - start, max_seq_length - position)
+        sequence[position : position + length] = tokens[start : start + length]
+        sample_lengths.append(length)
+        position += length
+    return sequence, sample_lengths
+
+
+def pack_ffd(tokens: np.ndarray, offsets: np.ndarray, max_seq_length: int, pad_token_id: int) -> Dict[str, object]:
+    """
+    First-fit-decreasing packing of samples that already end in EOS into padded sequences.
+    Labels are -100 on padding; sample_lengths lists the samples of each sequence in order.
+    """
+    bins = first_fit_decreasing(np.diff(offsets).tolist(), max_seq_length)
+    input_ids = np.empty((len(bins), max_seq_length), dtype=np.int64)
+    sample_lengths = []
+    for row, samples in enumerate(bins):
+        input_ids[row], lengths = gather_bin(tokens, offsets, samples, max_seq_length, pad_token_id)
+        sample_lengths.append(lengths)
+    used = np.array([sum(lengths) for lengths in sample_lengths], dtype=np.int64)
+    attention_mask = (np.arange(max_seq_length) < used[:, None]).astype(np.int64)
+    return {
+        "input_ids": input_ids,
+        "attention_mask": attention_mask,
+        "labels": np.where(attention_mask == 1, input_ids, -100),
+        "sample_lengths": sample_lengths,
+    }
+
+
+def concat_sample_lengths(lengths: Sequence[int], max_seq_length: int) -> Tuple[List[List[int]], List[bool]]:
+    """
+    The sample pieces in each sequence of "concat" packing (the trailing partial sequence is
+    dropped), and per sequence whether its first piece continues a sample cut by the previous one
+    """
+    sequences: List[List[int]] = []
+    continued: List[bool] = []
+    current: List[int] = []
+    room = max_seq_length
+    cut = False
+    for length in lengths:
+        remaining = int(length)
+        while remaining:
+            piece = min(remaining, room)
+            current.append(piece)
+            remaining -= piece
+            room -= piece
+            if room == 0:
+                sequences.append(current)
+                continued.append(cut)
+                current, room = [], max_seq_length
+                cut = remaining > 0
+    return sequences, continued
+
+
+def packing_stats(sample_lengths: Sequence[Sequence[int]], max_seq_length: int, split_samples: int = 0) -> Dict[str, float]:
+    """
+    Packing metrics from the sample lengths inside each packed sequence. efficiency is useful
+    tokens / total tokens; cross_sample_attention is the share of causal attention pairs between
+    real tokens that connect two different samples, which an unmasked packed batch attends across.
+    """
+    sequences = len(sample_lengths)
+    useful = causal_pairs = within_pairs = samples = 0
+    for lengths in sample_lengths:
+        used = sum(lengths)
+        useful += used
+        samples += len(lengths)
+        causal_pairs += used * (used + 1) // 2
+        within_pairs += sum(length * (length + 1) // 2 for length in lengths)
+    total = sequences * max_seq_length
+    return {
+        "sequences": sequences,
+        "useful_tokens": useful,
+        "total_tokens": total,
+        "efficiency": useful / total if total else 0.0,
+        "padding_fraction": 1 - useful / total if total else 0.0,
+        "samples_per_sequence": samples / sequences if sequences else 0.0,
+        "split_samples": split_samples,
+        "cross_sample_attention": 1 - within_pairs / causal_pairs if causal_pairs else 0.0,
+    }
@@ -0,0 +1,225 @@
+"""
+Dataset preprocessing for finetune_llama.py.
+
+Formats sql-create-context rows as conversations, applies the chat template, tokenizes and packs
+them into max_seq_length sequences. packing="concat" does it the way SFTTrainer's packing does
+(samples joined with an EOS token, the remainder of each batch dropped); packing="ffd" bins whole
+samples with first-fit decreasing and pads the rest (see packing.py). Every sequence keeps the
+lengths of the samples in it, so dataset_packing_stats can report efficiency and contamination.
+The work is batched, runs on all cores and is saved to disk under a fingerprint of everything that
+affects the result, so later runs load the packed datasets directly and skip straight to training.
+
+    python preprocess.py --tokenizer_id TinyLlama/TinyLlama-1.1B-Chat-v1.0   # warm the cache
+"""
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+from argparse import ArgumentParser
+
+from datasets import Dataset, DatasetDict, load_dataset, load_from_disk
+
+from packing import PACKING_STRATEGIES, concat_sample_lengths, pack_ffd, packing_stats
+
+DATASET_ID = "b-mc2/sql-create-context"
+# Bump when the preprocessing below changes, so stale caches are not reused
+PREPROCESS_VERSION = 2
+DEFAULT_CACHE_DIR = os.environ.get(
+    "SFT_DATASET_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "sft_datasets")
+)
+
+SYSTEM_MESSAGE = (
+    "You are a text to SQL query translator. Users will ask you questions in English and you will generate a "
+    "SQL query based on the provided SCHEMA.\nSCHEMA:\n{schema}"
+)
+# The schema is the only variable part, so rows concatenate it to a constant prefix instead of formatting
+SYSTEM_MESSAGE_PREFIX = SYSTEM_MESSAGE[: -len("{schema}")]
+
+
+def create_conversations(batch):
+    """Batched: turn columns of context/question/answer into chat messages"""
+    return {
+        "messages": [
+            [
+                {"role": "system", "content": SYSTEM_MESSAGE_PREFIX + context},
+                {"role": "user", "content": question},
+                {"role": "assistant", "content": answer + ";"},
+            ]
+            for context, question, answer in zip(batch["context"], batch["question"], batch["answer"])
+        ]
+    }
+
+
+def tokenize_samples(batch, tokenizer):
+    """Batched: chat-template and tokenize conversations, each followed by EOS"""
+    texts = tokenizer.apply_chat_template(batch["messages"], tokenize=False)
+    token_ids = tokenizer(texts, add_special_tokens=False)["input_ids"]
+    return {"input_ids": [ids + [tokenizer.eos_token_id] for ids in token_ids]}
+
+
+def tokenize_and_pack(batch, tokenizer, max_seq_length):
+    """
+    Batched: chat-template and tokenize conversations, join them with EOS and cut the stream into
+    max_seq_length sequences. Labels are the input IDs, as with SFTTrainer's packed datasets.
+    """
+    token_ids = tokenize_samples(batch, tokenizer)["input_ids"]
+    stream = [token for ids in token_ids for token in ids]
+    sequences = [
+        stream[i : i + max_seq_length] for i in range(0, len(stream) - max_seq_length + 1, max_seq_length)
+    ]
+    sample_lengths, continued = concat_sample_lengths([len(ids) for ids in token_ids], max_seq_length)
+    return {
+        "input_ids": sequences,
+        "attention_mask": [[1] * max_seq_length for _ in sequences],
+        "labels": [list(sequence) for sequence in sequences],
+        "sample_lengths": sample_lengths,
+        "continues_sample": continued,
+    }
+
+
+def pack_split_ffd(split, tokenizer, max_seq_length):
+    """First-fit-decreasing packing of a tokenized split; bins span the whole split, not one batch"""
+    column = split.data.column("input_ids").combine_chunks()
+    offsets = column.offsets.to_numpy()
+    tokens = column.flatten().to_numpy()
+    packed = pack_ffd(tokens, offsets - offsets[0], max_seq_length, tokenizer.pad_token_id or tokenizer.eos_token_id)
+    truncated = int((offsets[1:] - offsets[:-1] > max_seq_length).sum())
+    if truncated:
+        print(f"Truncated {truncated} samples longer than {max_seq_length} tokens")
+    return Dataset.from_dict(packed)
+
+
+def dataset_packing_stats(dataset, max_seq_length):
+    """Packing efficiency and contamination of a dataset returned by prepare_datasets"""
+    split_samples = sum(dataset["continues_sample"]) if "continues_sample" in dataset.column_names else 0
+    return packing_stats(dataset["sample_lengths"], max_seq_length, split_samples)
+
+
+def tokenizer_fingerprint(tokenizer):
+    vocab = json.dumps(sorted(tokenizer.get_vocab().items()))
+    return hashlib.sha256(
+        "\0".join([vocab, tokenizer.chat_template or "", str(tokenizer.eos_token_id)]).encode()
+    ).hexdigest()
+
+
+def preprocess_fingerprint(dataset, tokenizer, max_seq_length, train_size, eval_size, seed, packing="ffd"):
+    key = {
+        "version": PREPROCESS_VERSION,
+        "dataset": dataset._fingerprint,
+        "tokenizer": tokenizer_fingerprint(tokenizer),
+        "system_message": SYSTEM_MESSAGE,
+        "max_seq_length": max_seq_length,
+        "train_size": train_size,
+        "eval_size": eval_size,
+        "seed": seed,
+        "packing": packing,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def prepare_datasets(
+    tokenizer,
+    dataset=None,
+    max_seq_length=1024,
+    train_size=50000,
+    eval_size=500,
+    seed=23,
+    cache_dir=DEFAULT_CACHE_DIR,
+    num_proc=None,
+    batch_size=1000,
+    main_process_first=None,
+    packing="ffd",
+):
+    """
+    Packed train and eval datasets, built once per fingerprint and loaded from cache_dir afterwards.
+    Pass training_args.main_process_first as main_process_first so only the main process builds
+    the cache in distributed runs while the others wait and then load it.
+    """
+    if packing not in PACKING_STRATEGIES:
+        raise ValueError(f"packing must be one of {PACKING_STRATEGIES}, got {packing!r}")
+    if dataset is None:
+        dataset = load_dataset(DATASET_ID, split="train")
+    num_proc = num_proc or os.cpu_count()
+    cache_path = os.path.join(
+        cache_dir, preprocess_fingerprint(dataset, tokenizer, max_seq_length, train_size, eval_size, seed, packing)
+    )
+
+    guard = main_process_first(desc="dataset preprocessing") if main_process_first else contextlib.nullcontext()
+    with guard:
+        if os.path.isdir(cache_path):
+            print(f"Loading preprocessed datasets from {cache_path}")
+            packed = load_from_disk(cache_path)
+            return packed["train"], packed["eval"]
+
+        dataset = dataset.shuffle(seed=seed)
+        splits = DatasetDict(
+            train=dataset.select(range(train_size)),
+            eval=dataset.select(range(train_size, train_size + eval_size)),
+        )
+        splits = splits.map(
+            create_conversations,
+            batched=True,
+            batch_size=batch_size,
+            num_proc=num_proc,
+            remove_columns=dataset.column_names,
+            desc="Formatting conversations",
+        )
+        if packing == "concat":
+            packed = splits.map(
+                tokenize_and_pack,
+                batched=True,
+                batch_size=batch_size,
+                num_proc=num_proc,
+                remove_columns=["messages"],
+                fn_kwargs={"tokenizer": tokenizer, "max_seq_length": max_seq_length},
+                desc="Tokenizing and packing",
+            )
+        else:
+            tokenized = splits.map(
+                tokenize_samples,
+                batched=True,
+                batch_size=batch_size,
+                num_proc=num_proc,
+                remove_columns=["messages"],
+                fn_kwargs={"tokenizer": tokenizer},
+                desc="Tokenizing",
+            )
+            packed = DatasetDict(
+                {name: pack_split_ffd(split, tokenizer, max_seq_length) for name, split in tokenized.items()}
+            )
+
+        # Written next to the final path and renamed, so an interrupted run never leaves a partial cache
+        tmp_path = f"{cache_path}.tmp-{os.getpid()}"
+        packed.save_to_disk(tmp_path)
+        shutil.rmtree(cache_path, ignore_errors=True)
+        os.rename(tmp_path, cache_path)
+        print(f"Saved preprocessed datasets to {cache_path}")
+        packed = load_from_disk(cache_path)
+        return packed["train"], packed["eval"]
+
+
+if __name__ == "__main__":
+    from transformers import AutoTokenizer
+
+    parser = ArgumentParser()
+    parser.add_argument("--tokenizer_id", default="TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+    parser.add_argument("--max_seq_length", type=int, default=1024)
+    parser.add_argument("--cache_dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--num_proc", type=int, default=None)
+    parser.add_argument("--packing", choices=PACKING_STRATEGIES, default="ffd")
+    args = parser.parse_args()
+
+    train_dataset, eval_dataset = prepare_datasets(
+        AutoTokenizer.from_pretrained(args.tokenizer_id),
+        max_seq_length=args.max_seq_length,
+        cache_dir=args.cache_dir,
+        num_proc=args.num_proc,
+        packing=args.packing,
+    )
+    print(f"{len(train_dataset)} train and {len(eval_dataset)} eval sequences of {args.max_seq_length} tokens")
+    stats = dataset_packing_stats(train_dataset, args.max_seq_length)
+    print(
+        f"train packing: efficiency {stats['efficiency']:.1%}, {stats['samples_per_sequence']:.1f} samples per "
+        f"sequence, {stats['split_samples']} split samples, cross-sample attention {stats['cross_sample_attention']:.1%}"
+    )
@@ -0,0 +1,200 @@
+"""
+Pretokenized, memory-mapped datasets for finetune_llama.py.
+
+The pretokenize command formats, chat-templates and tokenizes the dataset once and writes, per split:
+
+    <output_dir>/<split>/tokens.bin   token IDs of all samples back to back, each followed by EOS
+                                      (uint16, or uint32 when the vocabulary doesn't fit)
+    <output_dir>/<split>/offsets.bin  uint64 start of every sample in tokens.bin, then the total length
+    <output_dir>/meta.json            dtype, tokenizer fingerprint and split sizes
+
+Training memory-maps the files and slices fixed-length sequences out of them (or, with
+packing="ffd", gathers first-fit-decreasing bins of whole samples) without loading or copying the
+dataset, so host RAM and startup time no longer grow with the dataset. It runs fully offline given
+a local dataset copy (save_to_disk directory, or a json/jsonl/parquet/csv file) and a local
+tokenizer directory:
+
+    python pretokenized.py --tokenizer_id ./tinyllama --dataset_path ./sql-create-context --output_dir ./pretokenized
+"""
+import json
+import os
+import shutil
+from argparse import ArgumentParser
+
+import numpy as np
+from datasets import load_dataset, load_from_disk
+
+from packing import PACKING_STRATEGIES, concat_sample_lengths, first_fit_decreasing, gather_bin, packing_stats
+from preprocess import DATASET_ID, create_conversations, tokenizer_fingerprint
+
+FORMAT_VERSION = 1
+
+
+def token_dtype(vocab_size):
+    return np.uint16 if vocab_size <= np.iinfo(np.uint16).max + 1 else np.uint32
+
+
+def load_source(dataset_path=None):
+    """The raw dataset from a local copy when given, otherwise from the Hub"""
+    if dataset_path is None:
+        return load_dataset(DATASET_ID, split="train")
+    if os.path.isdir(dataset_path):
+        dataset = load_from_disk(dataset_path)
+        return dataset["train"] if hasattr(dataset, "keys") else dataset
+    extension = os.path.splitext(dataset_path)[1].lstrip(".")
+    builder = {"jsonl": "json", "json": "json", "parquet": "parquet", "csv": "csv"}[extension]
+    return load_dataset(builder, data_files=dataset_path, split="train")
+
+
+def write_split(dataset, tokenizer, split_dir, dtype, batch_size=1000):
+    """Tokenize a split batch by batch and append it to the flat files; returns the token count"""
+    os.makedirs(split_dir, exist_ok=True)
+    eos = tokenizer.eos_token_id
+    position = 0
+    with open(os.path.join(split_dir, "tokens.bin"), "wb") as tokens_file, \
+            open(os.path.join(split_dir, "offsets.bin"), "wb") as offsets_file:
+        for start in range(0, len(dataset), batch_size):
+            batch = dataset[start : start + batch_size]
+            texts = tokenizer.apply_chat_template(create_conversations(batch)["messages"], tokenize=False)
+            token_ids = tokenizer(texts, add_special_tokens=False)["input_ids"]
+            lengths = np.fromiter((len(ids) + 1 for ids in token_ids), dtype=np.int64, count=len(token_ids))
+            ends = np.cumsum(lengths)
+            flat = np.full(int(ends[-1]), eos, dtype=dtype)
+            for ids, end, length in zip(token_ids, ends, lengths):
+                flat[end - length : end - 1] = ids
+            (position + ends - lengths).astype(np.uint64).tofile(offsets_file)
+            flat.tofile(tokens_file)
+            position += int(ends[-1])
+        np.array([position], dtype=np.uint64).tofile(offsets_file)
+    return position
+
+
+def pretokenize(tokenizer, output_dir, dataset=None, train_size=50000, eval_size=500, seed=23):
+    """Write the train and eval splits of the (shuffled) dataset in the memory-mapped format"""
+    if dataset is None:
+        dataset = load_source()
+    dataset = dataset.shuffle(seed=seed)
+    dtype = token_dtype(len(tokenizer))
+    tmp_dir = f"{output_dir.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "dtype": np.dtype(dtype).name,
+        "vocab_size": len(tokenizer),
+        "eos_token_id": tokenizer.eos_token_id,
+        "tokenizer": tokenizer_fingerprint(tokenizer),
+        "seed": seed,
+        "splits": {},
+    }
+    for split, indices in (("train", range(train_size)), ("eval", range(train_size, train_size + eval_size))):
+        tokens = write_split(dataset.select(indices), tokenizer, os.path.join(tmp_dir, split), dtype)
+        meta["splits"][split] = {"samples": len(indices), "tokens": tokens}
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.rename(tmp_dir, output_dir)
+    return meta
+
+
+class PackedTokenDataset:
+    """
+    Fixed-length sequences from a memory-mapped split.
+    With packing="concat" items are read-only views of the token file; with "ffd" they are bins of
+    whole samples padded with EOS after length tokens, planned once from the offsets alone. Either
+    way boundaries gives the offsets within the sequence where a sample starts, so packing never
+    has to materialize the dataset.
+    """
+
+    def __init__(self, data_dir, split, max_seq_length, tokenizer=None, packing="concat"):
+        if packing not in PACKING_STRATEGIES:
+            raise ValueError(f"packing must be one of {PACKING_STRATEGIES}, got {packing!r}")
+        with open(os.path.join(data_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        if tokenizer is not None and self.meta["tokenizer"] != tokenizer_fingerprint(tokenizer):
+            raise ValueError(f"{data_dir} was pretokenized with a different tokenizer; rerun pretokenized.py")
+        split_dir = os.path.join(data_dir, split)
+        self.tokens = np.memmap(os.path.join(split_dir, "tokens.bin"), dtype=self.meta["dtype"], mode="r")
+        self.offsets = np.memmap(os.path.join(split_dir, "offsets.bin"), dtype=np.uint64, mode="r")
+        self.max_seq_length = max_seq_length
+        self.packing = packing
+        self.bins = first_fit_decreasing(np.diff(self.offsets).tolist(), max_seq_length) if packing == "ffd" else None
+
+    def __len__(self):
+        if self.bins is not None:
+            return len(self.bins)
+        # Like packing, the trailing partial sequence is dropped
+        return len(self.tokens) // self.max_seq_length
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        if self.bins is not None:
+            input_ids, lengths = gather_bin(
+                self.tokens, self.offsets, self.bins[index], self.max_seq_length, self.meta["eos_token_id"]
+            )
+            return {
+                "input_ids": input_ids,
+                "boundaries": np.concatenate([[0], np.cumsum(lengths[:-1])]).astype(np.int64),
+                "length": sum(lengths),
+            }
+        start = index * self.max_seq_length
+        end = start + self.max_seq_length
+        first, last = np.searchsorted(self.offsets, np.array([start, end], dtype=np.uint64))
+        return {
+            "input_ids": self.tokens[start:end],
+            "boundaries": (self.offsets[first:last] - start).astype(np.int64),
+            "length": self.max_seq_length,
+        }
+
+    def packing_stats(self):
+        """Packing efficiency and contamination of the whole split, from the offsets alone"""
+        lengths = np.diff(self.offsets).tolist()
+        if self.bins is not None:
+            return packing_stats(
+                [[min(lengths[i], self.max_seq_length) for i in samples] for samples in self.bins], self.max_seq_length
+            )
+        sample_lengths, continued = concat_sample_lengths(lengths, self.max_seq_length)
+        return packing_stats(sample_lengths, self.max_seq_length, sum(continued))
+
+
+class PackedTokenCollator:
+    """
+    Stacks sequences into int64 tensors; the only copy of the token data happens here, per batch.
+    Tokens after a sequence's length are padding: masked out and ignored by the loss.
+    """
+
+    def __call__(self, features):
+        import torch
+
+        input_ids = torch.from_numpy(np.stack([feature["input_ids"] for feature in features]).astype(np.int64))
+        lengths = torch.tensor([feature.get("length", input_ids.shape[1]) for feature in features])
+        attention_mask = (torch.arange(input_ids.shape[1]) < lengths[:, None]).long()
+        return {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "labels": input_ids.masked_fill(attention_mask == 0, -100),
+        }
+
+
+if __name__ == "__main__":
+    from transformers import AutoTokenizer
+
+    parser = ArgumentParser()
+    parser.add_argument("--tokenizer_id", default="TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+    parser.add_argument("--dataset_path", default=None, help="local dataset copy (default: download from the Hub)")
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--train_size", type=int, default=50000)
+    parser.add_argument("--eval_size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=23)
+    args = parser.parse_args()
+
+    meta = pretokenize(
+        AutoTokenizer.from_pretrained(args.tokenizer_id),
+        args.output_dir,
+        load_source(args.dataset_path),
+        args.train_size,
+        args.eval_size,
+        args.seed,
+    )
+    for split, stats in meta["splits"].items():
+        print(f"{split}: {stats['samples']} samples, {stats['tokens']} {meta['dtype']} tokens")
@@ -0,0 +1,114 @@
+"""
+Secrets Manager lookup for finetune_llama.py, resolved once per node.
+
+get_secret tries the exact secret name first (one API call) and only then lists secrets whose
+name starts with it, filtered server-side, instead of paging through every secret in the account.
+The resolved value is cached on local disk, encrypted with Fernet, for cache_ttl seconds. A file
+lock serializes the lookup, so when every rank of a job starts at once only the first one calls
+AWS and the others read its result. The encryption key comes from SECRET_CACHE_KEY, or from a
+0600 key file created next to the cache.
+
+The key file sits in the same directory as the ciphertext, so anyone who can read the cache can
+decrypt it; it only protects copies of the cache files made without the key (backups, images).
+To keep the key off the node's disk, set SECRET_CACHE_KEY (a Fernet key, from
+Fernet.generate_key()) in the job's environment. An invalid key disables the cache with a warning.
+"""
+import fcntl
+import hashlib
+import os
+
+import boto3
+from botocore.exceptions import ClientError
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # without it the value is never written to disk, every lookup goes to AWS
+    Fernet = None
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "SECRET_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "slm-secrets")
+)
+DEFAULT_CACHE_TTL = int(os.environ.get("SECRET_CACHE_TTL", "3600"))
+
+
+def secret_text(response):
+    """SecretString, or SecretBinary decoded as UTF-8 (the value is used as a token either way)"""
+    if "SecretString" in response:
+        return response["SecretString"]
+    try:
+        return response["SecretBinary"].decode()
+    except UnicodeDecodeError:
+        raise ValueError(f"Secret {response['Name']} is binary and not UTF-8 text; store the token as a string")
+
+
+def find_secret_value(client, secret_name):
+    """The secret named secret_name, else the first one whose name starts with it"""
+    try:
+        return secret_text(client.get_secret_value(SecretId=secret_name))
+    except ClientError as e:
+        # Access policies scoped to ARNs answer AccessDenied for names that don't exist
+        if e.response["Error"]["Code"] not in ("ResourceNotFoundException", "AccessDeniedException"):
+            raise
+    paginator = client.get_paginator("list_secrets")
+    for page in paginator.paginate(Filters=[{"Key": "name", "Values": [secret_name]}]):
+        for secret in page["SecretList"]:
+            if secret["Name"].startswith(secret_name):
+                return secret_text(client.get_secret_value(SecretId=secret["ARN"]))
+    return None
+
+
+def fetch_secret(secret_name, region_name):
+    try:
+        client = boto3.session.Session().client(service_name="secretsmanager", region_name=region_name)
+        return find_secret_value(client, secret_name)
+    except ClientError:
+        print("Could not retrieve secret from AWS Secrets Manager")
+        return None
+
+
+def cache_key(cache_dir):
+    """Fernet key from SECRET_CACHE_KEY, else the node's key file (created under the cache lock)"""
+    if os.environ.get("SECRET_CACHE_KEY"):
+        return os.environ["SECRET_CACHE_KEY"].encode()
+    path = os.path.join(cache_dir, "key")
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, "rb") as f:
+            return f.read()
+    key = Fernet.generate_key()
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+def get_secret(secret_name, region_name, cache_dir=DEFAULT_CACHE_DIR, cache_ttl=DEFAULT_CACHE_TTL):
+    """
+    Retrieve a secret from AWS Secrets Manager by exact name or name prefix, through the node-local
+    encrypted cache (cache_ttl=0 disables it). Returns None when no secret matches.
+    """
+    if not cache_ttl or Fernet is None:
+        return fetch_secret(secret_name, region_name)
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    path = os.path.join(cache_dir, hashlib.sha256(f"{region_name}\0{secret_name}".encode()).hexdigest())
+    with open(os.path.join(cache_dir, "lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            fernet = Fernet(cache_key(cache_dir))
+        except ValueError:
+            print("Warning: SECRET_CACHE_KEY (or the cache key file) is not a valid Fernet key; "
+                  "not caching the secret")
+            return fetch_secret(secret_name, region_name)
+        try:
+            with open(path, "rb") as f:
+                # Fernet tokens carry their creation time, so the TTL is checked on decrypt
+                return fernet.decrypt(f.read(), ttl=cache_ttl).decode()
+        except (FileNotFoundError, InvalidToken):
+            pass
+        value = fetch_secret(secret_name, region_name)
+        if value is not None:
+            tmp_path = f"{path}.tmp-{os.getpid()}"
+            with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+                f.write(fernet.encrypt(value.encode()))
+            os.replace(tmp_path, path)
+        return value
@@ -0,0 +1,79 @@
+"""
+The services each ship a top-level main.py, so they are imported under unique module names
+"""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_module(name: str, relative_path: str):
+    if name in sys.modules:
+        return sys.modules[name]
+    path = os.path.join(REPO_ROOT, relative_path)
+    directory = os.path.dirname(path)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def admin_ui():
+    os.environ.setdefault("SUBSCRIPTIONS_DB", ":memory:")
+    return load_module("admin_ui_main", "admin-ui/backend/main.py")
+
+
+@pytest.fixture(scope="session")
+def exposed_app():
+    os.environ.setdefault("AWS_WARM_REGIONS", "us-east-1")
+    os.environ.setdefault("EC2_INVENTORY_REGIONS", "us-east-1")
+    return load_module("exposed_app_main", "exposed-app/backend/main.py")
+
+
+TINYLLAMA_CHAT_TEMPLATE = (
+    "{% for message in messages %}\n{% if message['role'] == 'user' %}\n{{ '<|user|>\n' + message['content'] + eos_token }}\n"
+    "{% elif message['role'] == 'system' %}\n{{ '<|system|>\n' + message['content'] + eos_token }}\n"
+    "{% elif message['role'] == 'assistant' %}\n{{ '<|assistant|>\n'  + message['content'] + eos_token }}\n"
+    "{% endif %}\n{% if loop.last and add_generation_prompt %}\n{{ '<|assistant|>' }}\n{% endif %}\n{% endfor %}"
+)
+
+
+@pytest.fixture(scope="session")
+def sql_rows():
+    """sql-create-context shaped rows of varied length, so packing has something to do"""
+    datasets = pytest.importorskip("datasets")
+    tables, columns = ["head", "farm", "city", "orders", "flight"], ["age", "name", "budget", "year", "price", "rank"]
+    rows = {"answer": [], "question": [], "context": []}
+    for i in range(120):
+        table, selected = tables[i % len(tables)], columns[: 1 + i % len(columns)]
+        rows["context"].append(f"CREATE TABLE {table} ({', '.join(f'{c} VARCHAR' for c in selected)})" * (1 + i % 3))
+        rows["question"].append(f"What is the {selected[0]} of the {table} where {selected[-1]} is over {i}?")
+        rows["answer"].append(f"SELECT {selected[0]} FROM {table} WHERE {selected[-1]} > {i}")
+    return datasets.Dataset.from_dict(rows)
+
+
+@pytest.fixture(scope="session")
+def sft_tokenizer(sql_rows):
+    """A small byte-level BPE with TinyLlama's chat template, trained on sql_rows (no Hub access)"""
+    pytest.importorskip("tokenizers")
+    transformers = pytest.importorskip("transformers")
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(
+        (" ".join(row.values()) for row in sql_rows),
+        trainer=trainers.BpeTrainer(vocab_size=400, special_tokens=["<unk>", "<s>", "</s>"]),
+    )
+    fast = transformers.PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="<unk>", bos_token="<s>",
+                                                eos_token="</s>", pad_token="</s>")
+    fast.chat_template = TINYLLAMA_CHAT_TEMPLATE
+    return fast
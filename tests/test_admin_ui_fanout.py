@@ -0,0 +1,167 @@
+import asyncio
+import json
+
+ALERT = {
+    "action": "created",
+    "alert": {"number": 1, "severity": "high", "state": "open", "created_at": "2025-01-01T00:00:00Z"},
+    "repository": {"full_name": "octo/repo"},
+    "sender": {"login": "dependabot[bot]"},
+}
+
+
+class FakeWebSocket:
+    """A dashboard that answers every send at once, but only after yielding to the loop"""
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.frames = []
+
+    async def send_text(self, message: str):
+        await asyncio.sleep(self.delay)
+        self.frames.append(message)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def alerts(admin_ui, count: int, distinct: int):
+    return [admin_ui.SecurityAlert(**{**ALERT, "alert": {**ALERT["alert"], "number": i % distinct}})
+            for i in range(count)]
+
+
+async def burst(admin_ui, count: int, distinct: int, queue_size: int = 32, send_timeout: float = 2.0,
+                delay: float = 0, **client_options):
+    manager = admin_ui.manager = admin_ui.ConnectionManager(queue_size=queue_size, send_timeout=send_timeout)
+    websocket = FakeWebSocket(delay)
+    manager.register(websocket, **client_options)
+    webhooks = admin_ui.WebhookQueue(maxsize=count, workers=4, batch_size=100)
+    webhooks.start()
+    for alert in alerts(admin_ui, count, distinct):
+        assert webhooks.submit(alert)
+    await webhooks.queue.join()
+    await asyncio.sleep(0.2)
+    await webhooks.stop()
+    evicted = manager.evicted_count
+    manager.disconnect(websocket)
+    return websocket, evicted
+
+
+def test_burst_larger_than_client_queue_is_delivered(admin_ui):
+    websocket, evicted = asyncio.run(burst(admin_ui, 400, 400))
+    assert evicted == 0
+    # Workers interleave, so only the set of alerts is fixed
+    assert sorted(int(json.loads(frame)["alert_id"]) for frame in websocket.frames) == list(range(400))
+
+
+def test_repeats_replace_queued_messages_for_deduping_clients(admin_ui):
+    async def run():
+        client = admin_ui.ClientConnection(FakeWebSocket(), queue_size=32, send_timeout=0.1,
+                                           batch_window=0.05, dedupe=True)
+        # 400 alerts on 20 keys fit in a queue of 32 without the writer draining any
+        offered = [client.offer(*admin_ui.process_security_alert(alert)) for alert in alerts(admin_ui, 400, 20)]
+        return offered, json.loads(await client.next_frame())
+
+    offered, batch = asyncio.run(run())
+    assert all(offered)
+    assert [int(message["alert_id"]) for message in batch] == list(range(20))
+
+
+def test_deduped_burst_is_delivered_without_eviction(admin_ui):
+    websocket, evicted = asyncio.run(burst(admin_ui, 400, 20, delay=0.01, batch_window=0.05, dedupe=True))
+    assert evicted == 0
+    batches = [json.loads(frame) for frame in websocket.frames]
+    for batch in batches:
+        ids = [message["alert_id"] for message in batch]
+        assert len(ids) == len(set(ids))
+    assert {int(message["alert_id"]) for batch in batches for message in batch} == set(range(20))
+
+
+def test_batched_burst_larger_than_client_queue_is_delivered(admin_ui):
+    websocket, evicted = asyncio.run(burst(admin_ui, 400, 400, batch_window=0.05))
+    assert evicted == 0
+    ids = [int(message["alert_id"]) for frame in websocket.frames for message in json.loads(frame)]
+    assert sorted(ids) == list(range(400))
+
+
+def test_stuck_client_is_still_evicted(admin_ui):
+    async def run():
+        manager = admin_ui.manager = admin_ui.ConnectionManager(queue_size=4, send_timeout=0.1)
+        stuck = FakeWebSocket()
+
+        async def never(message):
+            await asyncio.Event().wait()
+
+        stuck.send_text = never
+        manager.register(stuck)
+        for alert in alerts(admin_ui, 20, 20):
+            message, key = admin_ui.process_security_alert(alert)
+            await manager.broadcast(message, key, repository=key[0])
+        await asyncio.sleep(0.05)
+        return manager
+
+    manager = asyncio.run(run())
+    assert manager.evicted_count == 1
+    assert not manager.active_connections
+
+
+def repository_alert(admin_ui, full_name: str, number: int):
+    return admin_ui.SecurityAlert(**{**ALERT, "alert": {**ALERT["alert"], "number": number},
+                                     "repository": {"full_name": full_name}})
+
+
+def test_filtered_sockets_receive_only_matching_alerts(admin_ui):
+    async def run():
+        manager = admin_ui.manager = admin_ui.ConnectionManager()
+        sockets = {name: FakeWebSocket() for name in ("all", "api", "octo", "reset")}
+        for websocket in sockets.values():
+            manager.register(websocket)
+        manager.set_filter(sockets["api"], ["octo/api"], [])
+        # octo subscribed to octo/web, so a username filter matches it through the subscription
+        manager.set_filter(sockets["octo"], [], ["octo"])
+        manager.set_filter(sockets["reset"], ["octo/api"], ["octo"])
+        manager.set_filter(sockets["reset"], [], [])
+
+        routed = {
+            "octo/api": None,
+            "octo/web": "octo",
+            "hub/cli": None,
+        }
+        for number, (full_name, username) in enumerate(routed.items()):
+            message, key = admin_ui.process_security_alert(repository_alert(admin_ui, full_name, number))
+            await manager.broadcast(message, key, repository=full_name, username=username)
+        await asyncio.sleep(0.05)
+        for websocket in sockets.values():
+            manager.disconnect(websocket)
+        return {name: [json.loads(frame)["repository"] for frame in websocket.frames]
+                for name, websocket in sockets.items()}
+
+    received = asyncio.run(run())
+    assert received["all"] == ["octo/api", "octo/web", "hub/cli"]
+    assert received["api"] == ["octo/api"]
+    assert received["octo"] == ["octo/web"]
+    assert received["reset"] == ["octo/api", "octo/web", "hub/cli"]
+
+
+def test_disconnect_and_refilter_drop_empty_index_buckets(admin_ui):
+    async def run():
+        manager = admin_ui.ConnectionManager()
+        first, second = FakeWebSocket(), FakeWebSocket()
+        manager.register(first)
+        manager.register(second)
+        manager.set_filter(first, ["octo/api", "octo/web"], ["octo"])
+        manager.set_filter(second, ["octo/api"], [])
+        assert manager.unfiltered == set()
+        assert manager.targets("octo/web") == {first}
+        assert manager.targets("hub/cli", "octo") == {first}
+
+        manager.set_filter(first, ["octo/api"], [])
+        assert set(manager.by_repository) == {"octo/api"} and manager.by_username == {}
+
+        manager.disconnect(first)
+        assert manager.by_repository == {"octo/api": {second}}
+        manager.disconnect(second)
+        return manager
+
+    manager = asyncio.run(run())
+    assert manager.by_repository == {} and manager.by_username == {}
+    assert manager.unfiltered == set() and manager.targets("octo/api") == set()
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+BASE_URL = "https://api.github.test"
+
+
+def repository(username: str, number: int) -> dict:
+    return {"id": number, "name": f"repo-{number}", "full_name": f"{username}/repo-{number}",
+            "private": number % 10 == 9, "language": "Python", "owner": {"login": username}}
+
+
+class FakeGitHub:
+    """Paginates /users/{username}/repos with Link headers; pages in fail answer 500"""
+
+    def __init__(self, total: int = 250, per_page: int = 100, fail=()):
+        self.total = total
+        self.per_page = per_page
+        self.fail = set(fail)
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        page = int(request.url.params.get("page", "1"))
+        if page in self.fail:
+            return httpx.Response(500, text="boom")
+        username = request.url.path.split("/")[2]
+        start = (page - 1) * self.per_page
+        last_page = max(1, -(-self.total // self.per_page))
+        headers = {}
+        if page < last_page:
+            headers["Link"] = (f'<{request.url.copy_set_param("page", page + 1)}>; rel="next", '
+                               f'<{request.url.copy_set_param("page", last_page)}>; rel="last"')
+        repos = [repository(username, n) for n in range(start, min(start + self.per_page, self.total))]
+        return httpx.Response(200, json=repos, headers=headers)
+
+
+def github_client(admin_ui, handler, **options):
+    github = admin_ui.GitHubClient(base_url=BASE_URL, token=None, **options)
+    github.client = httpx.AsyncClient(base_url=github.base_url, transport=httpx.MockTransport(handler))
+    github.semaphore = asyncio.Semaphore(github.max_concurrency)
+    return github
+
+
+def get(admin_ui, monkeypatch, fake: FakeGitHub, path: str) -> httpx.Response:
+    async def run():
+        monkeypatch.setattr(admin_ui, "github", github_client(admin_ui, fake))
+        transport = httpx.ASGITransport(app=admin_ui.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://admin-ui") as client:
+            response = await client.get(path)
+        await admin_ui.github.close()
+        return response
+
+    return asyncio.run(run())
+
+
+def get_ndjson(admin_ui, monkeypatch, fake: FakeGitHub, query: str = ""):
+    response = get(admin_ui, monkeypatch, fake, f"/github/repositories/octo?format=ndjson{query}")
+    assert response.text.endswith("\n")
+    return response, [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_ndjson_streams_one_public_repository_per_line_in_page_order(admin_ui, monkeypatch):
+    response, repos = get_ndjson(admin_ui, monkeypatch, FakeGitHub(total=250))
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [repo["id"] for repo in repos] == [n for n in range(250) if n % 10 != 9]
+    assert list(repos[0]) == list(admin_ui.REPOSITORY_FIELDS)
+    assert repos[0]["stargazers_count"] == 0  # defaults fill fields GitHub omitted
+
+
+def test_ndjson_fields_projection(admin_ui, monkeypatch):
+    _, repos = get_ndjson(admin_ui, monkeypatch, FakeGitHub(total=20), "&fields=full_name,language")
+    assert repos[:2] == [{"full_name": "octo/repo-0", "language": "Python"},
+                         {"full_name": "octo/repo-1", "language": "Python"}]
+    assert all(list(repo) == ["full_name", "language"] for repo in repos)
+
+
+def test_ndjson_error_on_a_later_page_ends_the_stream_with_an_error_line(admin_ui, monkeypatch):
+    response, lines = get_ndjson(admin_ui, monkeypatch, FakeGitHub(total=250, fail={2}), "&fields=id")
+    # The first page was already sent, so the status stays 200
+    assert response.status_code == 200
+    assert [line["id"] for line in lines[:-1]] == [n for n in range(100) if n % 10 != 9]
+    assert lines[-1] == {"error": "GitHub API error: 500"}
+
+
+def test_ndjson_error_on_the_first_page_keeps_its_status(admin_ui, monkeypatch):
+    response = get(admin_ui, monkeypatch, FakeGitHub(fail={1}), "/github/repositories/octo?format=ndjson")
+    assert response.status_code == 500
+    assert response.json() == {"detail": "GitHub API error: 500"}
+
+
+def test_closing_the_stream_early_cancels_pending_page_fetches(admin_ui, monkeypatch):
+    fake = FakeGitHub(total=500)
+    slow = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if int(request.url.params.get("page", "1")) > 2:
+            await slow.wait()
+        return fake(request)
+
+    async def run():
+        monkeypatch.setattr(admin_ui, "github", github_client(admin_ui, handler))
+        response = await admin_ui.stream_github_repositories("octo", ["id"])
+        body = response.body_iterator
+        chunks = [await body.__anext__(), await body.__anext__()]
+        await body.aclose()
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await admin_ui.github.close()
+        return chunks, pending
+
+    chunks, pending = asyncio.run(run())
+    assert len(chunks) == 2
+    assert pending == []
+
+
+class Responses:
+    """Answers requests from a script of (status, headers, body) and records what was sent"""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        status, headers, body = self.script.pop(0)
+        return httpx.Response(status, headers=headers, json=body)
+
+
+def run_client(admin_ui, handler, scenario, **options):
+    async def run():
+        github = github_client(admin_ui, handler, **options)
+        try:
+            return await scenario(github)
+        finally:
+            await github.close()
+
+    return asyncio.run(run())
+
+
+def test_fresh_entries_are_served_without_a_request(admin_ui):
+    handler = Responses((200, {"ETag": '"v1"'}, [1]))
+
+    async def scenario(github):
+        return [(await github.get("/users/octo/repos")).data for _ in range(3)]
+
+    assert run_client(admin_ui, handler, scenario, cache_ttl=60) == [[1], [1], [1]]
+    assert len(handler.requests) == 1
+
+
+def test_expired_entries_are_revalidated_and_a_304_reuses_the_body(admin_ui):
+    handler = Responses((200, {"ETag": '"v1"'}, [1]), (304, {}, None), (200, {"ETag": '"v2"'}, [2]))
+
+    async def scenario(github):
+        first = await github.get("/users/octo/repos")
+        first.fetched_at -= 61
+        revalidated = await github.get("/users/octo/repos")
+        assert revalidated is first and time.time() - first.fetched_at < 1  # the 304 restarts the TTL
+        first.fetched_at -= 61
+        return first, await github.get("/users/octo/repos")
+
+    first, changed = run_client(admin_ui, handler, scenario, cache_ttl=60)
+    assert [request.headers.get("if-none-match") for request in handler.requests] == [None, '"v1"', '"v1"']
+    assert first.data == [1] and changed.data == [2] and changed.etag == '"v2"'
+
+
+def test_exhausted_rate_limit_serves_cache_and_skips_the_network(admin_ui):
+    reset = int(time.time()) + 30
+    exhausted = {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset)}
+    handler = Responses((200, {"ETag": '"v1"'}, [1]), (403, exhausted, {"message": "rate limited"}))
+
+    async def scenario(github):
+        cached = await github.get("/users/octo/repos")
+        cached.fetched_at -= 61
+        assert await github.get("/users/octo/repos") is cached
+        # Until the reset, cached data is served and uncached paths fail without a request
+        assert await github.get("/users/octo/repos") is cached
+        try:
+            await github.get("/users/hub/repos")
+        except admin_ui.GitHubRateLimited as e:
+            return e.reset_at
+        raise AssertionError("expected GitHubRateLimited")
+
+    assert run_client(admin_ui, handler, scenario, cache_ttl=60) == reset
+    assert len(handler.requests) == 2
+
+
+def test_secondary_rate_limit_retry_after_becomes_a_429(admin_ui):
+    handler = Responses((429, {"Retry-After": "20"}, {"message": "secondary rate limit"}))
+
+    async def scenario(github):
+        try:
+            await github.get("/users/octo/repos")
+        except admin_ui.GitHubRateLimited as e:
+            return admin_ui.github_http_error(e)
+        raise AssertionError("expected GitHubRateLimited")
+
+    error = run_client(admin_ui, handler, scenario)
+    assert error.status_code == 429
+    assert 18 <= int(error.headers["Retry-After"]) <= 20
+
+
+def test_link_header_fans_out_to_the_remaining_pages_concurrently(admin_ui):
+    fake = FakeGitHub(total=450)
+    in_flight = []
+    peak = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        in_flight.append(request)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(request)
+        return fake(request)
+
+    async def scenario(github):
+        return [page async for page in github.iter_user_repo_pages("octo")]
+
+    pages = run_client(admin_ui, handler, scenario, max_concurrency=8)
+    assert [page[0]["id"] for page in pages] == [0, 100, 200, 300, 400]
+    assert sum(len(page) for page in pages) == 450
+    assert sorted(int(request.url.params.get("page", "1")) for request in fake.requests) == [1, 2, 3, 4, 5]
+    assert all(request.url.params["per_page"] == "100" for request in fake.requests)
+    assert max(peak) == 4  # pages 2-5 were requested together once page 1 named the last page
@@ -0,0 +1,52 @@
+import asyncio
+
+
+def full_names(subscriptions):
+    return [subscription.full_name for subscription in subscriptions]
+
+
+def test_subscribe_duplicate_unsubscribe_and_reload(admin_ui, tmp_path):
+    path = str(tmp_path / "subscriptions.db")
+
+    async def scenario():
+        store = admin_ui.SubscriptionStore(path)
+        assert store.db is None  # nothing is opened until the startup hook runs
+        await store.open()
+
+        added = await store.subscribe("octo", ["api", "web", "api"])
+        assert full_names(added) == ["octo/api", "octo/web"]
+        assert await store.subscribe("octo", ["api", "web"]) == []
+        assert full_names(await store.subscribe("hub", ["cli"])) == ["hub/cli"]
+
+        assert full_names(store.for_user("octo")) == ["octo/api", "octo/web"]
+        assert full_names(store.for_user("nobody")) == []
+        assert len(store) == 3 and "hub/cli" in store
+
+        assert await store.unsubscribe("hub/cli")
+        assert not await store.unsubscribe("hub/cli")
+        assert "hub" not in store.by_username
+        await store.close()
+
+        reopened = admin_ui.SubscriptionStore(path)
+        await reopened.open()
+        try:
+            assert full_names(reopened.all()) == ["octo/api", "octo/web"]
+            assert full_names(reopened.for_user("octo")) == ["octo/api", "octo/web"]
+        finally:
+            await reopened.close()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_subscribes_index_each_repository_once(admin_ui, tmp_path):
+    async def scenario():
+        store = admin_ui.SubscriptionStore(str(tmp_path / "subscriptions.db"))
+        await store.open()
+        try:
+            results = await asyncio.gather(*(store.subscribe("octo", ["api", "web"]) for _ in range(4)))
+            assert sorted(full_names(sum(results, []))) == ["octo/api", "octo/web"]
+            assert full_names(store.for_user("octo")) == ["octo/api", "octo/web"]
+        finally:
+            await store.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+from conftest import load_module
+
+torch = pytest.importorskip("torch")
+from safetensors.torch import load_file, save_file  # noqa: E402
+
+TP_SIZE = 2
+PREFIX = "base_model.model.model.layers.0.self_attn.q_proj"
+
+
+@pytest.fixture(scope="module")
+def consolidate():
+    load_module("lora_merge", "slm-model/HuggingFaceExample/01_finetuning/assets/lora_merge.py")
+    return load_module("consolidate", "slm-model/HuggingFaceExample/01_finetuning/assets/consolidate.py")
+
+
+@pytest.fixture
+def checkpoint(consolidate, tmp_path):
+    """A checkpoint whose lora_B is split row-wise over TP_SIZE ranks, and the full tensors"""
+    full = {f"{PREFIX}.lora_A.weight": torch.randn(4, 16), f"{PREFIX}.lora_B.weight": torch.randn(16, 4)}
+    adapter_dir = tmp_path / "checkpoint-10" / "adapter_default"
+    shards_dir = adapter_dir / consolidate.ADAPTER_SHARDS_DIR
+    (shards_dir / "model").mkdir(parents=True)
+    for tp_rank, part in enumerate(full[f"{PREFIX}.lora_B.weight"].chunk(TP_SIZE)):
+        torch.save({f"{PREFIX}.lora_A.weight": full[f"{PREFIX}.lora_A.weight"], f"{PREFIX}.lora_B.weight": part},
+                   shards_dir / "model" / f"dp_rank_00_tp_rank_{tp_rank:02d}_pp_rank_00.pt")
+    (shards_dir / "mp_metadata_pp_rank_0.json").write_text(json.dumps({"parameters": {}}))
+    (adapter_dir / "adapter_config.json").write_text(json.dumps({"peft_type": "LORA", "r": 4, "lora_alpha": 8}))
+    return tmp_path / "checkpoint-10", full
+
+
+def fake_checkpointing(path_type):
+    """
+    Stands in for optimum-neuron's checkpointing module, which is only installable on Neuron
+    hosts: rebuilds lora_B from its row shards, passing the load function path_type paths
+    """
+    def consolidate_tensor_parallel_checkpoints(files, load_function, metadata, adapter_name):
+        state_dicts = [load_function(path_type(path)) for path in files]
+        return {
+            name: torch.cat([sd[name] for sd in state_dicts]) if "lora_B" in name else state_dicts[0][name]
+            for name in state_dicts[0]
+        }
+
+    return types.SimpleNamespace(consolidate_tensor_parallel_checkpoints=consolidate_tensor_parallel_checkpoints)
+
+
+@pytest.mark.parametrize("path_type", [Path, str, lambda path: path.as_posix()])
+def test_tensor_parallel_round_trip(consolidate, checkpoint, tmp_path, monkeypatch, path_type):
+    checkpoint_dir, full = checkpoint
+    monkeypatch.setitem(sys.modules, "optimum.neuron.models.training.checkpointing", fake_checkpointing(path_type))
+    timings = {}
+    output_dir = consolidate.consolidate_adapter_shards(str(checkpoint_dir), str(tmp_path / "consolidated"),
+                                                        timings=timings)
+
+    consolidated = load_file(str(Path(output_dir) / "adapter_model.safetensors"))
+    assert consolidated.keys() == full.keys()
+    assert all(torch.equal(consolidated[name], tensor) for name, tensor in full.items())
+    assert (Path(output_dir) / "adapter_config.json").exists()
+    assert {"read", "consolidate"} <= timings.keys()
+
+
+def test_incompatible_optimum_falls_back_to_whole_checkpoint_consolidation(consolidate, checkpoint, tmp_path,
+                                                                          monkeypatch):
+    checkpoint_dir, full = checkpoint
+    calls = []
+
+    def consolidate_tensor_parallel_checkpoints(files, load_function, metadata):
+        raise AssertionError("an incompatible signature must not be called")
+
+    def consolidate_model_parallel_checkpoints_to_unified_checkpoint(checkpoint_dir, output_dir):
+        calls.append((checkpoint_dir, output_dir))
+        os.makedirs(output_dir, exist_ok=True)
+        save_file(full, os.path.join(output_dir, "adapter_model.safetensors"))
+
+    # A later optimum-neuron that dropped adapter_name from the internal helper
+    checkpointing = types.SimpleNamespace(consolidate_tensor_parallel_checkpoints=consolidate_tensor_parallel_checkpoints)
+    training = types.SimpleNamespace(
+        consolidate_model_parallel_checkpoints_to_unified_checkpoint=consolidate_model_parallel_checkpoints_to_unified_checkpoint
+    )
+    monkeypatch.setitem(sys.modules, "optimum.neuron.models.training.checkpointing", checkpointing)
+    monkeypatch.setitem(sys.modules, "optimum.neuron.models.training", training)
+    timings = {}
+    output_dir = consolidate.consolidate_adapter_shards(str(checkpoint_dir), str(tmp_path / "consolidated"),
+                                                        timings=timings)
+
+    assert calls == [(str(checkpoint_dir), output_dir)]
+    assert (Path(output_dir) / "adapter_config.json").exists()
+    assert load_file(str(Path(output_dir) / "adapter_model.safetensors")).keys() == full.keys()
+    assert timings.keys() == {"consolidate"}
@@ -0,0 +1,88 @@
+import asyncio
+import types
+
+import httpx
+import pytest
+
+from conftest import load_module
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+MAX_NEW_TOKENS = 8
+
+
+@pytest.fixture(scope="module")
+def server():
+    return load_module("inference_server_main", "finetuned-model/backend/main.py")
+
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(vocab_size=128, hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+                                      num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=256)
+    model = transformers.LlamaForCausalLM(config).eval()
+    model.generation_config.eos_token_id = None
+    return model
+
+
+def engine(server, model, **options):
+    return server.InferenceEngine(model, types.SimpleNamespace(eos_token_id=-1), **options)
+
+
+def generation(server, prompt, prefix_lengths=()):
+    return server.Generation(list(prompt), list(prefix_lengths), MAX_NEW_TOKENS, 0.0, asyncio.new_event_loop())
+
+
+def run(current, generations):
+    """Drive the engine on this thread: admit one request per step, as requests arriving over time would"""
+    waiting = list(generations)
+    with torch.inference_mode():
+        while waiting or current.rows:
+            if waiting:
+                current.prefill(waiting.pop(0))
+            if current.rows:
+                current.step()
+    return [g.token_ids for g in generations]
+
+
+def greedy(model, prompt):
+    with torch.inference_mode():
+        output = model.generate(torch.tensor([prompt]), max_new_tokens=MAX_NEW_TOKENS, do_sample=False,
+                                min_new_tokens=MAX_NEW_TOKENS, pad_token_id=0)
+    return output[0, len(prompt):].tolist()
+
+
+def test_batched_decoding_matches_generate(server, model):
+    prompts = [[(7 * i + j) % 120 + 1 for j in range(5 + 3 * i)] for i in range(4)]
+    batched = run(engine(server, model, max_batch_size=4, prefix_cache=False), [generation(server, p) for p in prompts])
+    assert batched == [greedy(model, prompt) for prompt in prompts]
+
+
+def test_prefix_cache_hit_matches_cold_prefill(server, model):
+    system, schema = list(range(1, 13)), list(range(40, 60))
+    prompts = [system + schema + [90 + i, 91 + i, 92 + i] for i in range(3)]
+    boundaries = [len(system), len(system) + len(schema)]
+
+    cold = run(engine(server, model, max_batch_size=1, prefix_cache=False),
+               [generation(server, p, boundaries) for p in prompts])
+    cached_engine = engine(server, model, max_batch_size=1)
+    generations = [generation(server, p, boundaries) for p in prompts]
+    cached = run(cached_engine, generations)
+
+    assert [g.reused_tokens for g in generations] == [0, boundaries[1], boundaries[1]]
+    assert cached_engine.prefixes.hits == 2
+    assert cached == cold
+
+
+def test_scan_batch_rejects_more_snippets_than_the_cap(server):
+    async def post(codes):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://inference") as client:
+            return await client.post("/scan/batch", json={"codes": codes})
+
+    # Rejected by validation, before anything is queued on the (not loaded) engine
+    response = asyncio.run(post(["x = 1"] * (server.MAX_SCAN_BATCH + 1)))
+    assert response.status_code == 422
+    assert server.BatchScanRequest(codes=["x = 1"] * server.MAX_SCAN_BATCH).codes
@@ -0,0 +1,103 @@
+import json
+import os
+
+import pytest
+
+from conftest import load_module
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+from safetensors.torch import save_file  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def lora_merge():
+    return load_module("lora_merge", "slm-model/HuggingFaceExample/01_finetuning/assets/lora_merge.py")
+
+
+@pytest.fixture
+def adapter(tmp_path):
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(vocab_size=64, hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+                                      num_attention_heads=4, num_key_value_heads=2)
+    base_dir = str(tmp_path / "base")
+    transformers.LlamaForCausalLM(config).save_pretrained(base_dir)
+
+    adapter_dir = tmp_path / "adapter"
+    adapter_dir.mkdir()
+    (adapter_dir / "adapter_config.json").write_text(json.dumps({
+        "peft_type": "LORA", "base_model_name_or_path": base_dir, "r": 4, "lora_alpha": 8,
+    }))
+    prefix = "base_model.model.model.layers.0.self_attn.q_proj"
+    save_file({f"{prefix}.lora_A.weight": torch.randn(4, 32), f"{prefix}.lora_B.weight": torch.randn(32, 4)},
+              str(adapter_dir / "adapter_model.safetensors"))
+    return str(adapter_dir)
+
+
+def test_remerge_removes_stale_shards(lora_merge, adapter, tmp_path):
+    output_dir = str(tmp_path / "merged")
+    sharded = lora_merge.streaming_merge(adapter, output_dir, max_shard_size="8KB")
+    assert sharded["shards"] > 1
+    assert lora_merge.streaming_merge(adapter, output_dir, max_shard_size="2GB")["shards"] == 1
+
+    weights = sorted(name for name in os.listdir(output_dir) if name.startswith("model"))
+    assert weights == ["model.safetensors"]
+    merged = transformers.AutoModelForCausalLM.from_pretrained(output_dir)
+    assert merged.model.layers[0].self_attn.q_proj.weight.shape == (32, 32)
+
+
+@pytest.fixture(scope="module")
+def trained_adapter(tmp_path_factory):
+    """
+    A bf16 base sharded over several files and a PEFT-saved LoRA over every projection
+    finetune_llama.py trains, with non-zero B matrices and a trained lm_head (modules_to_save)
+    """
+    peft = pytest.importorskip("peft")
+    work_dir = tmp_path_factory.mktemp("trained")
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(vocab_size=96, hidden_size=32, intermediate_size=88, num_hidden_layers=2,
+                                      num_attention_heads=4, num_key_value_heads=2, tie_word_embeddings=False)
+    base_dir = str(work_dir / "base")
+    transformers.LlamaForCausalLM(config).to(torch.bfloat16).save_pretrained(base_dir, max_shard_size="20KB")
+
+    lora = peft.LoraConfig(r=4, lora_alpha=8, modules_to_save=["lm_head"], task_type="CAUSAL_LM",
+                           target_modules=["q_proj", "gate_proj", "v_proj", "o_proj", "k_proj", "up_proj", "down_proj"])
+    peft_model = peft.get_peft_model(transformers.LlamaForCausalLM.from_pretrained(base_dir), lora)
+    with torch.no_grad():
+        for name, parameter in peft_model.named_parameters():
+            if "lora_B" in name:
+                parameter.normal_(std=0.02)
+            elif "modules_to_save" in name:
+                parameter.add_(0.01)
+    adapter_dir = str(work_dir / "adapter")
+    peft_model.save_pretrained(adapter_dir)
+    return adapter_dir
+
+
+def load_checkpoint(directory):
+    from safetensors.torch import load_file
+
+    tensors = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".safetensors"):
+            tensors.update(load_file(os.path.join(directory, name)))
+    return tensors
+
+
+@pytest.mark.parametrize("dtype", ["float32", "auto"])
+def test_streaming_merge_is_bit_identical_to_merge_and_unload(lora_merge, trained_adapter, tmp_path, dtype):
+    import peft
+
+    torch_dtype = torch.float32 if dtype == "float32" else None
+    summary = lora_merge.streaming_merge(trained_adapter, str(tmp_path / "streaming"), dtype=torch_dtype,
+                                         max_shard_size="20KB")
+    assert summary["shards"] > 1 and summary["merged"] == 14  # 7 projections in each of 2 layers
+    peft_model = peft.AutoPeftModelForCausalLM.from_pretrained(trained_adapter, torch_dtype=torch_dtype or "auto")
+    peft_model.merge_and_unload().save_pretrained(str(tmp_path / "in_memory"))
+
+    expected, actual = load_checkpoint(str(tmp_path / "in_memory")), load_checkpoint(str(tmp_path / "streaming"))
+    assert expected.keys() == actual.keys()
+    different = [name for name in expected
+                 if expected[name].dtype != actual[name].dtype or not torch.equal(expected[name], actual[name])]
+    assert different == []
+    assert expected["lm_head.weight"].dtype == (torch.float32 if dtype == "float32" else torch.bfloat16)
@@ -0,0 +1,93 @@
+import math
+
+import pytest
+
+from conftest import load_module
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture(scope="module")
+def packing():
+    return load_module("packing", "slm-model/HuggingFaceExample/01_finetuning/assets/packing.py")
+
+
+def naive_first_fit_decreasing(lengths, capacity):
+    """The textbook O(n^2) version the segment tree has to agree with"""
+    lengths = [min(length, capacity) for length in lengths]
+    bins, room = [], []
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__, reverse=True):
+        index = next((b for b, free in enumerate(room) if free >= lengths[i]), len(bins))
+        if index == len(bins):
+            bins.append([])
+            room.append(capacity)
+        bins[index].append(i)
+        room[index] -= lengths[i]
+    return bins
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_ffd_bins_never_exceed_the_capacity(packing, seed):
+    rng = np.random.default_rng(seed)
+    capacity = 512
+    # Mostly short samples, and a few longer than a whole sequence
+    lengths = np.concatenate([rng.integers(1, 300, 500), rng.integers(513, 900, 5)]).tolist()
+    bins = packing.first_fit_decreasing(lengths, capacity)
+
+    assert all(sum(min(lengths[i], capacity) for i in samples) <= capacity for samples in bins)
+    assert sorted(i for samples in bins for i in samples) == list(range(len(lengths)))
+    assert bins == naive_first_fit_decreasing(lengths, capacity)
+    # FFD uses at most 11/9 OPT + 6/9 bins, and OPT is at least the total length over the capacity
+    lower_bound = math.ceil(sum(min(length, capacity) for length in lengths) / capacity)
+    assert len(bins) <= 11 / 9 * lower_bound + 6 / 9
+
+
+def test_pack_ffd_pads_and_masks_each_sequence(packing):
+    samples = [[1, 2, 3, 9], [4, 9], [5, 6, 7, 8, 9, 10, 11, 9], [12, 9]]
+    tokens = np.array([token for sample in samples for token in sample], dtype=np.uint16)
+    offsets = np.cumsum([0] + [len(sample) for sample in samples])
+    packed = packing.pack_ffd(tokens, offsets, 6, pad_token_id=0)
+
+    # The 8-token sample is truncated to a bin of its own
+    assert packed["sample_lengths"] == [[6], [4, 2], [2]]
+    assert packed["input_ids"].tolist() == [[5, 6, 7, 8, 9, 10], [1, 2, 3, 9, 4, 9], [12, 9, 0, 0, 0, 0]]
+    assert packed["attention_mask"][2].tolist() == [1, 1, 0, 0, 0, 0]
+    assert packed["labels"][2].tolist() == [12, 9, -100, -100, -100, -100]
+
+    packed = packing.pack_ffd(tokens, offsets, 10, pad_token_id=0)
+    # Longest first, each into the first bin with room: [8-token sample, 2], [4-token sample, 2]
+    assert packed["sample_lengths"] == [[8, 2], [4, 2]]
+    assert packed["input_ids"].tolist() == [[5, 6, 7, 8, 9, 10, 11, 9, 4, 9], [1, 2, 3, 9, 12, 9, 0, 0, 0, 0]]
+
+def test_packing_stats(packing):
+    stats = packing.packing_stats([[3, 1], [2]], 4, split_samples=1)
+    assert stats == {
+        "sequences": 2,
+        "useful_tokens": 6,
+        "total_tokens": 8,
+        "efficiency": 0.75,
+        "padding_fraction": 0.25,
+        "samples_per_sequence": 1.5,
+        "split_samples": 1,
+        # 13 causal pairs between real tokens (10 + 3), 3 of them from the 1-token sample to the other
+        "cross_sample_attention": pytest.approx(3 / 13),
+    }
+    assert packing.packing_stats([], 4)["efficiency"] == 0.0
+
+
+def test_concat_pieces_and_continued_samples(packing):
+    sequences, continued = packing.concat_sample_lengths([5, 3, 6], 4)
+    # The trailing 2 tokens of the last sample do not fill a sequence and are dropped
+    assert sequences == [[4], [1, 3], [4]]
+    assert continued == [False, True, False]
+
+
+def test_ffd_packs_the_same_way_every_time(packing):
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(1, 200, 300).tolist()
+    tokens = np.arange(sum(lengths), dtype=np.int64)
+    offsets = np.cumsum([0] + lengths)
+    first, second = (packing.pack_ffd(tokens, offsets, 256, pad_token_id=0) for _ in range(2))
+    assert first["sample_lengths"] == second["sample_lengths"]
+    assert np.array_equal(first["input_ids"], second["input_ids"])
+    assert packing.packing_stats(first["sample_lengths"], 256) == packing.packing_stats(second["sample_lengths"], 256)
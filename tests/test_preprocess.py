@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from conftest import load_module
+
+pytest.importorskip("datasets")
+
+
+@pytest.fixture(scope="module")
+def preprocess():
+    return load_module("preprocess", "slm-model/HuggingFaceExample/01_finetuning/assets/preprocess.py")
+
+
+def prepare(preprocess, tokenizer, rows, cache_dir, **options):
+    options = {"max_seq_length": 256, "train_size": 80, "eval_size": 16, "num_proc": 1, **options}
+    return preprocess.prepare_datasets(tokenizer, rows, cache_dir=str(cache_dir), **options)
+
+
+def caches(cache_dir):
+    return sorted(os.listdir(cache_dir))
+
+
+def test_second_run_loads_the_cache(preprocess, sft_tokenizer, sql_rows, tmp_path, capsys):
+    built = prepare(preprocess, sft_tokenizer, sql_rows, tmp_path)
+    assert "Saved preprocessed datasets" in capsys.readouterr().out
+    (cache,) = caches(tmp_path)
+
+    loaded = prepare(preprocess, sft_tokenizer, sql_rows, tmp_path)
+    assert "Loading preprocessed datasets" in capsys.readouterr().out
+    assert caches(tmp_path) == [cache]
+    for before, after in zip(built, loaded):
+        assert before["input_ids"] == after["input_ids"]
+        assert before["sample_lengths"] == after["sample_lengths"]
+    # Every sample of the split ends up in exactly one packed sequence
+    assert sum(len(lengths) for lengths in loaded[0]["sample_lengths"]) == 80
+
+
+@pytest.mark.parametrize("change", [
+    {"max_seq_length": 128},
+    {"packing": "concat"},
+    {"seed": 7},
+    {"train_size": 64},
+    {"eval_size": 8},
+])
+def test_changed_options_invalidate_the_cache(preprocess, sft_tokenizer, sql_rows, tmp_path, capsys, change):
+    prepare(preprocess, sft_tokenizer, sql_rows, tmp_path)
+    prepare(preprocess, sft_tokenizer, sql_rows, tmp_path, **change)
+    assert capsys.readouterr().out.count("Saved preprocessed datasets") == 2
+    assert len(caches(tmp_path)) == 2
+
+
+def test_changed_inputs_invalidate_the_cache(preprocess, sft_tokenizer, sql_rows, tmp_path, monkeypatch):
+    prepare(preprocess, sft_tokenizer, sql_rows, tmp_path)
+    # Different rows, a different chat template and a new preprocessing version each get their own cache
+    prepare(preprocess, sft_tokenizer, sql_rows.select(range(1, len(sql_rows))), tmp_path)
+    retemplated = sft_tokenizer.__class__(tokenizer_object=sft_tokenizer.backend_tokenizer,
+                                          eos_token="</s>", pad_token="</s>")
+    retemplated.chat_template = sft_tokenizer.chat_template.replace("<|user|>", "<|human|>")
+    prepare(preprocess, retemplated, sql_rows, tmp_path)
+    monkeypatch.setattr(preprocess, "PREPROCESS_VERSION", preprocess.PREPROCESS_VERSION + 1)
+    prepare(preprocess, sft_tokenizer, sql_rows, tmp_path)
+    assert len(caches(tmp_path)) == 4
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from conftest import load_module
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("datasets")
+
+MAX_SEQ_LENGTH = 128
+
+
+@pytest.fixture(scope="module")
+def pretokenized():
+    return load_module("pretokenized", "slm-model/HuggingFaceExample/01_finetuning/assets/pretokenized.py")
+
+
+@pytest.fixture
+def written(pretokenized, sft_tokenizer, sql_rows, tmp_path):
+    output_dir = str(tmp_path / "pretokenized")
+    meta = pretokenized.pretokenize(sft_tokenizer, output_dir, sql_rows, train_size=80, eval_size=16, seed=23)
+    return output_dir, meta
+
+
+def expected_samples(pretokenized, tokenizer, rows, indices):
+    """The token IDs of each sample the way write_split lays them out: templated, tokenized, then EOS"""
+    rows = rows.shuffle(seed=23).select(indices)
+    texts = tokenizer.apply_chat_template(pretokenized.create_conversations(rows[:])["messages"], tokenize=False)
+    return [ids + [tokenizer.eos_token_id] for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+
+def test_memmap_round_trip_with_offsets(pretokenized, sft_tokenizer, sql_rows, written):
+    output_dir, meta = written
+    assert meta["dtype"] == "uint16"
+    with open(f"{output_dir}/meta.json") as f:
+        assert json.load(f) == meta
+
+    for split, indices in (("train", range(80)), ("eval", range(80, 96))):
+        dataset = pretokenized.PackedTokenDataset(output_dir, split, MAX_SEQ_LENGTH, tokenizer=sft_tokenizer)
+        samples = expected_samples(pretokenized, sft_tokenizer, sql_rows, indices)
+        offsets = dataset.offsets.astype(np.int64)
+        assert offsets[0] == 0 and offsets[-1] == len(dataset.tokens) == meta["splits"][split]["tokens"]
+        assert np.diff(offsets).tolist() == [len(sample) for sample in samples]
+        read = [dataset.tokens[start:end].tolist() for start, end in zip(offsets[:-1], offsets[1:])]
+        assert read == samples
+
+
+def test_concat_sequences_are_views_with_sample_boundaries(pretokenized, written):
+    output_dir, _ = written
+    dataset = pretokenized.PackedTokenDataset(output_dir, "train", MAX_SEQ_LENGTH)
+    offsets = dataset.offsets.astype(np.int64)
+    assert len(dataset) == len(dataset.tokens) // MAX_SEQ_LENGTH
+    for index in range(len(dataset)):
+        item = dataset[index]
+        start = index * MAX_SEQ_LENGTH
+        assert isinstance(item["input_ids"], np.memmap)
+        assert item["input_ids"].tolist() == dataset.tokens[start:start + MAX_SEQ_LENGTH].tolist()
+        inside = offsets[(offsets >= start) & (offsets < start + MAX_SEQ_LENGTH)] - start
+        assert item["boundaries"].tolist() == inside.tolist()
+    with pytest.raises(IndexError):
+        dataset[len(dataset)]
+
+
+def test_ffd_bins_gather_whole_samples(pretokenized, written):
+    output_dir, _ = written
+    dataset = pretokenized.PackedTokenDataset(output_dir, "train", MAX_SEQ_LENGTH, packing="ffd")
+    offsets = dataset.offsets.astype(np.int64)
+    eos = dataset.meta["eos_token_id"]
+    seen = []
+    for index, samples in enumerate(dataset.bins):
+        item = dataset[index]
+        pieces = [dataset.tokens[offsets[i]:offsets[i + 1]][:MAX_SEQ_LENGTH].tolist() for i in samples]
+        expected = [token for piece in pieces for token in piece]
+        assert item["length"] == len(expected) <= MAX_SEQ_LENGTH
+        assert item["boundaries"].tolist() == np.cumsum([0] + [len(piece) for piece in pieces[:-1]]).tolist()
+        assert item["input_ids"].tolist() == expected + [eos] * (MAX_SEQ_LENGTH - len(expected))
+        seen.extend(samples)
+    assert sorted(seen) == list(range(80))
+
+
+def test_a_different_tokenizer_is_rejected(pretokenized, sft_tokenizer, written):
+    output_dir, _ = written
+    other = sft_tokenizer.__class__(tokenizer_object=sft_tokenizer.backend_tokenizer, eos_token="<s>")
+    other.chat_template = sft_tokenizer.chat_template
+    with pytest.raises(ValueError, match="different tokenizer"):
+        pretokenized.PackedTokenDataset(output_dir, "train", MAX_SEQ_LENGTH, tokenizer=other)
+
+
+def test_large_vocabularies_are_stored_as_uint32(pretokenized):
+    assert pretokenized.token_dtype(65536) is np.uint16
+    assert pretokenized.token_dtype(65537) is np.uint32
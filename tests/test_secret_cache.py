@@ -0,0 +1,58 @@
+import pytest
+
+from conftest import load_module
+
+
+@pytest.fixture
+def secret_cache(monkeypatch):
+    module = load_module("secret_cache", "slm-model/HuggingFaceExample/01_finetuning/assets/secret_cache.py")
+    calls = []
+
+    def fetch_secret(secret_name, region_name):
+        calls.append(secret_name)
+        return "hf_token"
+
+    monkeypatch.setattr(module, "fetch_secret", fetch_secret)
+    module.calls = calls
+    return module
+
+
+def test_second_lookup_is_served_from_the_cache(secret_cache, tmp_path, monkeypatch):
+    monkeypatch.delenv("SECRET_CACHE_KEY", raising=False)
+    for _ in range(2):
+        assert secret_cache.get_secret("huggingface/token", "us-west-2", str(tmp_path)) == "hf_token"
+    assert secret_cache.calls == ["huggingface/token"]
+
+
+def test_invalid_key_disables_the_cache(secret_cache, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("SECRET_CACHE_KEY", "not-a-fernet-key")
+    for _ in range(2):
+        assert secret_cache.get_secret("huggingface/token", "us-west-2", str(tmp_path)) == "hf_token"
+    assert secret_cache.calls == ["huggingface/token"] * 2
+    assert "not a valid Fernet key" in capsys.readouterr().out
+
+
+@pytest.fixture
+def secretsmanager():
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+    with moto.mock_aws():
+        yield boto3.client("secretsmanager", region_name="us-west-2", aws_access_key_id="testing",
+                           aws_secret_access_key="testing")
+
+
+@pytest.mark.parametrize("lookup", ["huggingface/token", "huggingface/"])
+def test_string_and_binary_secrets_resolve_the_same_on_both_paths(secretsmanager, lookup):
+    module = load_module("secret_cache", "slm-model/HuggingFaceExample/01_finetuning/assets/secret_cache.py")
+    secretsmanager.create_secret(Name="huggingface/token", SecretBinary=b"hf_binary")
+    assert module.find_secret_value(secretsmanager, lookup) == "hf_binary"
+    secretsmanager.put_secret_value(SecretId="huggingface/token", SecretString="hf_string")
+    assert module.find_secret_value(secretsmanager, lookup) == "hf_string"
+
+
+@pytest.mark.parametrize("lookup", ["huggingface/token", "huggingface/"])
+def test_non_text_binary_secrets_are_a_clear_error(secretsmanager, lookup):
+    module = load_module("secret_cache", "slm-model/HuggingFaceExample/01_finetuning/assets/secret_cache.py")
+    secretsmanager.create_secret(Name="huggingface/token", SecretBinary=b"\xff\xfe")
+    with pytest.raises(ValueError, match="huggingface/token is binary"):
+        module.find_secret_value(secretsmanager, lookup)